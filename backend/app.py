@@ -6,6 +6,7 @@ from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 import os
 import sys
+import threading
 
 # Add backend directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -23,6 +24,9 @@ from routes.analytics_routes import analytics_bp
 from routes.admin_routes import admin_bp
 from routes.calendar_routes import calendar_bp
 from services.auth_service import init_sample_data
+from services.backup_service import BackupService
+from services.storage_service import storage, ExpirySweeper
+from services.bcrypt_pool import PoolSaturated
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='../frontend', static_url_path='')
@@ -32,6 +36,9 @@ CORS(app)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'campusintelli-dev-secret-key-2026')
 app.config['DATA_DIR'] = os.path.join(os.path.dirname(__file__), '..', 'data')
 app.config['UPLOAD_DIR'] = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+# Periodic background jobs (snapshots, expiry sweeps) in this process; turn off for
+# processes that should not run them, e.g. the test suite
+app.config['BACKGROUND_SERVICES'] = os.environ.get('BACKGROUND_SERVICES', 'true').lower() in ('1', 'true', 'yes')
 
 # Ensure directories exist
 os.makedirs(app.config['DATA_DIR'], exist_ok=True)
@@ -77,10 +84,38 @@ def health_check():
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
 
+@app.errorhandler(PoolSaturated)
+def server_busy(error):
+    # Password hashing is saturated; shed load instead of queueing
+    return jsonify({'error': 'Server busy, please retry shortly'}), 503, {'Retry-After': '1'}
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
+# Background jobs
+_background_lock = threading.Lock()
+_background_started = False
+
+def start_background_services() -> bool:
+    """Start periodic snapshots and expiry sweeps; return False if this process already started them."""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return False
+        _background_started = True
+    BackupService(app.config['DATA_DIR']).start()
+    ExpirySweeper(storage).start()
+    return True
+
+# Started with the app, whatever serves it (python app.py, flask run,
+# gunicorn). `python app.py` with the debug reloader also imports this
+# module in a watcher process that only restarts the server; the serving
+# child it spawns has WERKZEUG_RUN_MAIN set.
+_reloader_watcher = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+if app.config['BACKGROUND_SERVICES'] and not _reloader_watcher:
+    start_background_services()
+
 if __name__ == '__main__':
     # Initialize sample data
     init_sample_data()
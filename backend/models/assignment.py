@@ -63,6 +63,22 @@ class Assignment:
 class Submission:
     """Submission model for assignment submissions."""
     
+    # Compact in-memory layout of cached records (services/columnar.py),
+    # in to_dict() field order
+    COLUMNS = (
+        ('id', 'key'),
+        ('assignment_id', 'ref'),
+        ('student_id', 'ref'),
+        ('file_path', 'value'),
+        ('file_name', 'value'),
+        ('submitted_at', 'timestamp'),
+        ('marks', 'value'),
+        ('feedback', 'value'),
+        ('is_late', 'bool'),
+        ('graded_at', 'timestamp'),
+        ('graded_by', 'ref')
+    )
+    
     def __init__(
         self,
         id: str = None,
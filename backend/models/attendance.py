@@ -11,6 +11,19 @@ import hashlib
 class Attendance:
     """Attendance record for a student in a lecture."""
     
+    # Compact in-memory layout of cached records (services/columnar.py),
+    # in to_dict() field order
+    COLUMNS = (
+        ('id', 'key'),
+        ('course_id', 'ref'),
+        ('student_id', 'ref'),
+        ('date', 'ref'),
+        ('lecture_id', 'ref'),
+        ('is_present', 'bool'),
+        ('marked_at', 'timestamp'),
+        ('marked_via', 'ref')
+    )
+    
     def __init__(
         self,
         id: str = None,
@@ -4,12 +4,29 @@ Admin Routes - User Management and System Configuration
 
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import sys, os
+import csv, io, sys, os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.storage_service import storage
-from models.user import User
+from services.auth_service import AuthService
+from services.bcrypt_pool import bcrypt_pool
+from services.qr_service import qr_renderer
+from services.attendance_ingest import attendance_ingestor
+from models.user import User, Student, Faculty, Admin
 from routes.auth_routes import token_required, role_required
+from routes.pagination import MAX_LIMIT
+
+SENSITIVE_FIELDS = ('password', 'password_hash')
+VALID_ROLES = ('student', 'faculty', 'admin')
+ROLE_MODELS = {'student': Student, 'faculty': Faculty, 'admin': Admin}
+BULK_REQUIRED_FIELDS = ('email', 'name', 'password')
+MAX_BULK_USERS = 10000
+
+
+def _public(record: dict) -> dict:
+    """Copy of a user record without credentials."""
+    return {k: v for k, v in record.items() if k not in SENSITIVE_FIELDS}
+
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -23,39 +40,34 @@ admin_bp = Blueprint('admin', __name__)
 @role_required('admin')
 def get_all_users(user):
     """Get all users with pagination and filtering."""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    role_filter = request.args.get('role')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), MAX_LIMIT))
+    cursor = request.args.get('cursor') or None
+    filters = {'role': request.args.get('role')}
     search = request.args.get('search', '').lower()
     
-    users = storage.get_all('users')
-    
-    # Filter by role
-    if role_filter:
-        users = [u for u in users if u.get('role') == role_filter]
-    
     # Search by name or email
+    where = None
     if search:
-        users = [u for u in users if 
-                 search in u.get('name', '').lower() or 
-                 search in u.get('email', '').lower()]
-    
-    # Remove sensitive data
-    for u in users:
-        u.pop('password', None)
-    
-    # Pagination
-    total = len(users)
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated = users[start:end]
-    
+        where = lambda u: search in u.get('name', '').lower() or search in u.get('email', '').lower()
+    
+    # A cursor continues from the previous page; otherwise page selects an offset
+    try:
+        users, next_cursor = storage.paginate(
+            'users', filters, sort=['created_at'], limit=per_page, cursor=cursor,
+            offset=0 if cursor else (page - 1) * per_page, where=where
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    total = storage.count('users', filters, where=where)
     return jsonify({
-        'users': paginated,
+        'users': [_public(u) for u in users],
         'total': total,
         'page': page,
         'per_page': per_page,
-        'total_pages': (total + per_page - 1) // per_page
+        'total_pages': (total + per_page - 1) // per_page,
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -72,7 +84,7 @@ def create_user(user):
             return jsonify({'error': f'{field} is required'}), 400
     
     # Check if email exists
-    existing = storage.get_by_field('users', 'email', data['email'])
+    existing = storage.first('users', {'email': data['email']}, fields=['id'])
     if existing:
         return jsonify({'error': 'Email already registered'}), 400
     
@@ -82,21 +94,19 @@ def create_user(user):
         return jsonify({'error': f'Invalid role. Must be one of: {", ".join(valid_roles)}'}), 400
     
     # Hash password and create user
-    from services.auth_service import bcrypt
-    hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+    hashed_password = AuthService.hash_password(data['password'])
     
     new_user = User(
         email=data['email'],
-        password=hashed_password,
+        password_hash=hashed_password,
         name=data['name'],
         role=data['role'],
         department=data.get('department', '')
     )
     
     saved = storage.create('users', new_user.to_dict())
-    saved.pop('password', None)
     
-    return jsonify({'user': saved, 'message': 'User created successfully'}), 201
+    return jsonify({'user': _public(saved), 'message': 'User created successfully'}), 201
 
 
 @admin_bp.route('/users/<user_id>', methods=['GET'])
@@ -108,8 +118,7 @@ def get_user(user, user_id):
     if not target_user:
         return jsonify({'error': 'User not found'}), 404
     
-    target_user.pop('password', None)
-    return jsonify({'user': target_user}), 200
+    return jsonify({'user': _public(target_user)}), 200
 
 
 @admin_bp.route('/users/<user_id>', methods=['PUT'])
@@ -125,9 +134,7 @@ def update_user(user, user_id):
     
     # Update allowed fields
     updatable_fields = ['name', 'role', 'department', 'is_active']
-    for field in updatable_fields:
-        if field in data:
-            target_user[field] = data[field]
+    changes = {field: data[field] for field in updatable_fields if field in data}
     
     # Validate role if being updated
     if 'role' in data:
@@ -137,13 +144,12 @@ def update_user(user, user_id):
     
     # Update password if provided
     if data.get('password'):
-        from services.auth_service import bcrypt
-        target_user['password'] = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        changes['password_hash'] = AuthService.hash_password(data['password'])
     
-    updated = storage.update('users', user_id, target_user)
-    updated.pop('password', None)
+    updated = storage.update('users', user_id, changes)
+    AuthService.invalidate_principal(user_id)
     
-    return jsonify({'user': updated, 'message': 'User updated successfully'}), 200
+    return jsonify({'user': _public(updated), 'message': 'User updated successfully'}), 200
 
 
 @admin_bp.route('/users/<user_id>', methods=['DELETE'])
@@ -160,9 +166,8 @@ def delete_user(user, user_id):
         return jsonify({'error': 'Cannot delete your own account'}), 400
     
     # Soft delete by setting is_active to False
-    target_user['is_active'] = False
-    target_user['deleted_at'] = datetime.now().isoformat()
-    storage.update('users', user_id, target_user)
+    storage.update('users', user_id, {'is_active': False, 'deleted_at': datetime.now().isoformat()})
+    AuthService.invalidate_principal(user_id)
     
     return jsonify({'message': 'User deactivated successfully'}), 200
 
@@ -176,9 +181,8 @@ def restore_user(user, user_id):
     if not target_user:
         return jsonify({'error': 'User not found'}), 404
     
-    target_user['is_active'] = True
-    target_user.pop('deleted_at', None)
-    storage.update('users', user_id, target_user)
+    storage.update('users', user_id, {'is_active': True, 'deleted_at': None})
+    AuthService.invalidate_principal(user_id)
     
     return jsonify({'message': 'User restored successfully'}), 200
 
@@ -204,8 +208,8 @@ def update_user_role(user, user_id):
         return jsonify({'error': f'Invalid role. Must be one of: {", ".join(valid_roles)}'}), 400
     
     old_role = target_user.get('role')
-    target_user['role'] = new_role
-    storage.update('users', user_id, target_user)
+    storage.update('users', user_id, {'role': new_role})
+    AuthService.invalidate_principal(user_id)
     
     return jsonify({
         'message': f'Role updated from {old_role} to {new_role}',
@@ -222,12 +226,8 @@ def update_user_role(user, user_id):
 @role_required('admin')
 def get_system_stats(user):
     """Get system-wide statistics."""
-    users = storage.get_all('users')
-    courses = storage.get_all('courses')
-    assignments = storage.get_all('assignments')
-    submissions = storage.get_all('submissions')
-    bookings = storage.get_all('bookings')
-    attendance = storage.get_all('attendance')
+    users = list(storage.find('users', fields=['role', 'is_active']))
+    submissions = list(storage.find('submissions', fields=['marks']))
     
     # User breakdown
     role_counts = {'student': 0, 'faculty': 0, 'admin': 0}
@@ -244,7 +244,7 @@ def get_system_stats(user):
     
     # Booking stats
     today = datetime.now().strftime('%Y-%m-%d')
-    today_bookings = len([b for b in bookings if b.get('date') == today])
+    today_bookings = storage.count('bookings', {'date': today})
     
     stats = {
         'users': {
@@ -253,21 +253,25 @@ def get_system_stats(user):
             'by_role': role_counts
         },
         'courses': {
-            'total': len(courses)
+            'total': storage.count('courses')
         },
         'assignments': {
-            'total': len(assignments),
+            'total': storage.count('assignments'),
             'submissions': len(submissions),
             'graded': graded,
             'pending_grading': pending
         },
         'bookings': {
-            'total': len(bookings),
+            'total': storage.count('bookings'),
             'today': today_bookings
         },
         'attendance': {
-            'total_records': len(attendance)
-        }
+            'total_records': storage.count('attendance'),
+            'ingestion': attendance_ingestor.stats()
+        },
+        'storage_cache': storage.cache_stats(),
+        'password_hashing': bcrypt_pool.stats(),
+        'qr_rendering': qr_renderer.stats()
     }
     
     return jsonify({'stats': stats}), 200
@@ -277,51 +281,105 @@ def get_system_stats(user):
 # BULK OPERATIONS
 # ==========================================
 
+def _read_bulk_rows():
+    """Rows of a bulk import as (index, line, row); line is None for JSON rows.
+    
+    Accepts a CSV file upload (form field 'file'), a text/csv body or
+    JSON {'users': [...]}. CSV needs a header row naming the columns.
+    """
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        raw = upload.read() if upload is not None else request.get_data()
+        try:
+            text = raw.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError('CSV must be UTF-8 encoded')
+        reader = csv.DictReader(io.StringIO(text))
+        missing = [f for f in BULK_REQUIRED_FIELDS if f not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(missing)}")
+        # Line numbers count the header as line 1
+        return [(idx, reader.line_num, {k: (v or '').strip() for k, v in row.items() if k})
+                for idx, row in enumerate(reader)]
+    
+    data = request.get_json(silent=True) or {}
+    users_data = data.get('users', [])
+    if not isinstance(users_data, list):
+        raise ValueError('users must be a list')
+    return [(idx, None, row) for idx, row in enumerate(users_data)]
+
+
 @admin_bp.route('/users/bulk-create', methods=['POST'])
 @token_required
 @role_required('admin')
 def bulk_create_users(user):
-    """Bulk create users from a list."""
-    data = request.get_json()
-    users_data = data.get('users', [])
-    
-    if not users_data:
+    """Bulk create users from a JSON list or a CSV upload.
+    
+    Every row is validated before any password is hashed; the valid rows
+    are then hashed in parallel and created with a single write. Rows
+    that fail are reported by index (and CSV line) and do not stop the rest.
+    """
+    try:
+        rows = _read_bulk_rows()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not rows:
         return jsonify({'error': 'No users provided'}), 400
+    if len(rows) > MAX_BULK_USERS:
+        return jsonify({'error': f'At most {MAX_BULK_USERS} users per import'}), 400
     
-    from services.auth_service import bcrypt
-    
-    created = []
+    valid = []
+    seen_emails = set()
     errors = []
     
-    for idx, user_data in enumerate(users_data):
-        try:
-            # Check required fields
-            if not all([user_data.get('email'), user_data.get('name'), user_data.get('password')]):
-                errors.append({'index': idx, 'error': 'Missing required fields'})
-                continue
-            
-            # Check if email exists
-            existing = storage.get_by_field('users', 'email', user_data['email'])
-            if existing:
-                errors.append({'index': idx, 'error': 'Email already exists', 'email': user_data['email']})
-                continue
-            
-            hashed_password = bcrypt.generate_password_hash(user_data['password']).decode('utf-8')
-            
-            new_user = User(
-                email=user_data['email'],
-                password=hashed_password,
-                name=user_data['name'],
-                role=user_data.get('role', 'student'),
-                department=user_data.get('department', '')
-            )
-            
-            saved = storage.create('users', new_user.to_dict())
-            saved.pop('password', None)
-            created.append(saved)
-            
-        except Exception as e:
-            errors.append({'index': idx, 'error': str(e)})
+    def reject(idx, line, message, **extra):
+        error = {'index': idx, 'error': message, **extra}
+        if line is not None:
+            error['line'] = line
+        errors.append(error)
+    
+    for idx, line, user_data in rows:
+        if not isinstance(user_data, dict):
+            reject(idx, line, 'Row must be an object')
+            continue
+        
+        # Check required fields
+        if not all(isinstance(user_data.get(f), str) and user_data[f].strip() for f in BULK_REQUIRED_FIELDS):
+            reject(idx, line, 'Missing required fields')
+            continue
+        
+        email = user_data['email'].strip()
+        role = user_data.get('role') or 'student'
+        if role not in VALID_ROLES:
+            reject(idx, line, f'Invalid role. Must be one of: {", ".join(VALID_ROLES)}', email=email)
+            continue
+        if len(user_data['password']) < 6:
+            reject(idx, line, 'Password must be at least 6 characters', email=email)
+            continue
+        
+        # Emails are checked against the users email index
+        if email in seen_emails or storage.first('users', {'email': email}, fields=['id']):
+            reject(idx, line, 'Email already exists', email=email)
+            continue
+        seen_emails.add(email)
+        valid.append((email, role, user_data))
+    
+    # Hash in parallel on the bcrypt pool
+    hashes = AuthService.hash_passwords([user_data['password'] for _, _, user_data in valid])
+    
+    new_users = []
+    for (email, role, user_data), password_hash in zip(valid, hashes):
+        new_user = ROLE_MODELS[role](
+            email=email,
+            password_hash=password_hash,
+            name=user_data['name'].strip(),
+            department=user_data.get('department') or ''
+        )
+        new_users.append(new_user.to_dict())
+    
+    # One write for the whole batch
+    created = [_public(saved) for saved in storage.create_many('users', new_users)]
     
     return jsonify({
         'created': len(created),
@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.storage_service import storage
 from models.announcement import Announcement
 from routes.auth_routes import token_required, role_required
+from routes.pagination import paginated_response
 
 announcement_bp = Blueprint('announcements', __name__)
 
@@ -16,9 +17,8 @@ announcement_bp = Blueprint('announcements', __name__)
 @announcement_bp.route('/', methods=['GET'])
 @token_required
 def get_announcements(user):
-    announcements = storage.get_all('announcements')
-    announcements.sort(key=lambda x: (not x.get('is_pinned', False), x.get('published_at', '')), reverse=True)
-    return jsonify({'announcements': announcements}), 200
+    # Pinned first, then newest
+    return paginated_response('announcements', 'announcements', sort=['-is_pinned', '-published_at'])
 
 
 @announcement_bp.route('/', methods=['POST'])
@@ -67,14 +67,11 @@ def update_announcement(user, announcement_id):
     updatable = ['title', 'content', 'category', 'target_audience', 
                  'is_pinned', 'expires_at', 'priority']
     
-    for field in updatable:
-        if field in data:
-            announcement[field] = data[field]
+    changes = {field: data[field] for field in updatable if field in data}
+    changes['updated_at'] = __import__('datetime').datetime.now().isoformat()
+    changes['updated_by'] = user['id']
     
-    announcement['updated_at'] = __import__('datetime').datetime.now().isoformat()
-    announcement['updated_by'] = user['id']
-    
-    updated = storage.update('announcements', announcement_id, announcement)
+    updated = storage.update('announcements', announcement_id, changes)
     return jsonify({'announcement': updated, 'message': 'Announcement updated successfully'}), 200
 
 
@@ -38,13 +38,17 @@ def get_assignments(user):
     
     if user['role'] == 'student':
         submissions = storage.get_by_field('submissions', 'student_id', user['id'])
-        submitted_ids = {s['assignment_id'] for s in submissions}
+        by_assignment = {}
+        for s in submissions:
+            by_assignment.setdefault(s['assignment_id'], s)
+        result = []
         for a in assignments:
-            a['submitted'] = a['id'] in submitted_ids
+            a = {**a, 'submitted': a['id'] in by_assignment}
             # Get submission details if exists
-            sub = next((s for s in submissions if s['assignment_id'] == a['id']), None)
-            if sub:
-                a['submission'] = sub
+            if a['submitted']:
+                a['submission'] = by_assignment[a['id']]
+            result.append(a)
+        assignments = result
     
     return jsonify({'assignments': assignments}), 200
 
@@ -59,6 +63,7 @@ def get_assignment(user, assignment_id):
     
     # Include submission status for students
     if user['role'] == 'student':
+        assignment = dict(assignment)
         submissions = storage.get_by_field('submissions', 'student_id', user['id'])
         sub = next((s for s in submissions if s['assignment_id'] == assignment_id), None)
         if sub:
@@ -109,11 +114,9 @@ def update_assignment(user, assignment_id):
     
     # Update allowed fields
     updatable_fields = ['title', 'description', 'due_date', 'max_marks', 'course_id']
-    for field in updatable_fields:
-        if field in data:
-            assignment[field] = data[field]
+    changes = {field: data[field] for field in updatable_fields if field in data}
     
-    updated = storage.update('assignments', assignment_id, assignment)
+    updated = storage.update('assignments', assignment_id, changes)
     return jsonify({'assignment': updated}), 200
 
 
@@ -139,7 +142,7 @@ def delete_assignment(user, assignment_id):
                 os.remove(sub['file_path'])
             except:
                 pass
-        storage.delete('submissions', sub['id'])
+    storage.delete_many('submissions', [sub['id'] for sub in submissions])
     
     storage.delete('assignments', assignment_id)
     return jsonify({'message': 'Assignment deleted successfully'}), 200
@@ -159,8 +162,9 @@ def submit_assignment(user, assignment_id):
         return jsonify({'error': 'Assignment not found'}), 404
     
     # Check for existing submission
-    existing = storage.get_by_field('submissions', 'assignment_id', assignment_id)
-    student_submission = next((s for s in existing if s['student_id'] == user['id']), None)
+    student_submission = storage.first('submissions', {
+        'assignment_id': assignment_id, 'student_id': user['id']
+    }, fields=['id'])
     
     if student_submission:
         return jsonify({'error': 'You have already submitted this assignment'}), 400
@@ -216,11 +220,13 @@ def get_submissions(user, assignment_id):
     submissions = storage.get_by_field('submissions', 'assignment_id', assignment_id)
     
     # Enrich with student info
+    enriched = []
     for sub in submissions:
         student = storage.get_by_id('users', sub['student_id'])
         if student:
-            sub['student_name'] = student.get('name', 'Unknown')
-            sub['student_email'] = student.get('email', '')
+            sub = {**sub, 'student_name': student.get('name', 'Unknown'), 'student_email': student.get('email', '')}
+        enriched.append(sub)
+    submissions = enriched
     
     return jsonify({'submissions': submissions, 'total': len(submissions)}), 200
 
@@ -276,12 +282,12 @@ def grade_submission(user, submission_id):
         return jsonify({'error': f'Marks must be between 0 and {assignment.get("max_marks", 100)}'}), 400
     
     # Update submission
-    submission['marks'] = marks
-    submission['feedback'] = feedback
-    submission['graded_at'] = datetime.now().isoformat()
-    submission['graded_by'] = user['id']
-    
-    storage.update('submissions', submission_id, submission)
+    submission = storage.update('submissions', submission_id, {
+        'marks': marks,
+        'feedback': feedback,
+        'graded_at': datetime.now().isoformat(),
+        'graded_by': user['id']
+    })
     
     # Create/update grade record
     grade = Grade(
@@ -318,7 +324,9 @@ def get_grades(user):
         grades = storage.get_all('grades')
     
     # Enrich with assignment and course info
+    enriched = []
     for grade in grades:
+        grade = dict(grade)
         assignment = storage.get_by_id('assignments', grade.get('assignment_id', ''))
         if assignment:
             grade['assignment_title'] = assignment.get('title', '')
@@ -326,5 +334,6 @@ def get_grades(user):
         course = storage.get_by_id('courses', grade.get('course_id', ''))
         if course:
             grade['course_name'] = course.get('name', '')
+        enriched.append(grade)
     
-    return jsonify({'grades': grades}), 200
+    return jsonify({'grades': enriched}), 200
@@ -4,45 +4,68 @@ Attendance Routes
 
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from io import BytesIO
-import base64, sys, os
+import sys, os, uuid
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import qrcode
 from services.storage_service import storage
 from models.attendance import Attendance, QRCode
+from services.auth_service import AuthService
+from services.qr_service import QRSigner, qr_renderer
+from services.attendance_ingest import attendance_ingestor
 from routes.auth_routes import token_required, role_required
+from routes.pagination import paginated_response
 
 attendance_bp = Blueprint('attendance', __name__)
+MAX_ROSTER = 1000
+
+# 'signed' issues stateless rotating codes (services/qr_service.py);
+# 'stored' saves each code in the qrcodes collection
+QR_MODE = os.environ.get('QR_MODE', 'signed')
+qr_signer = QRSigner(os.environ.get('QR_SIGNING_KEY', AuthService.SECRET_KEY))
 
 
 @attendance_bp.route('/generate-qr', methods=['POST'])
 @token_required
 @role_required('faculty')
 def generate_qr(user):
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
     course_id = data.get('course_id')
     
-    if not course_id:
+    if not course_id or not isinstance(course_id, str):
         return jsonify({'error': 'course_id required'}), 400
+    if not isinstance(data.get('lecture_id') or '', str):
+        return jsonify({'error': 'lecture_id must be a string'}), 400
     
-    qr_code = QRCode(course_id=course_id, faculty_id=user['id'])
-    qr_data = f"{qr_code.code_data}|{course_id}|{qr_code.lecture_id}"
-    
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(qr_data)
-    qr.make(fit=True)
+    image_format = data.get('format', 'png')
+    if image_format not in qr_renderer.FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(qr_renderer.FORMATS)}"}), 400
     
-    img = qr.make_image(fill_color="black", back_color="white")
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    qr_image = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    if QR_MODE == 'signed':
+        # Pass the lecture_id of the previous code to rotate it
+        lecture_id = data.get('lecture_id') or str(uuid.uuid4())
+        try:
+            issued = qr_signer.issue(course_id, lecture_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        qr_data = issued.pop('payload')
+        return jsonify({
+            'qr_code': {**issued, 'code_data': qr_data, 'faculty_id': user['id']},
+            'qr_data': qr_data,
+            'qr_image': qr_renderer.render(qr_data, image_format),
+            'expires_in_seconds': issued['expires_in_seconds'],
+            'rotate_after_seconds': issued['rotate_after_seconds']
+        }), 201
     
+    qr_code = QRCode(course_id=course_id, faculty_id=user['id'])
+    qr_data = f"{qr_code.code_data}|{course_id}|{qr_code.lecture_id}"
     saved = storage.create('qrcodes', qr_code.to_dict())
     return jsonify({
         'qr_code': saved,
-        'qr_image': f"data:image/png;base64,{qr_image}",
-        'expires_in_seconds': 300
+        'qr_data': qr_data,
+        'qr_image': qr_renderer.render(qr_data, image_format),
+        'expires_in_seconds': QRCode.EXPIRY_MINUTES * 60
     }), 201
 
 
@@ -50,48 +73,128 @@ def generate_qr(user):
 @token_required
 @role_required('student')
 def mark_attendance(user):
-    data = request.get_json()
-    qr_data = data.get('qr_data', '')
-    
-    parts = qr_data.split('|')
-    if len(parts) < 3:
-        return jsonify({'error': 'Invalid QR code'}), 400
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    qr_data = data.get('qr_data')
+    if not isinstance(qr_data, str) or not qr_data.strip():
+        return jsonify({'error': 'qr_data required'}), 400
+    qr_data = qr_data.strip()
     
-    code_data, course_id, lecture_id = parts[0], parts[1], parts[2]
-    
-    qr_codes = storage.get_by_field('qrcodes', 'code_data', code_data)
-    if not qr_codes:
-        return jsonify({'error': 'QR code not found'}), 404
-    
-    qr = QRCode.from_dict(qr_codes[0])
-    is_valid, error = qr.validate()
-    if not is_valid:
-        return jsonify({'error': error}), 400
-    
-    today = datetime.now().strftime('%Y-%m-%d')
-    existing = storage.query('attendance', {
-        'course_id': course_id, 'student_id': user['id'],
-        'date': today, 'lecture_id': lecture_id
-    })
-    if existing:
-        return jsonify({'error': 'Already marked'}), 409
+    if QRSigner.is_signed(qr_data):
+        # Signed codes are checked without any lookup
+        claims, error = qr_signer.verify(qr_data)
+        if error:
+            return jsonify({'error': error}), 400
+        course_id, lecture_id = claims['course_id'], claims['lecture_id']
+    else:
+        parts = qr_data.split('|')
+        if len(parts) < 3:
+            return jsonify({'error': 'Invalid QR code'}), 400
+        
+        code_data, course_id, lecture_id = parts[0], parts[1], parts[2]
+        
+        # Expired codes are invisible to lookups
+        qr_record = storage.first('qrcodes', {'code_data': code_data})
+        if not qr_record:
+            return jsonify({'error': 'QR code not found or expired'}), 404
+        
+        qr = QRCode.from_dict(qr_record)
+        is_valid, error = qr.validate()
+        if not is_valid:
+            return jsonify({'error': error}), 400
     
     attendance = Attendance(
         course_id=course_id, student_id=user['id'],
         lecture_id=lecture_id, is_present=True
     )
-    saved = storage.create('attendance', attendance.to_dict())
+    saved = attendance_ingestor.submit(attendance.to_dict())
+    if saved is None:
+        return jsonify({'error': 'Already marked'}), 409
     return jsonify({'attendance': saved, 'message': 'Marked!'}), 201
 
 
+@attendance_bp.route('/bulk', methods=['POST'])
+@token_required
+@role_required('faculty', 'admin')
+def mark_bulk(user):
+    """Mark or correct a lecture's attendance for a whole roster at once."""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    course_id = data.get('course_id')
+    roster = data.get('records')
+    
+    if not course_id or not isinstance(course_id, str) or not isinstance(roster, list) or not roster:
+        return jsonify({'error': 'course_id and a non-empty records list required'}), 400
+    if not isinstance(data.get('lecture_id') or '', str):
+        return jsonify({'error': 'lecture_id must be a string'}), 400
+    if len(roster) > MAX_ROSTER:
+        return jsonify({'error': f'At most {MAX_ROSTER} records per request'}), 400
+    
+    date = data.get('date') or datetime.now().strftime('%Y-%m-%d')
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    lecture_id = data.get('lecture_id') or str(uuid.uuid4())
+    
+    seen = set()
+    duplicates = []
+    for entry in roster:
+        if (not isinstance(entry, dict) or not isinstance(entry.get('student_id'), str)
+                or not isinstance(entry.get('is_present'), bool)):
+            return jsonify({'error': 'Each record needs a student_id and a boolean is_present'}), 400
+        if entry['student_id'] in seen:
+            duplicates.append(entry['student_id'])
+        seen.add(entry['student_id'])
+    if duplicates:
+        return jsonify({'error': 'Duplicate students in records', 'student_ids': duplicates}), 400
+    
+    course = storage.get_by_id('courses', course_id)
+    if not course:
+        return jsonify({'error': 'Course not found'}), 404
+    # Only admin or course instructor can mark a roster
+    if user['role'] != 'admin' and course.get('instructor_id') != user['id']:
+        return jsonify({'error': 'Unauthorized to mark attendance for this course'}), 403
+    
+    # Students must exist and, when the course keeps a roster, be enrolled in it
+    enrolled = set(course.get('students') or [])
+    unknown = []
+    for student_id in seen:
+        student = storage.get_by_id('users', student_id)
+        if (not student or student.get('role') != 'student'
+                or (enrolled and student_id not in enrolled)):
+            unknown.append(student_id)
+    if unknown:
+        return jsonify({'error': 'Unknown or unenrolled students in records', 'student_ids': sorted(unknown)}), 400
+    
+    records = [
+        Attendance(
+            course_id=course_id, student_id=entry['student_id'], date=date,
+            lecture_id=lecture_id, is_present=entry['is_present'], marked_via='manual'
+        ).to_dict()
+        for entry in roster
+    ]
+    created, updated = attendance_ingestor.upsert(records)
+    return jsonify({
+        'lecture_id': lecture_id,
+        'date': date,
+        'created': len(created),
+        'updated': len(updated),
+        'attendance': created + updated
+    }), 200
+
+
 @attendance_bp.route('/', methods=['GET'])
 @token_required
 def get_attendance(user):
+    filters = {'course_id': request.args.get('course_id')}
     if user['role'] == 'student':
-        records = storage.get_by_field('attendance', 'student_id', user['id'])
+        filters['student_id'] = user['id']
     else:
-        records = storage.get_all('attendance')
-    return jsonify({'attendance': records}), 200
+        filters['student_id'] = request.args.get('student_id')
+    return paginated_response('attendance', 'attendance', filters, sort=['-marked_at'])
 
 
 @attendance_bp.route('/summary', methods=['GET'])
@@ -14,16 +14,18 @@ from functools import wraps
 auth_bp = Blueprint('auth', __name__)
 
 
+def _bearer_token():
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+
 def token_required(f):
     """Decorator to require valid JWT token."""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-        
+        token = _bearer_token()
         if not token:
             return jsonify({'error': 'Token is missing'}), 401
         
@@ -94,4 +96,5 @@ def get_current_user(user):
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout(user):
+    AuthService.revoke_token(_bearer_token())
     return jsonify({'message': 'Logged out successfully'}), 200
@@ -55,9 +55,10 @@ def get_bookings(user):
         bookings = storage.get_by_field('bookings', 'user_id', user['id'])
     
     rooms = {r['id']: r for r in storage.get_all('rooms')}
-    for b in bookings:
-        room = rooms.get(b.get('room_id'), {})
-        b['room_name'] = room.get('name', '')
+    bookings = [
+        {**b, 'room_name': rooms.get(b.get('room_id'), {}).get('name', '')}
+        for b in bookings
+    ]
     
     return jsonify({'bookings': bookings}), 200
 
@@ -47,8 +47,7 @@ def get_events(user):
     # Enrich with organizer name
     users = storage.get_all('users')
     user_map = {u['id']: u.get('name', 'Unknown') for u in users}
-    for event in events:
-        event['organizer_name'] = user_map.get(event.get('organizer_id'), 'Unknown')
+    events = [{**event, 'organizer_name': user_map.get(event.get('organizer_id'), 'Unknown')} for event in events]
     
     # Sort by date
     events.sort(key=lambda x: x.get('start_date', ''), reverse=True)
@@ -119,14 +118,11 @@ def update_event(user, event_id):
                  'start_time', 'end_time', 'location', 'organizer_id', 'department',
                  'is_public', 'is_holiday']
     
-    for field in updatable:
-        if field in data:
-            event[field] = data[field]
+    changes = {field: data[field] for field in updatable if field in data}
+    changes['updated_at'] = datetime.now().isoformat()
+    changes['updated_by'] = user['id']
     
-    event['updated_at'] = datetime.now().isoformat()
-    event['updated_by'] = user['id']
-    
-    updated = storage.update('events', event_id, event)
+    updated = storage.update('events', event_id, changes)
     return jsonify({'event': updated, 'message': 'Event updated successfully'}), 200
 
 
@@ -211,11 +207,9 @@ def update_academic_item(user, item_id):
     updatable = ['academic_year', 'semester', 'item_type', 'title',
                  'description', 'start_date', 'end_date', 'is_active']
     
-    for field in updatable:
-        if field in data:
-            item[field] = data[field]
+    changes = {field: data[field] for field in updatable if field in data}
     
-    updated = storage.update('academic_calendar', item_id, item)
+    updated = storage.update('academic_calendar', item_id, changes)
     return jsonify({'item': updated, 'message': 'Academic calendar updated'}), 200
 
 
@@ -263,14 +257,18 @@ def get_timetable(user):
     
     day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
     
+    enriched = []
     for slot in slots:
         course = course_map.get(slot.get('course_id'), {})
-        slot['course_name'] = course.get('name', 'Unknown')
-        slot['course_code'] = course.get('code', '')
-        slot['day_name'] = day_names[slot.get('day_of_week', 0)]
-        
         instructor = user_map.get(slot.get('instructor_id'), {})
-        slot['instructor_name'] = instructor.get('name', 'TBA')
+        enriched.append({
+            **slot,
+            'course_name': course.get('name', 'Unknown'),
+            'course_code': course.get('code', ''),
+            'day_name': day_names[slot.get('day_of_week', 0)],
+            'instructor_name': instructor.get('name', 'TBA')
+        })
+    slots = enriched
     
     # Sort by day and time
     slots.sort(key=lambda x: (x.get('day_of_week', 0), x.get('start_time', '')))
@@ -341,11 +339,9 @@ def update_timetable_slot(user, slot_id):
     updatable = ['day_of_week', 'start_time', 'end_time', 'room',
                  'instructor_id', 'slot_type', 'section', 'semester', 'is_active']
     
-    for field in updatable:
-        if field in data:
-            slot[field] = data[field]
+    changes = {field: data[field] for field in updatable if field in data}
     
-    updated = storage.update('timetable_slots', slot_id, slot)
+    updated = storage.update('timetable_slots', slot_id, changes)
     return jsonify({'slot': updated, 'message': 'Timetable slot updated'}), 200
 
 
@@ -409,24 +405,26 @@ def update_subject_dates(user, course_id):
     
     # Update assignment due dates
     if 'assignments' in data:
+        changes = {}
         for assignment_update in data['assignments']:
             assignment = storage.get_by_id('assignments', assignment_update.get('id'))
             if assignment and assignment.get('course_id') == course_id:
                 if 'due_date' in assignment_update:
-                    assignment['due_date'] = assignment_update['due_date']
-                    storage.update('assignments', assignment['id'], assignment)
-                    updated_items['assignments'] += 1
+                    changes[assignment['id']] = {'due_date': assignment_update['due_date']}
+        updated_items['assignments'] = len(storage.update_many('assignments', changes))
     
     # Update timetable slots
     if 'timetable' in data:
+        changes = {}
         for slot_update in data['timetable']:
             slot = storage.get_by_id('timetable_slots', slot_update.get('id'))
             if slot and slot.get('course_id') == course_id:
-                for field in ['day_of_week', 'start_time', 'end_time', 'room']:
-                    if field in slot_update:
-                        slot[field] = slot_update[field]
-                storage.update('timetable_slots', slot['id'], slot)
-                updated_items['timetable'] += 1
+                changes[slot['id']] = {
+                    field: slot_update[field]
+                    for field in ['day_of_week', 'start_time', 'end_time', 'room']
+                    if field in slot_update
+                }
+        updated_items['timetable'] = len(storage.update_many('timetable_slots', changes))
     
     return jsonify({
         'message': f'Updated {updated_items["assignments"]} assignments, {updated_items["timetable"]} timetable slots',
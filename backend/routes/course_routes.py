@@ -29,19 +29,22 @@ def get_courses(user):
         courses = [c for c in courses if c.get('department', '').lower() == department.lower()]
     
     # Attach instructor name to each course
-    users = storage.get_all('users')
+    users = storage.find('users', fields=['id', 'name', 'designation'])
     user_map = {u['id']: u for u in users}
     
+    result = []
     for course in courses:
         instructor_id = course.get('instructor_id')
         if instructor_id and instructor_id in user_map:
-            course['instructor_name'] = user_map[instructor_id].get('name', 'Unknown')
-            course['instructor_designation'] = user_map[instructor_id].get('designation', 'Faculty')
+            result.append({
+                **course,
+                'instructor_name': user_map[instructor_id].get('name', 'Unknown'),
+                'instructor_designation': user_map[instructor_id].get('designation', 'Faculty')
+            })
         else:
-            course['instructor_name'] = 'Not Assigned'
-            course['instructor_designation'] = ''
+            result.append({**course, 'instructor_name': 'Not Assigned', 'instructor_designation': ''})
     
-    return jsonify({'courses': courses}), 200
+    return jsonify({'courses': result}), 200
 
 
 @course_bp.route('/<course_id>', methods=['GET'])
@@ -55,9 +58,12 @@ def get_course(user, course_id):
     # Attach instructor info
     instructor = storage.get_by_id('users', course.get('instructor_id', ''))
     if instructor:
-        course['instructor_name'] = instructor.get('name', 'Unknown')
-        course['instructor_designation'] = instructor.get('designation', 'Faculty')
-        course['instructor_email'] = instructor.get('email', '')
+        course = {
+            **course,
+            'instructor_name': instructor.get('name', 'Unknown'),
+            'instructor_designation': instructor.get('designation', 'Faculty'),
+            'instructor_email': instructor.get('email', '')
+        }
     
     return jsonify({'course': course}), 200
 
@@ -106,18 +112,19 @@ def update_course(user, course_id):
     data = request.get_json()
     
     # Update allowed fields
+    changes = {}
     if 'name' in data:
-        course['name'] = data['name']
+        changes['name'] = data['name']
     if 'description' in data:
-        course['description'] = data['description']
+        changes['description'] = data['description']
     if 'credits' in data:
-        course['credits'] = int(data['credits'])
+        changes['credits'] = int(data['credits'])
     if 'department' in data:
-        course['department'] = data['department']
+        changes['department'] = data['department']
     if 'instructor_id' in data and user['role'] == 'admin':
-        course['instructor_id'] = data['instructor_id']
+        changes['instructor_id'] = data['instructor_id']
     
-    updated = storage.update('courses', course_id, course)
+    updated = storage.update('courses', course_id, changes)
     return jsonify({'course': updated, 'message': 'Course updated successfully'}), 200
 
 
@@ -153,16 +160,21 @@ def get_timetable(user):
     user_map = {u['id']: u for u in users}
     
     # Enrich timetable entries
+    result = []
     for entry in entries:
         course = course_map.get(entry.get('course_id'), {})
-        entry['course_name'] = course.get('name', 'Unknown Course')
-        entry['course_code'] = course.get('code', '')
+        enriched = {
+            **entry,
+            'course_name': course.get('name', 'Unknown Course'),
+            'course_code': course.get('code', '')
+        }
         
         instructor_id = course.get('instructor_id')
         if instructor_id and instructor_id in user_map:
-            entry['instructor_name'] = user_map[instructor_id].get('name', '')
+            enriched['instructor_name'] = user_map[instructor_id].get('name', '')
+        result.append(enriched)
     
-    return jsonify({'timetable': entries}), 200
+    return jsonify({'timetable': result}), 200
 
 
 # ==========================================
@@ -185,19 +197,21 @@ def get_faculty(user):
     # Get assigned courses for each faculty
     courses = storage.get_all('courses')
     
+    result = []
     for fac in faculty:
         fac_courses = [c for c in courses if c.get('instructor_id') == fac.get('id')]
-        fac['courses'] = [{
+        
+        # Copy without sensitive data
+        entry = {k: v for k, v in fac.items() if k != 'password_hash'}
+        entry['courses'] = [{
             'id': c['id'],
             'code': c.get('code'),
             'name': c.get('name')
         } for c in fac_courses]
-        fac['course_count'] = len(fac_courses)
-        
-        # Remove sensitive data
-        fac.pop('password_hash', None)
+        entry['course_count'] = len(fac_courses)
+        result.append(entry)
     
-    return jsonify({'faculty': faculty}), 200
+    return jsonify({'faculty': result}), 200
 
 
 @course_bp.route('/faculty/<faculty_id>', methods=['GET'])
@@ -212,9 +226,9 @@ def get_faculty_detail(user, faculty_id):
     courses = storage.get_all('courses')
     fac_courses = [c for c in courses if c.get('instructor_id') == faculty_id]
     
+    faculty = {k: v for k, v in faculty.items() if k != 'password_hash'}
     faculty['courses'] = fac_courses
     faculty['course_count'] = len(fac_courses)
-    faculty.pop('password_hash', None)
     
     return jsonify({'faculty': faculty}), 200
 
@@ -62,16 +62,19 @@ def get_materials(user):
         materials = [m for m in materials if m.get('is_visible', True)]
     
     # Enrich with uploader info and course name
+    result = []
     for material in materials:
+        enriched = dict(material)
         uploader = storage.get_by_id('users', material.get('uploaded_by', ''))
         if uploader:
-            material['uploader_name'] = uploader.get('name', 'Unknown')
+            enriched['uploader_name'] = uploader.get('name', 'Unknown')
         
         course = storage.get_by_id('courses', material.get('course_id', ''))
         if course:
-            material['course_name'] = course.get('name', '')
+            enriched['course_name'] = course.get('name', '')
+        result.append(enriched)
     
-    return jsonify({'materials': materials, 'total': len(materials)}), 200
+    return jsonify({'materials': result, 'total': len(result)}), 200
 
 
 @materials_bp.route('/<material_id>', methods=['GET'])
@@ -162,11 +165,9 @@ def update_material(user, material_id):
     
     # Update allowed fields
     updatable_fields = ['title', 'description', 'category', 'is_visible', 'course_id']
-    for field in updatable_fields:
-        if field in data:
-            material[field] = data[field]
+    changes = {field: data[field] for field in updatable_fields if field in data}
     
-    updated = storage.update('materials', material_id, material)
+    updated = storage.update('materials', material_id, changes)
     return jsonify({'material': updated}), 200
 
 
@@ -0,0 +1,32 @@
+"""
+Pagination helpers shared by list endpoints
+
+List endpoints accept ?limit= and ?cursor= and return one page plus
+'next_cursor', which is null on the last page.
+"""
+
+from flask import request, jsonify
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.storage_service import storage
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def page_args(default_limit: int = DEFAULT_LIMIT):
+    """Return (limit, cursor) from the query string, clamping limit."""
+    limit = request.args.get('limit', default_limit, type=int)
+    return max(1, min(limit, MAX_LIMIT)), request.args.get('cursor') or None
+
+
+def paginated_response(key: str, collection: str, filters: dict = None, sort: list = None,
+                       default_limit: int = DEFAULT_LIMIT, **kwargs):
+    """Respond with one sorted page of a collection under key."""
+    limit, cursor = page_args(default_limit)
+    try:
+        items, next_cursor = storage.paginate(collection, filters, sort, limit=limit, cursor=cursor, **kwargs)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({key: items, 'next_cursor': next_cursor, 'limit': limit}), 200
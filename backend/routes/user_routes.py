@@ -7,6 +7,7 @@ import sys, os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.storage_service import storage
+from services.auth_service import AuthService
 from routes.auth_routes import token_required, role_required
 
 user_bp = Blueprint('users', __name__)
@@ -49,6 +50,7 @@ def update_user(user, user_id):
         updates['role'] = data['role']
     
     updated = storage.update('users', user_id, updates)
+    AuthService.invalidate_principal(user_id)
     if not updated:
         return jsonify({'error': 'User not found'}), 404
     
@@ -187,7 +187,7 @@ class AnalyticsService:
             total = len(attendance)
             
             stats = {
-                'courses_enrolled': len(set(g.get('course_id') for g in grades)) or len(storage.get_all('courses')),
+                'courses_enrolled': len(set(g.get('course_id') for g in grades)) or storage.count('courses'),
                 'pending_assignments': pending,
                 'attendance_rate': round((present/total*100) if total > 0 else 0, 1),
                 'upcoming_exams': 0  # Placeholder
@@ -212,10 +212,10 @@ class AnalyticsService:
         
         else:  # admin
             stats = {
-                'total_users': len(storage.get_all('users')),
-                'total_courses': len(storage.get_all('courses')),
-                'total_assignments': len(storage.get_all('assignments')),
-                'active_bookings': len([b for b in storage.get_all('bookings') if b.get('status') == 'confirmed'])
+                'total_users': storage.count('users'),
+                'total_courses': storage.count('courses'),
+                'total_assignments': storage.count('assignments'),
+                'active_bookings': storage.count('bookings', {'status': 'confirmed'})
             }
         
         return stats
@@ -0,0 +1,332 @@
+"""
+Attendance Ingestion - absorbs QR scan bursts
+
+When a class scans the same code at once, every mark used to check for a
+duplicate in storage and write the attendance collection on its own.
+AttendanceIngestor keeps the keys (course, student, date, lecture) of the
+marks it knows about in memory, rejects repeats there, and hands accepted
+marks to a single flusher thread that writes whatever has queued up with
+one create_many call. While one batch is being written the next one
+collects, so the number of writes follows the disk, not the scan rate.
+
+submit() waits until its mark is written by default, so a 201 still means
+the record is on disk; wait=False returns as soon as the mark is queued.
+
+The keys of a date are loaded from storage the first time that date is
+seen, without holding up marks for other dates. They are kept per
+process: attendance written or deleted without going through the
+ingestor must be reported with remember() or reset(). Batches are
+written with create_many(unique=KEY_FIELDS), which checks the keys again
+under the storage write lock, so a mark another process (or another
+ingestor) already wrote is rejected even though this one had not seen it.
+
+Usage (from the project root), a burst benchmark against a scratch copy:
+    python backend/services/attendance_ingest.py bench [--scans 500] [--threads 50]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from database.config import DatabaseConfig
+from services.storage_service import StorageService, storage
+
+KEY_FIELDS = ('course_id', 'student_id', 'date', 'lecture_id')
+
+
+def attendance_key(record: dict) -> tuple:
+    return tuple(record.get(field) for field in KEY_FIELDS)
+
+
+class AttendanceIngestor:
+    """Deduplicate attendance marks in memory and write them in batches."""
+    
+    # Dates whose keys are kept; older ones are loaded again if needed
+    KEPT_DATES = 7
+    
+    def __init__(self, store, batch_size: int = None):
+        self.store = store
+        self.batch_size = batch_size or DatabaseConfig.ATTENDANCE_BATCH_SIZE
+        self._cond = threading.Condition()
+        # date -> keys of the marks stored or queued for that date
+        self._seen: 'OrderedDict[str, Set[tuple]]' = OrderedDict()
+        # (record, slot); the flusher empties the slot of a record storage rejected
+        self._queue: List[Tuple[dict, list]] = []
+        self._loading: Set[str] = set()  # dates whose keys are being loaded
+        self.queued = 0  # tickets handed out
+        self._taken = 0  # highest ticket handed to the flusher
+        self.written = 0  # highest ticket covered by a finished write
+        self.failures: List[Tuple[int, int, Exception]] = []  # (after, upto, error)
+        self.batches = 0
+        self.rejected = 0
+        self._flusher: Optional[threading.Thread] = None
+    
+    def _keys(self, date: str) -> Set[tuple]:
+        # Called with self._cond held; released while the date is loaded from storage
+        while True:
+            keys = self._seen.get(date)
+            if keys is not None:
+                self._seen.move_to_end(date)
+                return keys
+            if date not in self._loading:
+                break
+            self._cond.wait()
+        
+        self._loading.add(date)
+        self._cond.release()
+        try:
+            keys = {
+                attendance_key(r) for r in self.store.find('attendance', {'date': date}, fields=list(KEY_FIELDS))
+            }
+        finally:
+            self._cond.acquire()
+            self._loading.discard(date)
+            self._cond.notify_all()
+        # Marks of this date wait for the load, so none were added meanwhile
+        self._seen[date] = keys
+        while len(self._seen) > self.KEPT_DATES:
+            self._seen.popitem(last=False)
+        return keys
+    
+    def is_marked(self, record: dict) -> bool:
+        """Return True if a mark with the same key is stored or queued."""
+        with self._cond:
+            return attendance_key(record) in self._keys(record['date'])
+    
+    def remember(self, records: Iterable[dict]):
+        """Record the keys of attendance written without the ingestor."""
+        with self._cond:
+            for record in records:
+                self._keys(record['date']).add(attendance_key(record))
+    
+    def reset(self):
+        """Forget all keys; they are loaded from storage again when needed."""
+        with self._cond:
+            self._seen.clear()
+    
+    def upsert(self, records: List[dict]) -> Tuple[List[dict], List[dict]]:
+        """Write marks made outside the queue, updating stored marks with the same key.
+        
+        Scans of these keys are rejected from here on and marks queued
+        before are written first, so a scan cannot race the upsert into a
+        duplicate. Returns (created, updated).
+        """
+        self.remember(records)
+        self.flush()
+        try:
+            return self.store.upsert_many('attendance', records, KEY_FIELDS)
+        except Exception:
+            self.reset()
+            raise
+    
+    def submit(self, record: dict, wait: bool = True, timeout: float = 30.0) -> Optional[dict]:
+        """Queue a new attendance record, or return None if it is a repeat.
+        
+        With wait, returns once the record is written, None if storage
+        already held its key, and raises the error of its batch if the
+        write failed.
+        """
+        key = attendance_key(record)
+        with self._cond:
+            keys = self._keys(record['date'])
+            if key in keys:
+                self.rejected += 1
+                return None
+            keys.add(key)
+            slot = [record]
+            self._queue.append((record, slot))
+            self.queued += 1
+            ticket = self.queued
+            self._start()
+            self._cond.notify_all()
+            
+            if wait:
+                deadline = time.monotonic() + timeout
+                while self.written < ticket:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("Attendance write did not finish in time")
+                    self._cond.wait(remaining)
+                for after, upto, error in self.failures:
+                    if after < ticket <= upto:
+                        raise error
+        return slot[0]
+    
+    def _start(self):
+        # Called with self._cond held
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._run, name='attendance-ingest', daemon=True)
+            self._flusher.start()
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                batch = self._queue[:self.batch_size]
+                del self._queue[:self.batch_size]
+                after = self._taken
+                self._taken += len(batch)
+            
+            try:
+                created = self.store.create_many('attendance', [record for record, _ in batch], unique=KEY_FIELDS)
+                error = None
+            except Exception as e:
+                print(f"[ATTENDANCE] Writing {len(batch)} marks failed: {e}")
+                error = e
+            
+            with self._cond:
+                self.batches += 1
+                if error is not None:
+                    # Let the failed marks be scanned again
+                    for record, _ in batch:
+                        self._seen.get(record['date'], set()).discard(attendance_key(record))
+                    self.failures.append((after, after + len(batch), error))
+                    del self.failures[:-16]
+                elif len(created) < len(batch):
+                    # Written by someone else first; the key stays known
+                    created = {id(record) for record in created}
+                    for record, slot in batch:
+                        if id(record) not in created:
+                            slot[0] = None
+                            self.rejected += 1
+                self.written = after + len(batch)
+                self._cond.notify_all()
+    
+    def flush(self, timeout: float = 30.0):
+        """Wait until everything queued so far is written."""
+        with self._cond:
+            target = self.queued
+            deadline = time.monotonic() + timeout
+            while self.written < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Attendance write did not finish in time")
+                self._cond.wait(remaining)
+    
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'queued': self.queued - self.written,
+                'written': self.written,
+                'batches': self.batches,
+                'rejected_duplicates': self.rejected
+            }
+
+
+# Shared ingestor for the attendance routes
+attendance_ingestor = AttendanceIngestor(storage)
+
+
+# Benchmark
+
+def _bench_store(data_dir: str, engine: str):
+    from models.attendance import Attendance
+    
+    return StorageService(data_dir, engine=engine, default_format=DatabaseConfig.STORAGE_FORMAT,
+                          columnar={'attendance': Attendance.COLUMNS})
+
+
+def bench(scans: int = 500, threads: int = 50, existing: int = 20000, engine: str = 'file',
+          duplicates: float = 0.1):
+    """Replay a burst of scans for one lecture against direct and queued writes."""
+    from concurrent.futures import ThreadPoolExecutor
+    from models.attendance import Attendance
+    from services.qr_service import QRSigner
+    
+    signer = QRSigner('bench-key', rotate_seconds=3600)
+    payload = signer.issue('course-bench', str(uuid.uuid4()))['payload']
+    students = [str(uuid.uuid4()) for _ in range(scans)]
+    # Some students scan twice
+    burst = students + students[:int(scans * duplicates)]
+    
+    def seed(data_dir):
+        store = _bench_store(data_dir, engine)
+        store.create_many('attendance', [
+            Attendance(course_id=f"course-{i % 40}", student_id=f"student-{i % 900}",
+                       date='2024-01-01', lecture_id=f"lecture-{i % 300}").to_dict()
+            for i in range(existing)
+        ])
+        store.invalidate()
+        return store
+    
+    def direct(store):
+        def mark(student_id):
+            claims, _ = signer.verify(payload)
+            record = Attendance(course_id=claims['course_id'], student_id=student_id,
+                                lecture_id=claims['lecture_id']).to_dict()
+            if store.first('attendance', {field: record[field] for field in KEY_FIELDS}, fields=['id']):
+                return False
+            store.create('attendance', record)
+            return True
+        return mark, lambda: store
+    
+    def queued(store):
+        ingestor = AttendanceIngestor(store)
+        
+        def mark(student_id):
+            claims, _ = signer.verify(payload)
+            record = Attendance(course_id=claims['course_id'], student_id=student_id,
+                                lecture_id=claims['lecture_id']).to_dict()
+            return ingestor.submit(record) is not None
+        return mark, lambda: ingestor
+    
+    print(f"[BENCH] {len(burst)} scans ({scans} students) from {threads} threads, "
+          f"{existing} existing records, engine '{engine}'")
+    for name, build in (('direct', direct), ('queued', queued)):
+        data_dir = tempfile.mkdtemp()
+        try:
+            store = seed(data_dir)
+            store.get_all('attendance')
+            mark, subject = build(store)
+            latencies = []
+            
+            def timed(student_id):
+                started = time.perf_counter()
+                accepted = mark(student_id)
+                latencies.append(time.perf_counter() - started)
+                return accepted
+            
+            started = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                accepted = sum(pool.map(timed, burst))
+            elapsed = time.perf_counter() - started
+            
+            store.invalidate()
+            stored = store.count('attendance', {'course_id': 'course-bench'})
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+            extra = subject().stats() if name == 'queued' else {}
+            print(f"[BENCH] {name:7s} {elapsed:7.2f}s  {len(burst) / elapsed:8.0f} scans/s  "
+                  f"p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  accepted {accepted}  stored {stored}"
+                  + (f"  batches {extra['batches']}" if extra else ''))
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Attendance ingestion tools.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    parser_bench = sub.add_parser('bench', help='Benchmark a burst of QR scans')
+    parser_bench.add_argument('--scans', type=int, default=500)
+    parser_bench.add_argument('--threads', type=int, default=50)
+    parser_bench.add_argument('--existing', type=int, default=20000, help='Attendance records already stored')
+    parser_bench.add_argument('--engine', choices=('file', 'journal'), default='file')
+    args = parser.parse_args(argv)
+    
+    bench(args.scans, args.threads, args.existing, args.engine)
+
+
+if __name__ == '__main__':
+    main()
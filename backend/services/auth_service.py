@@ -5,29 +5,87 @@ Authentication Service
 import bcrypt
 import jwt
 import os
+import threading
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from models.user import User, Student, Faculty, Admin
-from services.storage_service import storage
+from services.storage_service import storage, FrozenRecord
+from services.bcrypt_pool import bcrypt_pool, PoolSaturated
 
 
 class AuthService:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'campusintelli-dev-secret-key-2026')
     TOKEN_EXPIRY_HOURS = 24
     
-    @staticmethod
-    def hash_password(password: str) -> str:
-        salt = bcrypt.gensalt()
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    # Principals of recently seen tokens, so authenticated requests skip
+    # the JWT decode and the user lookup; 0 disables the cache
+    PRINCIPAL_TTL_SECONDS = float(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', '30'))
+    PRINCIPAL_CACHE_SIZE = 10000
+    # token -> (principal, unix time the entry expires, jti), oldest first
+    _principals: Dict[str, Tuple[dict, float, Optional[str]]] = {}
+    # user id -> tokens cached for that user
+    _principal_tokens: Dict[str, Set[str]] = {}
+    _principal_lock = threading.Lock()
+    # Bumped by every invalidation, so a lookup racing one is not cached
+    _principal_generation = 0
+    
+    # Invalidations of a user's principals are also written to a TTL
+    # collection, kept as long as a principal cached before them may
+    # live; every worker reloads it every REVOCATION_SYNC_SECONDS and
+    # drops the principals of users invalidated elsewhere.
+    INVALIDATION_COLLECTION = 'principal_invalidations'
+    _invalidations_seen: Set[str] = set()
+    _invalidations_synced = float('-inf')
+    _invalidation_lock = threading.Lock()
+    
+    # Ids (jti) of revoked tokens, stored until the token expires in a
+    # TTL collection that the expiry sweeper purges. Checks use an
+    # in-memory copy, reloaded every REVOCATION_SYNC_SECONDS so that
+    # revocations made by other workers are seen within that delay.
+    REVOKED_COLLECTION = 'revoked_tokens'
+    REVOCATION_SYNC_SECONDS = float(os.environ.get('REVOCATION_SYNC_SECONDS', '1'))
+    _revoked: Set[str] = set()
+    _revoked_synced = float('-inf')
+    _revoked_lock = threading.Lock()
+    
+    # bcrypt work factor (log2 rounds) for new hashes; each step doubles
+    # the cost. Measure with: python backend/services/bcrypt_pool.py bench
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+    
+    # bcrypt runs on services/bcrypt_pool.py; both raise PoolSaturated when it is full
+    
+    @classmethod
+    def hash_password(cls, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=cls.BCRYPT_ROUNDS)
+        return bcrypt_pool.run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+    
+    @classmethod
+    def hash_passwords(cls, passwords: List[str]) -> List[str]:
+        """Hash several passwords in parallel, waiting for pool room instead of failing."""
+        hashed = bcrypt_pool.map(bcrypt.hashpw, [
+            (p.encode('utf-8'), bcrypt.gensalt(rounds=cls.BCRYPT_ROUNDS)) for p in passwords
+        ])
+        return [h.decode('utf-8') for h in hashed]
+    
+    @classmethod
+    def needs_rehash(cls, hashed: str) -> bool:
+        """Return True if a bcrypt hash ($2b$<rounds>$...) uses another work factor."""
+        try:
+            return int(hashed.split('$')[2]) != cls.BCRYPT_ROUNDS
+        except (IndexError, ValueError):
+            return False
     
     @staticmethod
     def verify_password(password: str, hashed: str) -> bool:
+        """Check a password; a malformed hash is a mismatch, a busy pool raises PoolSaturated."""
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-        except Exception:
+            return bcrypt_pool.run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+        except ValueError:
             return False
     
     @classmethod
@@ -37,7 +95,9 @@ class AuthService:
             'email': user['email'],
             'role': user['role'],
             'exp': datetime.utcnow() + timedelta(hours=cls.TOKEN_EXPIRY_HOURS),
-            'iat': datetime.utcnow()
+            'iat': datetime.utcnow(),
+            # Token id, for revoking this token alone
+            'jti': uuid.uuid4().hex
         }
         return jwt.encode(payload, cls.SECRET_KEY, algorithm='HS256')
     
@@ -50,31 +110,38 @@ class AuthService:
     
     @classmethod
     def authenticate(cls, email: str, password: str) -> Tuple[bool, Optional[dict], str]:
-        users = storage.get_by_field('users', 'email', email)
-        if not users:
+        user = storage.first('users', {'email': email})
+        if not user:
             return False, None, "User not found"
         
-        user = users[0]
         if not cls.verify_password(password, user.get('password_hash', '')):
             return False, None, "Invalid password"
         
-        storage.update('users', user['id'], {'last_login': datetime.now().isoformat()})
+        changes = {'last_login': datetime.now().isoformat()}
+        if cls.needs_rehash(user.get('password_hash', '')):
+            # Move the hash to the configured cost while the password is at hand
+            try:
+                changes['password_hash'] = cls.hash_password(password)
+            except PoolSaturated:
+                pass
+        storage.update('users', user['id'], changes)
         token = cls.generate_token(user)
         user_data = {k: v for k, v in user.items() if k != 'password_hash'}
         user_data['token'] = token
         return True, user_data, "Login successful"
     
     @classmethod
-    def register(cls, user_data: dict) -> Tuple[bool, Optional[dict], str]:
+    def register(cls, user_data: dict, password_hash: str = None) -> Tuple[bool, Optional[dict], str]:
+        """Create a user; password_hash skips hashing user_data['password'] again."""
         email = user_data.get('email', '')
-        if storage.get_by_field('users', 'email', email):
+        if storage.first('users', {'email': email}, fields=['id']):
             return False, None, "Email already registered"
         
         password = user_data.pop('password', '')
         if len(password) < 6:
             return False, None, "Password must be at least 6 characters"
         
-        user_data['password_hash'] = cls.hash_password(password)
+        user_data['password_hash'] = password_hash or cls.hash_password(password)
         role = user_data.get('role', 'student')
         
         if role == 'student':
@@ -93,14 +160,147 @@ class AuthService:
     
     @classmethod
     def get_current_user(cls, token: str) -> Optional[dict]:
+        """Return the (read-only) user a token belongs to, or None."""
+        if time.monotonic() >= cls._invalidations_synced + cls.REVOCATION_SYNC_SECONDS:
+            cls.sync_invalidations(wait=False)
+        cached = cls._principals.get(token)
+        if cached is not None and cached[1] > time.time():
+            return None if cls.is_revoked(cached[2]) else cached[0]
+        
+        generation = cls._principal_generation
         payload = cls.verify_token(token)
-        if not payload:
+        if not payload or cls.is_revoked(payload.get('jti')):
             return None
         user = storage.get_by_id('users', payload['user_id'])
         if not user:
             return None
-        return {k: v for k, v in user.items() if k != 'password_hash'}
-
+        principal = FrozenRecord((k, v) for k, v in user.items() if k != 'password_hash')
+        if cls.PRINCIPAL_TTL_SECONDS > 0:
+            expires = min(time.time() + cls.PRINCIPAL_TTL_SECONDS, payload['exp'])
+            cls._cache_principal(token, principal, expires, payload.get('jti'), generation)
+        return principal
+    
+    @classmethod
+    def _cache_principal(cls, token: str, principal: dict, expires: float, jti: Optional[str],
+                         generation: int):
+        with cls._principal_lock:
+            if generation != cls._principal_generation:
+                return
+            old = cls._principals.pop(token, None)
+            if old is not None:
+                cls._forget_token(token, old[0]['id'])
+            cls._principals[token] = (principal, expires, jti)
+            cls._principal_tokens.setdefault(principal['id'], set()).add(token)
+            while len(cls._principals) > cls.PRINCIPAL_CACHE_SIZE:
+                oldest = next(iter(cls._principals))
+                cls._forget_token(oldest, cls._principals.pop(oldest)[0]['id'])
+    
+    @classmethod
+    def _forget_token(cls, token: str, user_id: str):
+        tokens = cls._principal_tokens.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del cls._principal_tokens[user_id]
+    
+    @classmethod
+    def invalidate_principal(cls, user_id: str = None):
+        """Drop cached principals of one user, or of everyone.
+        
+        Call after changing a user record so that the next request with
+        any of the user's tokens sees the change. Other workers drop the
+        user's principals within REVOCATION_SYNC_SECONDS; dropping
+        everyone only clears this process's cache.
+        """
+        if user_id is not None and cls.PRINCIPAL_TTL_SECONDS > 0:
+            record_id = uuid.uuid4().hex
+            with cls._invalidation_lock:
+                cls._invalidations_seen.add(record_id)
+            keep = cls.PRINCIPAL_TTL_SECONDS + cls.REVOCATION_SYNC_SECONDS
+            storage.create(cls.INVALIDATION_COLLECTION, {
+                'id': record_id,
+                'user_id': user_id,
+                'invalidated_at': datetime.now().isoformat(),
+                storage.TTL_FIELD: (datetime.now() + timedelta(seconds=keep)).isoformat()
+            })
+        cls._drop_principals(user_id)
+    
+    @classmethod
+    def _drop_principals(cls, user_id: Optional[str]):
+        with cls._principal_lock:
+            cls._principal_generation += 1
+            if user_id is None:
+                cls._principals.clear()
+                cls._principal_tokens.clear()
+            else:
+                for token in cls._principal_tokens.pop(user_id, ()):
+                    cls._principals.pop(token, None)
+    
+    @classmethod
+    def sync_invalidations(cls, wait: bool = True):
+        """Drop the principals of users invalidated by other workers.
+        
+        Without wait, returns at once if another thread is already syncing.
+        """
+        if not cls._invalidation_lock.acquire(blocking=wait):
+            return
+        try:
+            records = storage.get_all(cls.INVALIDATION_COLLECTION)
+            user_ids = {r.get('user_id') for r in records if r['id'] not in cls._invalidations_seen}
+            cls._invalidations_seen = {r['id'] for r in records}
+            cls._invalidations_synced = time.monotonic()
+        finally:
+            cls._invalidation_lock.release()
+        for user_id in user_ids:
+            if user_id is not None:
+                cls._drop_principals(user_id)
+    
+    @classmethod
+    def revoke_token(cls, token: str) -> bool:
+        """Revoke a valid token until it expires; return False if it cannot be revoked.
+        
+        Tokens issued before tokens carried a jti cannot be revoked one by
+        one and stay valid until they expire. Revoking a token twice, even
+        from two workers at once, stores it once.
+        """
+        payload = cls.verify_token(token)
+        if not payload or not payload.get('jti'):
+            return False
+        with cls._revoked_lock:
+            storage.create_many(cls.REVOKED_COLLECTION, [{
+                'id': payload['jti'],
+                'user_id': payload['user_id'],
+                'revoked_at': datetime.now().isoformat(),
+                # Purged by the expiry sweeper once the token is unusable anyway
+                storage.TTL_FIELD: datetime.fromtimestamp(payload['exp']).isoformat()
+            }], unique=('id',))
+            cls._revoked.add(payload['jti'])
+        with cls._principal_lock:
+            cls._principal_generation += 1
+            cached = cls._principals.pop(token, None)
+            if cached is not None:
+                cls._forget_token(token, cached[0]['id'])
+        return True
+    
+    @classmethod
+    def is_revoked(cls, jti: Optional[str]) -> bool:
+        if time.monotonic() >= cls._revoked_synced + cls.REVOCATION_SYNC_SECONDS:
+            cls.sync_revocations(wait=False)
+        return jti is not None and jti in cls._revoked
+    
+    @classmethod
+    def sync_revocations(cls, wait: bool = True):
+        """Reload the revoked ids from storage, dropping those of expired tokens.
+        
+        Without wait, returns at once if another thread is already syncing.
+        """
+        if not cls._revoked_lock.acquire(blocking=wait):
+            return
+        try:
+            cls._revoked = {record['id'] for record in storage.get_all(cls.REVOKED_COLLECTION)}
+            cls._revoked_synced = time.monotonic()
+        finally:
+            cls._revoked_lock.release()
 
 def init_sample_data():
     """Initialize comprehensive sample data with faculty, students, and courses."""
@@ -222,30 +422,40 @@ def init_sample_data():
             }
         ]
         
-        # Register all faculty
-        faculty_ids = {}
-        for f in faculty_samples:
-            success, user, msg = AuthService.register(f)
-            if success:
-                faculty_ids[f['email']] = user['id']
-        
         # Sample students
         student_samples = [
             {'email': 'student@campus.edu', 'password': 'student123', 'name': 'Rahul Sharma', 'role': 'student', 'department': 'Computer Science'},
             {'email': 'student2@campus.edu', 'password': 'student123', 'name': 'Priya Patel', 'role': 'student', 'department': 'Computer Science'},
             {'email': 'student3@campus.edu', 'password': 'student123', 'name': 'Amit Kumar', 'role': 'student', 'department': 'Electronics'},
         ]
-        for s in student_samples:
-            AuthService.register(s)
         
         # Admin
-        AuthService.register({
+        admin_sample = {
             'email': 'admin@campus.edu', 
             'password': 'admin123', 
             'name': 'System Admin', 
             'role': 'admin', 
             'department': 'IT'
-        })
+        }
+        
+        # Hash every password at once on the bcrypt pool
+        samples = faculty_samples + student_samples + [admin_sample]
+        hashes = dict(zip(
+            [u['email'] for u in samples],
+            AuthService.hash_passwords([u['password'] for u in samples])
+        ))
+        
+        # Register all faculty
+        faculty_ids = {}
+        for f in faculty_samples:
+            success, user, msg = AuthService.register(f, password_hash=hashes[f['email']])
+            if success:
+                faculty_ids[f['email']] = user['id']
+        
+        for s in student_samples:
+            AuthService.register(s, password_hash=hashes[s['email']])
+        
+        AuthService.register(admin_sample, password_hash=hashes[admin_sample['email']])
         
         # Sample courses
         from models.course import Course
@@ -0,0 +1,248 @@
+"""
+Backup Service - point-in-time snapshots of the JSON data directory
+
+Snapshots are taken periodically (or on demand) instead of copying each
+collection on every write. Every snapshot is a directory under the backup
+dir holding the collection files, their journals and a manifest.json.
+
+- mode 'link' hard-links collection files. StorageService only replaces
+  them by rename and never rewrites them in place, so a link is a stable
+  copy. Unchanged collections share one inode across snapshots, which
+  makes every snapshot incremental. Journals, which grow in place, are
+  copied.
+- mode 'gzip' stores compressed copies instead.
+
+Usage (from the project root):
+    python backend/services/backup_service.py snapshot
+    python backend/services/backup_service.py list
+    python backend/services/backup_service.py restore <snapshot> [collection ...]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+from contextlib import ExitStack
+from datetime import datetime
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from database.config import DatabaseConfig
+from services.locking import FileLock
+
+JOURNAL_SUFFIXES = ('.journal', '.journal.compacting')
+
+
+class BackupService:
+    """Take, prune and restore snapshots of a data directory."""
+    
+    MODES = ('link', 'gzip')
+    
+    def __init__(self, data_dir: str = None, backup_dir: str = None,
+                 retention: int = None, mode: str = None):
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+        self.backup_dir = backup_dir or DatabaseConfig.BACKUP_DIR
+        self.retention = retention if retention is not None else DatabaseConfig.BACKUP_RETENTION
+        self.mode = mode or DatabaseConfig.BACKUP_MODE
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown backup mode '{self.mode}'. Must be one of: {', '.join(self.MODES)}")
+        self._timer: Optional[threading.Timer] = None
+    
+    def _collections(self) -> List[str]:
+        return sorted(
+            name[:-len('.json')] for name in os.listdir(self.data_dir)
+            if name.endswith('.json') and not name.startswith('.')
+        )
+    
+    def _lock(self, collection: str) -> FileLock:
+        # Same lock file StorageService writers hold
+        return FileLock(os.path.join(self.data_dir, f"{collection}.json.lock"))
+    
+    # Snapshots
+    
+    def snapshot(self) -> str:
+        """Snapshot every collection and return the snapshot name.
+        
+        Shared locks on all collections are held together, so the snapshot
+        is one consistent point in time across collections.
+        """
+        name = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        target = os.path.join(self.backup_dir, name)
+        partial = target + '.partial'
+        os.makedirs(partial)
+        
+        collections = self._collections()
+        files = []
+        with ExitStack() as stack:
+            for collection in collections:
+                stack.enter_context(self._lock(collection).hold(exclusive=False))
+            for collection in collections:
+                base = f"{collection}.json"
+                for filename in [base] + [base + suffix for suffix in JOURNAL_SUFFIXES]:
+                    source = os.path.join(self.data_dir, filename)
+                    if os.path.exists(source):
+                        files.append(self._store(source, os.path.join(partial, filename), filename == base))
+        
+        with open(os.path.join(partial, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(),
+                'mode': self.mode,
+                'collections': collections,
+                'files': files
+            }, f, indent=2)
+        os.replace(partial, target)
+        
+        self.prune()
+        return name
+    
+    def _store(self, source: str, dest: str, linkable: bool) -> str:
+        if self.mode == 'gzip':
+            with open(source, 'rb') as src, gzip.open(dest + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            return os.path.basename(dest) + '.gz'
+        
+        if linkable:
+            try:
+                os.link(source, dest)
+                return os.path.basename(dest)
+            except OSError:
+                pass  # e.g. backup dir on another filesystem
+        shutil.copy2(source, dest)
+        return os.path.basename(dest)
+    
+    def list_snapshots(self) -> List[str]:
+        """Return completed snapshot names, oldest first."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.backup_dir)
+            if not name.endswith('.partial')
+            and os.path.exists(os.path.join(self.backup_dir, name, 'manifest.json'))
+        )
+    
+    def seconds_since_snapshot(self) -> float:
+        """Return the age of the newest snapshot, or infinity if there is none."""
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return float('inf')
+        taken = datetime.strptime(snapshots[-1], '%Y%m%d-%H%M%S-%f')
+        return (datetime.now() - taken).total_seconds()
+    
+    def prune(self) -> List[str]:
+        """Delete snapshots beyond the retention count; return their names."""
+        snapshots = self.list_snapshots()
+        expired = snapshots[:-self.retention] if self.retention > 0 else []
+        for name in expired:
+            shutil.rmtree(os.path.join(self.backup_dir, name), ignore_errors=True)
+        return expired
+    
+    # Restore
+    
+    def restore(self, name: str, collections: List[str] = None) -> List[str]:
+        """Restore collections (default: all) from a snapshot.
+        
+        Each collection is swapped in under its exclusive lock; running
+        StorageService instances see the new file and reload it.
+        """
+        snapshot_dir = os.path.join(self.backup_dir, name)
+        manifest_path = os.path.join(snapshot_dir, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            raise ValueError(f"No snapshot named '{name}' in {self.backup_dir}")
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        
+        available = set(manifest['files'])
+        restored = []
+        for collection in collections or manifest['collections']:
+            if collection not in manifest['collections']:
+                raise ValueError(f"Snapshot '{name}' has no collection '{collection}'")
+            base = f"{collection}.json"
+            with self._lock(collection).hold():
+                for filename in [base] + [base + suffix for suffix in JOURNAL_SUFFIXES]:
+                    live = os.path.join(self.data_dir, filename)
+                    stored = filename + '.gz' if manifest['mode'] == 'gzip' else filename
+                    if stored in available:
+                        self._load(os.path.join(snapshot_dir, stored), live, manifest['mode'])
+                    elif filename != base and os.path.exists(live):
+                        os.remove(live)
+            restored.append(collection)
+        return restored
+    
+    @staticmethod
+    def _load(stored: str, live: str, mode: str):
+        temp_path = live + '.restore'
+        if mode == 'gzip':
+            with gzip.open(stored, 'rb') as src, open(temp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            # A fresh copy, never a link back into the snapshot
+            shutil.copyfile(stored, temp_path)
+        os.replace(temp_path, live)
+    
+    # Scheduling
+    
+    def start(self, interval_minutes: float = None):
+        """Take a snapshot every interval_minutes in a background thread.
+        
+        Every worker process of the app runs this schedule; a worker skips
+        its turn when another one took a snapshot in the last half interval.
+        """
+        if self._timer is not None:
+            return
+        interval = (interval_minutes if interval_minutes is not None
+                    else DatabaseConfig.BACKUP_INTERVAL_MINUTES) * 60
+        if interval <= 0:
+            return
+        
+        def run():
+            try:
+                if self.seconds_since_snapshot() >= interval / 2:
+                    self.snapshot()
+            except Exception as e:
+                print(f"[BACKUP] Snapshot failed: {e}")
+            self._schedule(interval, run)
+        
+        self._schedule(interval, run)
+    
+    def _schedule(self, interval: float, run):
+        self._timer = threading.Timer(interval, run)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Snapshot and restore CampusIntelli data.')
+    parser.add_argument('--data-dir')
+    parser.add_argument('--backup-dir')
+    sub = parser.add_subparsers(dest='command', required=True)
+    snapshot = sub.add_parser('snapshot', help='Take a snapshot now')
+    snapshot.add_argument('--mode', choices=BackupService.MODES)
+    sub.add_parser('list', help='List snapshots')
+    restore = sub.add_parser('restore', help='Restore collections from a snapshot')
+    restore.add_argument('snapshot')
+    restore.add_argument('collections', nargs='*', help='Collections to restore (default: all)')
+    args = parser.parse_args(argv)
+    
+    service = BackupService(args.data_dir, args.backup_dir, mode=getattr(args, 'mode', None))
+    if args.command == 'snapshot':
+        print(f"[BACKUP] Created snapshot {service.snapshot()}")
+    elif args.command == 'list':
+        for name in service.list_snapshots():
+            print(name)
+    else:
+        restored = service.restore(args.snapshot, args.collections)
+        print(f"[BACKUP] Restored {', '.join(restored)} from {args.snapshot}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Bcrypt Pool - password hashing off the request threads
+
+bcrypt releases the GIL while it hashes, so a few dedicated worker
+threads hash on separate cores while request threads only wait for the
+result, and requests that do not hash are never stuck behind a login
+storm. The pool admits at most workers + max_queue jobs; past that,
+run() raises PoolSaturated (answered with 503 by the app) instead of
+letting the queue and the response times grow without bound. A job
+admitted but not done within the pool's timeout raises PoolSaturated too.
+
+Usage (from the project root), bcrypt latency per work factor:
+    python backend/services/bcrypt_pool.py bench [--rounds 10 11 12 13] [--samples 5]
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, List, Sequence
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool cannot take another job."""
+
+
+class BcryptPool:
+    """Run bcrypt calls on a bounded pool of worker threads."""
+    
+    def __init__(self, workers: int = None, max_queue: int = None, timeout: float = 30.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else self.workers * 8
+        self.timeout = timeout
+        self._slots = threading.Semaphore(self.workers + self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+        self._lock = threading.Lock()
+        self._admitted = 0  # jobs submitted and not finished
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._peak_queue = 0
+        self._wait_seconds = 0.0
+    
+    def submit(self, fn: Callable, *args, block: bool = False) -> Future:
+        """Queue fn(*args); raise PoolSaturated if full, unless block waits for room."""
+        if not self._slots.acquire(blocking=block):
+            with self._lock:
+                self._rejected += 1
+            raise PoolSaturated("Password hashing is at capacity")
+        submitted = time.perf_counter()
+        with self._lock:
+            self._admitted += 1
+            self._peak_queue = max(self._peak_queue, self._admitted - self._running)
+        
+        def job():
+            with self._lock:
+                self._running += 1
+                self._wait_seconds += time.perf_counter() - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+        
+        try:
+            future = self._executor.submit(job)
+        except BaseException:
+            self._finish(None)
+            raise
+        future.add_done_callback(self._finish)
+        return future
+    
+    def _finish(self, future):
+        with self._lock:
+            self._admitted -= 1
+            self._completed += future is not None
+        self._slots.release()
+    
+    def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool and return its result.
+        
+        Raises PoolSaturated if the pool is full or the job is not done
+        within the timeout.
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            # Drop the job if it has not started; its caller is gone
+            future.cancel()
+            with self._lock:
+                self._rejected += 1
+            raise PoolSaturated("Password hashing timed out") from None
+    
+    def map(self, fn: Callable, calls: Sequence[tuple]) -> List[Any]:
+        """Run fn(*args) for every args tuple in parallel, waiting for room as needed."""
+        futures = [self.submit(fn, *args, block=True) for args in calls]
+        return [future.result() for future in futures]
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'queue_depth': self._admitted - self._running,
+                'peak_queue_depth': self._peak_queue,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': round(self._wait_seconds / self._completed * 1000, 3) if self._completed else 0.0
+            }
+
+
+def bench(rounds: Sequence[int], samples: int = 5, workers: int = None):
+    """Print bcrypt hash latency per work factor and the login rate it allows."""
+    import bcrypt
+    
+    workers = workers or os.cpu_count() or 1
+    print(f"[BENCH] bcrypt, {samples} hashes per cost, throughput for {workers} worker(s)")
+    for cost in rounds:
+        timings = []
+        for _ in range(samples):
+            salt = bcrypt.gensalt(rounds=cost)
+            started = time.perf_counter()
+            bcrypt.hashpw(b'benchmark-password', salt)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        median = timings[len(timings) // 2]
+        print(f"[BENCH] cost {cost:2d}  median {median * 1000:8.1f} ms  "
+              f"min {timings[0] * 1000:8.1f} ms  max {timings[-1] * 1000:8.1f} ms  "
+              f"~{workers / median:7.1f} logins/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Password hashing tools.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    parser_bench = sub.add_parser('bench', help='Measure bcrypt latency per work factor')
+    parser_bench.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12, 13, 14])
+    parser_bench.add_argument('--samples', type=int, default=5)
+    parser_bench.add_argument('--workers', type=int, help='Workers to estimate throughput for (default: CPU count)')
+    args = parser.parse_args(argv)
+    
+    bench(args.rounds, args.samples, args.workers)
+
+
+# Shared pool behind AuthService.hash_password/verify_password
+bcrypt_pool = BcryptPool(
+    workers=int(os.environ.get('BCRYPT_WORKERS', '0')) or None,
+    max_queue=int(os.environ['BCRYPT_MAX_QUEUE']) if os.environ.get('BCRYPT_MAX_QUEUE') else None
+)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+"""
+Columnar Records - compact in-memory layout for large collections
+
+ColumnarRecords stands in for the id -> record dict of a cached
+collection and stores each field of a schema in its own column:
+
+- 'ref'        dictionary-encoded strings: repeated values (foreign ids,
+               dates, enums) are kept once and referenced by a 4-byte code
+- 'bool'       one byte per record
+- 'timestamp'  naive ISO timestamps (or None) as 8-byte microsecond counts
+- 'value'      anything else, as a plain object reference
+
+The id is only kept as the mapping key. Records are rebuilt when read,
+so every read returns a new (read-only) object. A record that does not
+match the schema exactly (other fields, another field order, a value of
+another type) is kept whole instead, so nothing is lost or reformatted.
+"""
+
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NO_TIME = -(1 << 63)
+_NO_KEY = object()
+
+# Slot table markers; other slots hold row numbers
+_EMPTY = -1
+_TOMBSTONE = -2
+
+# Deleted rows tolerated before the columns are repacked
+REPACK_THRESHOLD = 1024
+
+
+class _Misfit(Exception):
+    """A value the column cannot store."""
+
+
+class _RefColumn:
+    __slots__ = ('data', 'values', 'codes', 'decode')
+    filler = 0
+    
+    def __init__(self):
+        self.data = array('I')
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+        self.decode = self.values.__getitem__
+    
+    def encode(self, value: Any) -> int:
+        if value is not None and type(value) is not str:
+            raise _Misfit
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _BoolColumn:
+    __slots__ = ('data',)
+    filler = 0
+    
+    def __init__(self):
+        self.data = array('b')
+    
+    def encode(self, value: Any) -> int:
+        if type(value) is not bool:
+            raise _Misfit
+        return int(value)
+    
+    decode = staticmethod(bool)
+
+
+class _TimestampColumn:
+    __slots__ = ('data',)
+    filler = _NO_TIME
+    
+    def __init__(self):
+        self.data = array('q')
+    
+    def encode(self, value: Any) -> int:
+        if value is None:
+            return _NO_TIME
+        if type(value) is not str:
+            raise _Misfit
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise _Misfit
+        # Only values that format back to the very same string
+        if moment.tzinfo is not None or moment.isoformat() != value:
+            raise _Misfit
+        return (moment - _EPOCH) // _MICROSECOND
+    
+    def decode(self, code: int) -> Any:
+        if code == _NO_TIME:
+            return None
+        return (_EPOCH + timedelta(microseconds=code)).isoformat()
+
+
+class _ValueColumn:
+    __slots__ = ('data',)
+    filler = None
+    
+    def __init__(self):
+        self.data: List[Any] = []
+    
+    def encode(self, value: Any) -> Any:
+        return value
+    
+    def decode(self, value: Any) -> Any:
+        return value
+
+
+COLUMN_KINDS = {
+    'ref': _RefColumn,
+    'bool': _BoolColumn,
+    'timestamp': _TimestampColumn,
+    'value': _ValueColumn,
+}
+
+
+def _uuid_bytes(key: Any) -> Optional[bytes]:
+    """Return the 16 bytes of a canonical (lowercase) UUID string, else None."""
+    if type(key) is not str or len(key) != 36:
+        return None
+    try:
+        raw = bytes.fromhex(key[:8] + key[9:13] + key[14:18] + key[19:23] + key[24:])
+    except ValueError:
+        return None
+    if len(raw) != 16 or _uuid_str(raw) != key:
+        return None
+    return raw
+
+
+def _uuid_str(raw: bytes) -> str:
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+class ColumnarRecords(MutableMapping):
+    """An id -> record mapping that stores records column by column.
+    
+    columns lists (field, kind) pairs in the field order of the records,
+    starting with ('id', 'key'). factory builds the record objects that
+    reads return. values() and items() return one-shot iterators.
+    
+    UUID keys are kept as 16 raw bytes and found through an open
+    addressing table of row numbers, so no per-record key objects stay
+    in memory; other keys go to an ordinary dict.
+    """
+    
+    def __init__(self, columns: Sequence[Tuple[str, str]], factory: Callable[[Any], dict] = dict):
+        if not columns or tuple(columns[0]) != ('id', 'key'):
+            raise ValueError("The first column must be ('id', 'key')")
+        for field, kind in columns[1:]:
+            if kind not in COLUMN_KINDS:
+                raise ValueError(f"Unknown column kind '{kind}' for field '{field}'")
+        self.fields = tuple(field for field, _ in columns)
+        self._positions = {field: i for i, field in enumerate(self.fields)}
+        self._columns = [COLUMN_KINDS[kind]() for _, kind in columns[1:]]
+        self._factory = factory
+        self._reset()
+    
+    def _reset(self):
+        # Per row: 16 id bytes (zero for other keys) and a live flag
+        self._ids = bytearray()
+        self._live = bytearray()
+        self._count = 0
+        # Open addressing table of rows with UUID keys
+        self._slots = array('i', [_EMPTY]) * 8
+        self._used_slots = 0
+        # Rows whose key is not a UUID string
+        self._other_rows: Dict[Any, int] = {}
+        self._other_keys: Dict[int, Any] = {}
+        # row -> record, for records stored whole
+        self._whole: Dict[int, dict] = {}
+    
+    # Key lookup
+    
+    def _probe(self, raw: bytes) -> Tuple[int, int]:
+        """Return (slot, row) of a UUID key; row is -1 and slot free if absent."""
+        slots, ids = self._slots, self._ids
+        mask = len(slots) - 1
+        i = int.from_bytes(raw[:8], 'little') & mask
+        free = -1
+        while True:
+            row = slots[i]
+            if row == _EMPTY:
+                return (free if free >= 0 else i), -1
+            if row == _TOMBSTONE:
+                if free < 0:
+                    free = i
+            elif ids[row * 16:row * 16 + 16] == raw:
+                return i, row
+            i = (i + 1) & mask
+    
+    def _row_of(self, key: Any) -> int:
+        raw = _uuid_bytes(key)
+        if raw is None:
+            return self._other_rows.get(key, -1) if _hashable(key) else -1
+        return self._probe(raw)[1]
+    
+    def _key_of(self, row: int) -> Any:
+        key = self._other_keys.get(row, _NO_KEY)
+        if key is _NO_KEY:
+            key = _uuid_str(bytes(self._ids[row * 16:row * 16 + 16]))
+        return key
+    
+    def _grow(self):
+        """Rebuild the slot table with room for twice the live UUID rows."""
+        live = [row for row in range(len(self._live)) if self._live[row] and row not in self._other_keys]
+        size = 8
+        while size < 4 * len(live):
+            size *= 2
+        self._slots = array('i', [_EMPTY]) * size
+        self._used_slots = 0
+        for row in live:
+            slot, _ = self._probe(bytes(self._ids[row * 16:row * 16 + 16]))
+            self._slots[slot] = row
+            self._used_slots += 1
+    
+    # Records
+    
+    def _encode(self, key: Any, record: dict):
+        """Return the column values of a record, or None to store it whole."""
+        if type(key) is not str or tuple(record) != self.fields or record['id'] != key:
+            return None
+        try:
+            return [column.encode(record[field]) for column, field in zip(self._columns, self.fields[1:])]
+        except _Misfit:
+            return None
+    
+    def _record(self, row: int, key: Any) -> dict:
+        whole = self._whole.get(row)
+        if whole is not None:
+            return whole
+        values = [key]
+        for column in self._columns:
+            values.append(column.decode(column.data[row]))
+        return self._factory(zip(self.fields, values))
+    
+    def _get(self, row: int, field: str) -> Any:
+        """Return one field of a row (None if the record lacks it), without building the record."""
+        whole = self._whole.get(row)
+        if whole is not None:
+            return whole.get(field)
+        i = self._positions.get(field)
+        if i is None:
+            return None
+        if i == 0:
+            return self._key_of(row)
+        column = self._columns[i - 1]
+        return column.decode(column.data[row])
+    
+    def _matcher(self, field: str, value: Any) -> Callable[[int], bool]:
+        """Return a test of whether a row's field equals value."""
+        whole = self._whole
+        i = self._positions.get(field)
+        if i is None:
+            return lambda row: row in whole and whole[row].get(field) == value
+        column = self._columns[i - 1] if i else None
+        if isinstance(column, _RefColumn) and (value is None or type(value) is str):
+            # Compare dictionary codes; a value never stored has none
+            data, code = column.data, column.codes.get(value, -1)
+            return lambda row: whole[row].get(field) == value if row in whole else data[row] == code
+        return lambda row: self._get(row, field) == value
+    
+    def select(self, keys: Optional[Iterable[Any]], conditions: Sequence[Tuple[str, Any]],
+               fields: Sequence[str] = None, start: int = 0, stop: int = None) -> List[dict]:
+        """Return the records[start:stop] of those whose fields equal all conditions.
+        
+        keys limits the search to those keys (None: every record, in
+        order). Conditions are checked on the columns, and only returned
+        records are built, as plain dicts of `fields` if given.
+        """
+        if keys is None:
+            live = self._live
+            rows = (row for row in range(len(live)) if live[row])
+        else:
+            rows = (row for row in map(self._row_of, keys) if row >= 0)
+        for test in [self._matcher(field, value) for field, value in conditions]:
+            rows = filter(test, rows)
+        
+        page = []
+        for row in islice(rows, start, stop):
+            whole = self._whole.get(row)
+            if fields is None:
+                page.append(self._record(row, self._key_of(row)))
+            elif whole is not None:
+                page.append({f: whole[f] for f in fields if f in whole})
+            else:
+                page.append({f: self._get(row, f) for f in fields if f in self._positions})
+        return page
+    
+    def __getitem__(self, key: Any) -> dict:
+        row = self._row_of(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._record(row, key)
+    
+    def __setitem__(self, key: Any, record: dict):
+        encoded = self._encode(key, record)
+        raw = _uuid_bytes(key)
+        if raw is None:
+            row = self._other_rows.get(key, -1)
+        else:
+            slot, row = self._probe(raw)
+        
+        if row < 0:
+            row = len(self._live)
+            self._live.append(1)
+            self._count += 1
+            if raw is None:
+                self._ids.extend(bytes(16))
+                self._other_rows[key] = row
+                self._other_keys[row] = key
+            else:
+                self._ids.extend(raw)
+                if self._slots[slot] == _EMPTY:
+                    self._used_slots += 1
+                self._slots[slot] = row
+                if self._used_slots * 2 > len(self._slots):
+                    self._grow()
+            for column, value in zip(self._columns, encoded or [c.filler for c in self._columns]):
+                column.data.append(value)
+        elif encoded is not None:
+            for column, value in zip(self._columns, encoded):
+                column.data[row] = value
+        
+        if encoded is None:
+            self._whole[row] = record if type(record) is self._factory else self._factory(record)
+        else:
+            self._whole.pop(row, None)
+    
+    def __delitem__(self, key: Any):
+        raw = _uuid_bytes(key)
+        if raw is None:
+            row = self._other_rows.pop(key, -1) if _hashable(key) else -1
+            if row >= 0:
+                del self._other_keys[row]
+        else:
+            slot, row = self._probe(raw)
+            if row >= 0:
+                self._slots[slot] = _TOMBSTONE
+        if row < 0:
+            raise KeyError(key)
+        
+        self._live[row] = 0
+        self._count -= 1
+        self._whole.pop(row, None)
+        deleted = len(self._live) - self._count
+        if deleted > REPACK_THRESHOLD and deleted * 2 > len(self._live):
+            self._repack()
+    
+    def _repack(self):
+        """Drop the rows of deleted records from every column."""
+        live = [row for row in range(len(self._live)) if self._live[row]]
+        ids, whole, other_keys = self._ids, self._whole, self._other_keys
+        columns = [column.data for column in self._columns]
+        self._reset()
+        for new, old in enumerate(live):
+            self._ids += ids[old * 16:old * 16 + 16]
+            if old in whole:
+                self._whole[new] = whole[old]
+            if old in other_keys:
+                self._other_keys[new] = other_keys[old]
+                self._other_rows[other_keys[old]] = new
+        self._live = bytearray(b'\x01') * len(live)
+        self._count = len(live)
+        for column, data in zip(self._columns, columns):
+            if isinstance(data, array):
+                column.data = array(data.typecode, (data[row] for row in live))
+            else:
+                column.data = [data[row] for row in live]
+        self._grow()
+    
+    def __contains__(self, key: Any) -> bool:
+        return self._row_of(key) >= 0
+    
+    def __iter__(self) -> Iterator[Any]:
+        live = self._live
+        return (self._key_of(row) for row in range(len(live)) if live[row])
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def values(self) -> Iterator[dict]:
+        live = self._live
+        return (self._record(row, self._key_of(row)) for row in range(len(live)) if live[row])
+    
+    def items(self) -> Iterator[Tuple[Any, dict]]:
+        live = self._live
+        return ((key, self._record(row, key)) for key, row in
+                ((self._key_of(row), row) for row in range(len(live)) if live[row]))
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
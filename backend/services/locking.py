@@ -0,0 +1,131 @@
+"""
+Locking primitives for StorageService
+
+RWLock coordinates threads of one process; FileLock coordinates processes
+(e.g. several gunicorn workers) through fcntl advisory locks on a lock file.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+
+class RWLock:
+    """Reader/writer lock: many concurrent readers or one writer.
+    
+    Waiting writers are preferred so a steady stream of readers cannot
+    starve them. The writing thread may re-acquire the lock, for reading
+    or writing, while it holds it.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+    
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+    
+    def release_read(self):
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._writer_depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+    
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+    
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
+    
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class FileLock:
+    """Advisory lock on a file shared by every process using the same path.
+    
+    flock() locks belong to an open file description, so two holders in
+    the same process also exclude each other; StorageService takes the
+    in-process RWLock first to keep that from happening. Without fcntl
+    the lock always succeeds.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    @contextmanager
+    def hold(self, exclusive: bool = True, blocking: bool = True):
+        """Hold the lock for the duration of the block.
+        
+        Yields True once locked. With blocking=False, yields False right
+        away if another holder has it.
+        """
+        if fcntl is None:
+            yield True
+            return
+        
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(fd, flags)
+                acquired = True
+            except BlockingIOError:
+                acquired = False
+            
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -0,0 +1,234 @@
+"""
+QR Service - signed attendance QR codes and their images
+
+QRSigner - a signed payload carries everything needed to accept a scan:
+
+    A1|<course_id>|<lecture_id>|<expires, unix seconds>|<signature>
+
+The signature is an HMAC-SHA256 (truncated to 128 bits) of the other
+fields, so validating a scan is a pure CPU check with no storage lookup
+and any number of workers can verify codes independently. Codes are
+short-lived: the faculty screen asks for a fresh one for the same lecture
+every ROTATE_SECONDS, which makes a shared screenshot useless soon after.
+
+QRRenderer - draws QR images (PNG or SVG) on a thread or process pool,
+off the request thread, and keeps an LRU of recently rendered payloads.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from itertools import groupby
+from typing import Dict, Optional, Tuple
+
+import qrcode
+from PIL import Image
+
+
+class QRSigner:
+    """Issue and verify signed attendance QR payloads."""
+    
+    VERSION = 'A1'
+    # How often the faculty screen shows a new code
+    ROTATE_SECONDS = 15
+    # Extra validity after rotation, for scans already in flight
+    GRACE_SECONDS = 10
+    
+    def __init__(self, key: str, rotate_seconds: int = None, grace_seconds: int = None):
+        self.rotate_seconds = rotate_seconds if rotate_seconds is not None else self.ROTATE_SECONDS
+        self.grace_seconds = grace_seconds if grace_seconds is not None else self.GRACE_SECONDS
+        # Keyed once; each signature copies the prepared state
+        self._mac = hmac.new(key.encode('utf-8'), digestmod=hashlib.sha256)
+    
+    def _sign(self, message: str) -> str:
+        mac = self._mac.copy()
+        mac.update(message.encode('utf-8'))
+        return base64.urlsafe_b64encode(mac.digest()[:16]).rstrip(b'=').decode('ascii')
+    
+    def issue(self, course_id: str, lecture_id: str, now: float = None) -> dict:
+        """Return a signed payload for a lecture and when it expires."""
+        if '|' in course_id or '|' in lecture_id:
+            raise ValueError("course_id and lecture_id must not contain '|'")
+        now = time.time() if now is None else now
+        expires = int(now) + self.rotate_seconds + self.grace_seconds
+        message = f"{self.VERSION}|{course_id}|{lecture_id}|{expires}"
+        return {
+            'payload': f"{message}|{self._sign(message)}",
+            'course_id': course_id,
+            'lecture_id': lecture_id,
+            'generated_at': datetime.fromtimestamp(now).isoformat(),
+            'expires_at': datetime.fromtimestamp(expires).isoformat(),
+            'expires_in_seconds': expires - int(now),
+            'rotate_after_seconds': self.rotate_seconds
+        }
+    
+    @classmethod
+    def is_signed(cls, payload: str) -> bool:
+        return payload.startswith(cls.VERSION + '|')
+    
+    def verify(self, payload: str, now: float = None) -> Tuple[Optional[dict], Optional[str]]:
+        """Check a payload. Returns ({course_id, lecture_id}, None) or (None, error)."""
+        parts = payload.split('|')
+        if len(parts) != 5 or parts[0] != self.VERSION:
+            return None, "Invalid QR code"
+        message, signature = payload.rsplit('|', 1)
+        if not hmac.compare_digest(signature.encode('utf-8'), self._sign(message).encode('ascii')):
+            return None, "Invalid QR code"
+        try:
+            expires = int(parts[3])
+        except ValueError:
+            return None, "Invalid QR code"
+        if (time.time() if now is None else now) > expires:
+            return None, "QR code has expired"
+        return {'course_id': parts[1], 'lecture_id': parts[2]}, None
+
+
+def render_qr(data: str, fmt: str = 'png', box_size: int = 10, border: int = 5,
+              compress_level: int = 6) -> str:
+    """Render data as a QR code and return it as a data: URI.
+    
+    The module matrix is drawn directly: PNG as a 1-bit image scaled up
+    with nearest-neighbour resampling, SVG as one path of horizontal runs.
+    A 1-bit PNG at compress_level 6 is about half the size of the default
+    greyscale output and costs well under a millisecond to encode; the
+    time goes into building the matrix.
+    """
+    qr = qrcode.QRCode(version=1, box_size=box_size, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    size = len(matrix)
+    
+    if fmt == 'svg':
+        path = []
+        for y, row in enumerate(matrix):
+            x = 0
+            for dark, run in groupby(row):
+                length = sum(1 for _ in run)
+                if dark:
+                    path.append(f"M{x} {y}h{length}v1h-{length}z")
+                x += length
+        svg = (
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+            f'width="{size * box_size}" height="{size * box_size}" shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{"".join(path)}" fill="#000"/></svg>'
+        )
+        return "data:image/svg+xml;base64," + base64.b64encode(svg.encode('utf-8')).decode('ascii')
+    
+    image = Image.new('1', (size, size))
+    image.putdata([0 if dark else 255 for row in matrix for dark in row])
+    image = image.resize((size * box_size, size * box_size), Image.NEAREST)
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', compress_level=compress_level)
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+class QRRenderer:
+    """Render QR images on a worker pool, caching recent payloads.
+    
+    Identical payloads requested at the same time are rendered once.
+    Latencies of render() calls, cache hits included, are kept for the
+    last LATENCY_SAMPLES calls and summarised by stats().
+    """
+    
+    FORMATS = ('png', 'svg')
+    LATENCY_SAMPLES = 1024
+    
+    def __init__(self, workers: int = 4, cache_size: int = 256, use_processes: bool = False,
+                 box_size: int = 10, border: int = 5, compress_level: int = 6):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.use_processes = use_processes
+        self.options = {'box_size': box_size, 'border': border, 'compress_level': compress_level}
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        # (format, data) -> data URI, least recently used first
+        self._cache: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        self._latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._renders = 0
+        self._hits = 0
+        self._joined = 0
+    
+    def _executor(self) -> Executor:
+        # Called with self._lock held
+        if self._pool is None:
+            pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._pool = pool_class(max_workers=self.workers)
+        return self._pool
+    
+    def render(self, data: str, fmt: str = 'png', timeout: float = 10.0) -> str:
+        """Return the QR image of data as a data: URI."""
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown QR image format '{fmt}'. Must be one of: {', '.join(self.FORMATS)}")
+        started = time.perf_counter()
+        key = (fmt, data)
+        with self._lock:
+            uri = self._cache.get(key)
+            if uri is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+            else:
+                future = self._pending.get(key)
+                if future is None:
+                    future = self._pending[key] = self._executor().submit(render_qr, data, fmt, **self.options)
+                    self._renders += 1
+                else:
+                    self._joined += 1
+        
+        if uri is None:
+            try:
+                uri = future.result(timeout)
+            finally:
+                with self._lock:
+                    if self._pending.get(key) is future:
+                        del self._pending[key]
+                        if future.done() and future.exception() is None:
+                            self._cache[key] = future.result()
+                            while len(self._cache) > self.cache_size:
+                                self._cache.popitem(last=False)
+        
+        self._latencies.append(time.perf_counter() - started)
+        return uri
+    
+    def stats(self) -> dict:
+        """Return render and cache counters and latency percentiles in ms."""
+        samples = sorted(self._latencies)
+        
+        def percentile(p):
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000, 3)
+        
+        return {
+            'renders': self._renders,
+            'cache_hits': self._hits,
+            'joined_renders': self._joined,
+            'cached': len(self._cache),
+            'latency_ms': {
+                'p50': percentile(50),
+                'p95': percentile(95),
+                'p99': percentile(99),
+                'max': percentile(100)
+            }
+        }
+    
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+# Shared renderer for the attendance routes
+qr_renderer = QRRenderer(
+    workers=int(os.environ.get('QR_RENDER_WORKERS', '4')),
+    use_processes=os.environ.get('QR_RENDER_PROCESSES', 'false').lower() in ('1', 'true', 'yes')
+)
@@ -0,0 +1,405 @@
+"""
+SQLite Storage Service - StorageService backend on an indexed database
+
+Each collection lives in the stored_records table (database/models.py) as
+one JSON document per row. Fields declared in StorageService.INDEXES get a
+partial expression index per collection, so lookups use SQLite indexes
+instead of scanning.
+"""
+
+import json
+import os
+import re
+import sys
+from datetime import datetime
+from typing import List, Optional, Any, Callable, Dict, Iterator, Sequence, Tuple
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from database import create_db_engine
+from database.config import DatabaseConfig
+from database.models import StoredRecord
+from services.storage_service import StorageService, cursor_values, encode_cursor, sort_value
+
+_IDENTIFIER = re.compile(r'^[A-Za-z0-9_]+$')
+
+
+def _check_identifier(name: str) -> str:
+    """Collection and field names are inlined into SQL, so keep them plain."""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid collection or field name: {name!r}")
+    return name
+
+
+def _field_expr(field: str) -> str:
+    if field == 'id':
+        return 'record_id'
+    return f"json_extract(data, '$.\"{_check_identifier(field)}\"')"
+
+
+def _sort_exprs(field: str) -> Tuple[str, str]:
+    """SQL for the (type rank, value) pair storage_service.sort_value gives a field.
+    
+    Lists and dicts order by their minified JSON text here, not by the
+    key-sorted text the JSON backend uses.
+    """
+    path = f"'$.\"{_check_identifier(field)}\"'"
+    rank = (f"CASE json_type(data, {path}) WHEN 'true' THEN 1 WHEN 'false' THEN 1 "
+            f"WHEN 'integer' THEN 2 WHEN 'real' THEN 2 WHEN 'text' THEN 3 "
+            f"WHEN 'array' THEN 4 WHEN 'object' THEN 4 ELSE 0 END")
+    return rank, f"COALESCE(json_extract(data, {path}), 0)"
+
+
+def _bind_value(value: Any) -> Any:
+    # json_extract returns arrays and objects as minified JSON text
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    return value
+
+
+class SQLiteStorageService:
+    """StorageService-compatible CRUD/query API on SQLite."""
+    
+    INDEXES = StorageService.INDEXES
+    TTL_COLLECTIONS = StorageService.TTL_COLLECTIONS
+    TTL_FIELD = StorageService.TTL_FIELD
+    
+    def __init__(self, engine=None):
+        self.engine = engine or create_db_engine(DatabaseConfig.SQLITE_URL)
+        StoredRecord.__table__.create(self.engine, checkfirst=True)
+        self._index_specs = {name: list(specs) for name, specs in self.INDEXES.items()}
+        self._indexed = set()
+        self._ttl = set(self.TTL_COLLECTIONS)
+        self._queries = 0
+    
+    # Indexes
+    
+    def create_index(self, collection: str, *fields: str):
+        """Declare a secondary index on one field or a composite of fields."""
+        if not fields:
+            raise ValueError("create_index() needs at least one field")
+        specs = self._index_specs.setdefault(collection, [])
+        if tuple(fields) not in specs:
+            specs.append(tuple(fields))
+            self._indexed.discard(collection)
+    
+    def _ensure_indexes(self, conn, collection: str):
+        """Create the partial expression indexes of a collection once."""
+        if collection in self._indexed:
+            return
+        _check_identifier(collection)
+        for fields in self._index_specs.get(collection, []):
+            name = f"ix_stored_records_{collection}_{'_'.join(fields)}"
+            columns = ', '.join(_field_expr(f) for f in fields)
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON stored_records ({columns}) "
+                f"WHERE collection = '{collection}'"
+            ))
+        self._indexed.add(collection)
+    
+    def _where(self, collection: str, filters: dict) -> Tuple[List[str], dict]:
+        """Return the WHERE clauses and parameters for equality filters on a collection."""
+        # The collection is inlined so SQLite can match the partial indexes
+        clauses = [f"collection = '{_check_identifier(collection)}'"]
+        params = {}
+        for i, (field, value) in enumerate(filters.items()):
+            if value is None:
+                clauses.append(f"{_field_expr(field)} IS NULL")
+            else:
+                clauses.append(f"{_field_expr(field)} = :v{i}")
+                params[f'v{i}'] = _bind_value(value)
+        if collection in self._ttl:
+            # Same rule as the JSON backend: only text timestamps expire
+            clauses.append(f"NOT ({self._expired_clause()})")
+            params['now'] = datetime.now().isoformat()
+        return clauses, params
+    
+    def _select(self, collection: str, filters: dict, columns: str = 'data',
+                limit: int = None, offset: int = 0) -> list:
+        """Run a SELECT over one collection with equality filters."""
+        clauses, params = self._where(collection, filters)
+        sql = f"SELECT {columns} FROM stored_records WHERE {' AND '.join(clauses)} ORDER BY seq"
+        if limit is not None or offset:
+            sql += " LIMIT :limit OFFSET :offset"
+            params.update(limit=-1 if limit is None else limit, offset=offset)
+        
+        with self.engine.begin() as conn:
+            self._ensure_indexes(conn, collection)
+            self._queries += 1
+            return conn.execute(text(sql), params).fetchall()
+    
+    # Expiry
+    
+    def enable_ttl(self, collection: str):
+        """Let the records of a collection expire at their TTL_FIELD timestamp."""
+        self._ttl.add(collection)
+    
+    def _expired_clause(self) -> str:
+        path = f"'$.\"{_check_identifier(self.TTL_FIELD)}\"'"
+        return f"json_type(data, {path}) IS 'text' AND json_extract(data, {path}) <= :now"
+    
+    def purge_expired(self, collection: str = None) -> int:
+        """Delete expired records from one TTL collection, or from all; return how many."""
+        purged = 0
+        now = datetime.now().isoformat()
+        with self.engine.begin() as conn:
+            for name in [collection] if collection else sorted(self._ttl):
+                if name not in self._ttl:
+                    continue
+                purged += conn.execute(
+                    text(f"DELETE FROM stored_records WHERE collection = :c AND {self._expired_clause()}"),
+                    {'c': name, 'now': now}
+                ).rowcount
+        return purged
+    
+    # Compatibility with the JSON backend
+    
+    def invalidate(self, collection: str = None):
+        """Nothing is cached in process; present for API compatibility."""
+    
+    def cache_stats(self) -> dict:
+        """Return query counters."""
+        return {
+            'backend': 'sqlite',
+            'queries': self._queries,
+            'indexed_collections': len(self._indexed)
+        }
+    
+    # CRUD Operations
+    
+    def get_all(self, collection: str) -> List[dict]:
+        """Get all records from a collection."""
+        return [json.loads(row.data) for row in self._select(collection, {})]
+    
+    def get_by_id(self, collection: str, id: str) -> Optional[dict]:
+        """Get a single record by ID."""
+        rows = self._select(collection, {'id': id})
+        return json.loads(rows[0].data) if rows else None
+    
+    def get_by_field(self, collection: str, field: str, value: Any) -> List[dict]:
+        """Get records matching a field value."""
+        return [json.loads(row.data) for row in self._select(collection, {field: value})]
+    
+    def create(self, collection: str, record: dict) -> dict:
+        """Create a new record."""
+        with self.engine.begin() as conn:
+            self._ensure_indexes(conn, collection)
+            conn.execute(
+                text("INSERT INTO stored_records (collection, record_id, data) VALUES (:c, :id, :data)"),
+                {'c': collection, 'id': record.get('id'), 'data': json.dumps(record, ensure_ascii=False)}
+            )
+        return record
+    
+    def update(self, collection: str, id: str, updates: dict) -> Optional[dict]:
+        """Update an existing record."""
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                text("SELECT seq, data FROM stored_records WHERE collection = :c AND record_id = :id"),
+                {'c': collection, 'id': id}
+            ).first()
+            if row is None:
+                return None
+            
+            updated = {**json.loads(row.data), **updates}
+            conn.execute(
+                text("UPDATE stored_records SET record_id = :id, data = :data WHERE seq = :seq"),
+                {'id': updated.get('id'), 'data': json.dumps(updated, ensure_ascii=False), 'seq': row.seq}
+            )
+        return updated
+    
+    def delete(self, collection: str, id: str) -> bool:
+        """Delete a record by ID."""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                text("DELETE FROM stored_records WHERE collection = :c AND record_id = :id"),
+                {'c': collection, 'id': id}
+            )
+        return result.rowcount > 0
+    
+    def _insert_if_absent(self, collection: str, key_fields: Sequence[str]):
+        """INSERT that does nothing if a record with the same key_fields values exists.
+        
+        One statement, so the check and the insert are atomic under
+        SQLite's write lock, whatever other processes do.
+        """
+        clauses = [f"collection = '{_check_identifier(collection)}'"]
+        clauses += [f"{_field_expr(f)} IS :k{i}" for i, f in enumerate(key_fields)]
+        return text(
+            "INSERT INTO stored_records (collection, record_id, data) SELECT :c, :id, :data "
+            f"WHERE NOT EXISTS (SELECT 1 FROM stored_records WHERE {' AND '.join(clauses)})"
+        )
+    
+    def create_many(self, collection: str, records: List[dict], unique: Sequence[str] = None) -> List[dict]:
+        """Create several records in one transaction and return the ones created.
+        
+        With unique, a record whose unique fields equal those of a stored
+        record, or of an earlier record of the batch, is skipped.
+        """
+        if not records:
+            return records
+        rows = [{'c': collection, 'id': r.get('id'), 'data': json.dumps(r, ensure_ascii=False)} for r in records]
+        with self.engine.begin() as conn:
+            self._ensure_indexes(conn, collection)
+            if not unique:
+                conn.execute(
+                    text("INSERT INTO stored_records (collection, record_id, data) VALUES (:c, :id, :data)"),
+                    rows
+                )
+                return records
+            insert = self._insert_if_absent(collection, unique)
+            created = []
+            for record, row in zip(records, rows):
+                row.update((f'k{i}', _bind_value(record.get(f))) for i, f in enumerate(unique))
+                if conn.execute(insert, row).rowcount:
+                    created.append(record)
+        return created
+    
+    def update_many(self, collection: str, updates: Dict[str, dict]) -> List[dict]:
+        """Apply {id: changes} to several records in one transaction."""
+        updated = []
+        with self.engine.begin() as conn:
+            for id, changes in updates.items():
+                row = conn.execute(
+                    text("SELECT seq, data FROM stored_records WHERE collection = :c AND record_id = :id"),
+                    {'c': collection, 'id': id}
+                ).first()
+                if row is None:
+                    continue
+                record = {**json.loads(row.data), **changes}
+                conn.execute(
+                    text("UPDATE stored_records SET record_id = :id, data = :data WHERE seq = :seq"),
+                    {'id': record.get('id'), 'data': json.dumps(record, ensure_ascii=False), 'seq': row.seq}
+                )
+                updated.append(record)
+        return updated
+    
+    def upsert_many(self, collection: str, records: List[dict],
+                    key_fields: Sequence[str]) -> Tuple[List[dict], List[dict]]:
+        """Create records, or update the record that has the same key_fields values.
+        
+        Stored records keep their id. Returns (created, updated), written
+        in one transaction. Each record is first inserted if its key is
+        absent, so concurrent writers cannot both create the same key.
+        """
+        clauses = [f"collection = '{_check_identifier(collection)}'"]
+        clauses += [f"{_field_expr(f)} IS :k{i}" for i, f in enumerate(key_fields)]
+        match_sql = text(f"SELECT seq, data FROM stored_records WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT 1")
+        insert = self._insert_if_absent(collection, key_fields)
+        created, updated = [], []
+        with self.engine.begin() as conn:
+            self._ensure_indexes(conn, collection)
+            for record in records:
+                params = {f'k{i}': _bind_value(record.get(f)) for i, f in enumerate(key_fields)}
+                inserted = conn.execute(insert, {
+                    **params, 'c': collection, 'id': record.get('id'),
+                    'data': json.dumps(record, ensure_ascii=False)
+                }).rowcount
+                if inserted:
+                    created.append(record)
+                else:
+                    row = conn.execute(match_sql, params).first()
+                    stored = json.loads(row.data)
+                    stored.update({f: v for f, v in record.items() if f != 'id'})
+                    conn.execute(
+                        text("UPDATE stored_records SET data = :data WHERE seq = :seq"),
+                        {'data': json.dumps(stored, ensure_ascii=False), 'seq': row.seq}
+                    )
+                    updated.append(stored)
+        return created, updated
+    
+    def delete_many(self, collection: str, ids: List[str]) -> int:
+        """Delete several records by ID in one transaction."""
+        deleted = 0
+        with self.engine.begin() as conn:
+            for id in ids:
+                deleted += conn.execute(
+                    text("DELETE FROM stored_records WHERE collection = :c AND record_id = :id"),
+                    {'c': collection, 'id': id}
+                ).rowcount
+        return deleted
+    
+    def find(self, collection: str, filters: dict = None, fields: List[str] = None,
+             limit: int = None, offset: int = 0) -> Iterator[dict]:
+        """Yield records matching filters, optionally projected to fields."""
+        for row in self._select(collection, filters or {}, limit=limit, offset=offset):
+            record = json.loads(row.data)
+            yield record if fields is None else {f: record[f] for f in fields if f in record}
+    
+    def first(self, collection: str, filters: dict = None, fields: List[str] = None) -> Optional[dict]:
+        """Return the first record matching filters, or None."""
+        return next(self.find(collection, filters, fields, limit=1), None)
+    
+    def paginate(self, collection: str, filters: dict = None, sort: List[str] = None,
+                 limit: int = 50, cursor: str = None, offset: int = 0,
+                 fields: List[str] = None, where: Callable[[dict], bool] = None) -> Tuple[List[dict], Optional[str]]:
+        """Return one page of records in sort order and the cursor of the next page.
+        
+        Same contract as StorageService.paginate, with cursors valid for
+        either backend. Filters, the order and the keyset predicate after
+        the cursor all run in SQLite, which returns just the page; only a
+        where predicate is applied here, to rows streamed in order.
+        """
+        sort = tuple(sort or ('id',))
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        clauses, params = self._where(collection, filters)
+        
+        # (expression, descending) per sort field and the id tie-breaker,
+        # each as a type rank followed by the value
+        columns = []
+        for field in sort + ('id',):
+            columns.extend((expr, field.startswith('-')) for expr in _sort_exprs(field.lstrip('-')))
+        if cursor:
+            bounds = [part for value in cursor_values(cursor, sort) for part in sort_value(value)]
+            alternatives = []
+            for i, (expr, descending) in enumerate(columns):
+                terms = [f"{columns[j][0]} IS :k{j}" for j in range(i)]
+                terms.append(f"{expr} {'<' if descending else '>'} :k{i}")
+                alternatives.append(f"({' AND '.join(terms)})")
+            clauses.append(f"({' OR '.join(alternatives)})")
+            params.update((f'k{i}', bound) for i, bound in enumerate(bounds))
+        order = ', '.join(f"{expr} {'DESC' if descending else 'ASC'}" for expr, descending in columns)
+        sql = f"SELECT data FROM stored_records WHERE {' AND '.join(clauses)} ORDER BY {order}"
+        
+        with self.engine.begin() as conn:
+            self._ensure_indexes(conn, collection)
+            self._queries += 1
+            if where is None:
+                rows = conn.execute(text(sql + " LIMIT :limit OFFSET :offset"),
+                                    {**params, 'limit': limit + 1, 'offset': offset})
+                page = [json.loads(row.data) for row in rows]
+            else:
+                page = []
+                skip = offset
+                for row in conn.execute(text(sql), params):
+                    record = json.loads(row.data)
+                    if not where(record):
+                        continue
+                    if skip:
+                        skip -= 1
+                        continue
+                    page.append(record)
+                    if len(page) > limit:
+                        break
+        
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1], sort)
+        if fields is not None:
+            page = [{f: r[f] for f in fields if f in r} for r in page]
+        return page, next_cursor
+    
+    def query(self, collection: str, filters: dict, fields: List[str] = None,
+              limit: int = None, offset: int = 0) -> List[dict]:
+        """Query records with multiple filters."""
+        filters = {field: value for field, value in filters.items() if value is not None}
+        return list(self.find(collection, filters, fields, limit, offset))
+    
+    def count(self, collection: str, filters: dict = None, where: Callable[[dict], bool] = None) -> int:
+        """Count records, optionally with filters and an extra predicate."""
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        if where is not None:
+            return sum(1 for row in self._select(collection, filters) if where(json.loads(row.data)))
+        return self._select(collection, filters, columns='COUNT(*) AS n')[0].n
@@ -0,0 +1,106 @@
+"""
+Storage Formats - on-disk encodings for collection files
+
+- 'pretty'  indented JSON array (human-readable; small config collections)
+- 'json'    compact JSON array
+- 'jsonl'   one JSON object per line
+- 'msgpack' MessagePack array (only if the msgpack package is installed)
+
+Files keep their <collection>.json name whatever the format; readers detect
+the encoding from the first byte, so a collection can change format at
+any time and is rewritten in the new one on its next write.
+"""
+
+import json
+import logging
+from typing import Iterator, List
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMATS = ('pretty', 'json', 'jsonl', 'msgpack')
+
+# Flask's app.logger
+logger = logging.getLogger('app')
+
+
+class FormatUnavailable(Exception):
+    """Raised reading a file whose format needs a package that is not installed.
+    
+    Not a ValueError: the file is not empty or corrupt and must not be
+    read as an empty collection (and then overwritten).
+    """
+
+
+def resolve(fmt: str) -> str:
+    """Validate a format name, falling back to compact JSON without msgpack."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown storage format '{fmt}'. Must be one of: {', '.join(FORMATS)}")
+    if fmt == 'msgpack' and msgpack is None:
+        logger.warning("msgpack is not installed; using compact JSON instead")
+        return 'json'
+    return fmt
+
+
+def dump(path: str, data: List[dict], fmt: str):
+    """Write records to path in the given format."""
+    if fmt == 'msgpack':
+        with open(path, 'wb') as f:
+            msgpack.pack(data, f, use_bin_type=True)
+        return
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'pretty':
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        elif fmt == 'json':
+            json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+        else:
+            f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in data)
+
+
+def detect(head: bytes) -> str:
+    """Guess the format of a file from its first bytes."""
+    stripped = head.lstrip()
+    if not stripped:
+        return 'json'
+    if stripped[:1] == b'[':
+        return 'json'
+    if stripped[:1] == b'{':
+        return 'jsonl'
+    return 'msgpack'
+
+
+def load(path: str) -> List[dict]:
+    """Read the records of a file in any supported format.
+    
+    Raises ValueError if the content cannot be decoded and
+    FormatUnavailable if its format cannot be read here.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    
+    fmt = detect(content[:64])
+    if fmt == 'msgpack':
+        if msgpack is None:
+            raise FormatUnavailable(f"{path} is msgpack-encoded but msgpack is not installed")
+        try:
+            return msgpack.unpackb(content, raw=False)
+        except Exception as e:
+            raise ValueError(f"{path}: {e}") from e
+    
+    text = content.decode('utf-8')
+    if fmt == 'jsonl':
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return json.loads(text) if text.strip() else []
+
+
+def iter_msgpack(path: str) -> Iterator[dict]:
+    """Yield the records of a msgpack file without loading it whole."""
+    if msgpack is None:
+        raise FormatUnavailable(f"{path} is msgpack-encoded but msgpack is not installed")
+    with open(path, 'rb') as f:
+        unpacker = msgpack.Unpacker(f, raw=False)
+        unpacker.read_array_header()
+        yield from unpacker
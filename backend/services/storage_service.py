@@ -2,135 +2,1188 @@
 Storage Service - JSON-based local storage
 """
 
+import base64
+import bisect
 import json
 import os
-from typing import List, Optional, Any
+from contextlib import contextmanager
+from itertools import islice
+from typing import List, Optional, Any, Callable, Dict, Iterable, Iterator, Sequence, Tuple
 from datetime import datetime
-import shutil
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+from services.locking import RWLock, FileLock
+from services import storage_formats
+from services.columnar import ColumnarRecords
+
+
+class FrozenRecord(dict):
+    """A read-only dict: the record objects StorageService hands out.
+    
+    Readers get the cached records themselves instead of copies, so they
+    cannot be changed in place. Build a new dict to enrich one for a
+    response ({**record, 'extra': ...}) and pass changes to update().
+    dict(record), record.copy() and copy.copy() return mutable copies.
+    Nested lists and dicts are shared with the cache and must be treated
+    as read-only too.
+    """
+    
+    __slots__ = ()
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Stored records are read-only; copy with dict(record) or pass changes to update()")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    pop = popitem = setdefault = update = clear = _readonly
+    
+    def __copy__(self):
+        return dict(self)
+    
+    def __deepcopy__(self, memo):
+        import copy
+        return copy.deepcopy(dict(self), memo)
+    
+    def __reduce__(self):
+        return (FrozenRecord, (dict(self),))
 
 
 class StorageService:
-    """Service for reading and writing JSON data files."""
+    """Service for reading and writing JSON data files.
+    
+    Parsed collections are cached in memory and reused until the file's
+    mtime or size changes, or until this service writes the collection.
+    Readers get the cached records as FrozenRecord objects, without
+    copying. Collections given a schema in `columnar` are cached column
+    by column instead (see services/columnar.py), which takes a fraction
+    of the memory; their records are rebuilt, still read-only, per read,
+    and find() matches and projects on the columns, building only the
+    records it returns.
+    Lookups on fields listed in INDEXES (or added with create_index) are
+    answered from hash indexes instead of scanning the collection.
+    
+    In collections listed in TTL_COLLECTIONS (or added with enable_ttl),
+    records whose TTL_FIELD timestamp has passed are left out of every
+    read and deleted by purge_expired(), which ExpirySweeper runs in the
+    background.
+    
+    Two write engines are available (DatabaseConfig.JSON_ENGINE):
+    - 'file' rewrites the whole collection file on every mutation.
+    - 'journal' appends one JSON line per mutation to <file>.journal and
+      folds the journal back into the collection file in the background
+      once it grows past JOURNAL_COMPACT_THRESHOLD entries.
+    
+    With group_commit enabled, mutations are applied in memory right away
+    and written in batches: the first writer waits up to commit_window
+    seconds (or until commit_batch_size mutations are pending), then one
+    file write or journal fsync covers the whole batch. Every caller
+    returns only once the write covering its mutation is durable.
+    
+    Collection files are written in `default_format` unless `formats`
+    names another one for the collection (see services/storage_formats.py);
+    reads detect the format, so switching formats needs no migration.
+    
+    Each collection has a reader/writer lock, so reads run concurrently
+    and writes are exclusive within the process, and an fcntl lock on
+    <file>.lock that extends the same rules to other processes. A writer
+    always re-reads the collection if another process changed it.
+    """
+    
+    ENGINES = ('file', 'journal')
+    
+    # Journal entries per collection before a background compaction
+    JOURNAL_COMPACT_THRESHOLD = 1000
+    
+    # Collection files created (empty) when missing; pass `collections`
+    # to open only some of them
+    COLLECTIONS = (
+        'users', 'courses', 'timetable',
+        'assignments', 'submissions', 'grades',
+        'rooms', 'bookings',
+        'attendance', 'qrcodes',
+        'announcements'
+    )
+    
+    # Secondary indexes per collection; each entry is a tuple of fields
+    INDEXES = {
+        'users': [('email',), ('role',)],
+        'submissions': [('student_id',), ('assignment_id',)],
+        'grades': [('student_id',), ('assignment_id',), ('course_id',)],
+        'attendance': [('student_id',), ('date',), ('course_id', 'student_id', 'date', 'lecture_id')],
+        'bookings': [('date',), ('user_id',)],
+        'qrcodes': [('code_data',)],
+        'materials': [('course_id',)],
+        'courses': [('instructor_id',)],
+    }
     
-    def __init__(self, data_dir: str = None):
+    # Collections whose records expire at the ISO timestamp in TTL_FIELD
+    TTL_COLLECTIONS = ('qrcodes', 'revoked_tokens', 'principal_invalidations')
+    TTL_FIELD = 'expires_at'
+    
+    def __init__(self, data_dir: str = None, engine: str = None, group_commit: bool = False,
+                 commit_window: float = 0.005, commit_batch_size: int = 256,
+                 default_format: str = 'pretty', formats: Dict[str, str] = None,
+                 columnar: Dict[str, Sequence[Tuple[str, str]]] = None,
+                 collections: Sequence[str] = None):
         self.data_dir = data_dir or os.path.join(
             os.path.dirname(__file__), '..', '..', 'data'
         )
+        self.engine = engine or 'file'
+        if self.engine not in self.ENGINES:
+            raise ValueError(f"Unknown storage engine '{self.engine}'. Must be one of: {', '.join(self.ENGINES)}")
+        
+        self.default_format = storage_formats.resolve(default_format)
+        self.formats = {name: storage_formats.resolve(fmt) for name, fmt in (formats or {}).items()}
+        self.columnar = dict(columnar or {})
+        
+        # filepath -> parsed records and indexes
+        self._cache: Dict[str, _CachedCollection] = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._index_lookups = 0
+        self._index_specs = {name: list(specs) for name, specs in self.INDEXES.items()}
+        self._ttl = set(self.TTL_COLLECTIONS)
+        # filepath -> in-process reader/writer lock
+        self._rwlocks: Dict[str, RWLock] = {}
+        self._state_lock = threading.Lock()
+        self._compacting = set()
+        self.group_commit = group_commit
+        self.commit_window = commit_window
+        self.commit_batch_size = commit_batch_size
+        # filepath -> pending group commit state
+        self._commit_groups: Dict[str, _CommitGroup] = {}
+        self._commit_batches = 0
+        self._committed_writes = 0
         os.makedirs(self.data_dir, exist_ok=True)
-        self._initialize_data_files()
+        self._initialize_data_files(self.COLLECTIONS if collections is None else collections)
     
-    def _initialize_data_files(self):
+    def _initialize_data_files(self, collections: Sequence[str]):
         """Create empty data files if they don't exist."""
-        files = [
-            'users.json', 'courses.json', 'timetable.json',
-            'assignments.json', 'submissions.json', 'grades.json',
-            'rooms.json', 'bookings.json',
-            'attendance.json', 'qrcodes.json',
-            'announcements.json'
-        ]
-        for filename in files:
-            filepath = os.path.join(self.data_dir, filename)
+        for collection in collections:
+            filepath = self._get_filepath(collection)
             if not os.path.exists(filepath):
-                self._write_file(filepath, [])
+                with FileLock(filepath + '.lock').hold():
+                    if not os.path.exists(filepath):
+                        self._write_file(filepath, [])
     
     def _get_filepath(self, collection: str) -> str:
         """Get full path for a collection file."""
         return os.path.join(self.data_dir, f"{collection}.json")
     
+    @staticmethod
+    def _collection_of(filepath: str) -> str:
+        return os.path.basename(filepath)[:-len('.json')]
+    
+    def _format_for(self, filepath: str) -> str:
+        """Return the storage format configured for a collection file."""
+        return self.formats.get(self._collection_of(filepath), self.default_format)
+    
     def _read_file(self, filepath: str) -> List[dict]:
-        """Read JSON file and return data."""
+        """Read a collection file in whichever format it was written.
+        
+        storage_formats.FormatUnavailable propagates, so a file that cannot
+        be decoded here fails reads and writes instead of being replaced.
+        """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            return storage_formats.load(filepath)
+        except (ValueError, FileNotFoundError):
             return []
     
     def _write_file(self, filepath: str, data: List[dict]):
-        """Write data to JSON file with backup."""
-        # Create backup before writing
-        if os.path.exists(filepath):
-            backup_path = filepath + '.backup'
-            shutil.copy2(filepath, backup_path)
-        
+        """Write a collection file; backups are taken by services/backup_service.py."""
         # Write atomically (write to temp, then rename)
         temp_path = filepath + '.tmp'
-        with open(temp_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        storage_formats.dump(temp_path, data, self._format_for(filepath))
         
         # Replace original with temp
         os.replace(temp_path, filepath)
     
+    # Locking
+    
+    def _rwlock(self, filepath: str) -> RWLock:
+        lock = self._rwlocks.get(filepath)
+        if lock is None:
+            with self._state_lock:
+                lock = self._rwlocks.setdefault(filepath, RWLock())
+        return lock
+    
+    @contextmanager
+    def _reading(self, collection: str):
+        """Share a collection with other readers of this process.
+        
+        The file lock is only taken if the cache has to be reloaded.
+        """
+        with self._rwlock(self._get_filepath(collection)).read():
+            yield
+    
+    @contextmanager
+    def _writing(self, collection: str):
+        """Hold a collection exclusively, in this process and across processes."""
+        filepath = self._get_filepath(collection)
+        with self._rwlock(filepath).write(), FileLock(filepath + '.lock').hold():
+            yield
+    
+    # Journal
+    
+    @staticmethod
+    def _journal_paths(filepath: str) -> Tuple[str, str]:
+        """Return (live journal, journal being compacted) for a collection file."""
+        return filepath + '.journal', filepath + '.journal.compacting'
+    
+    @staticmethod
+    def _journal_line(op: dict) -> str:
+        return json.dumps(op, ensure_ascii=False) + '\n'
+    
+    def _append_journal(self, filepath: str, lines: List[str]):
+        """Append mutations to the journal and flush them to disk."""
+        journal_path, _ = self._journal_paths(filepath)
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write(''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _replay_journal(self, journal_path: str, entry: '_CachedCollection') -> int:
+        """Apply the mutations in a journal file to a cache entry.
+        
+        Returns the number of entries applied. A torn final line left by
+        a crash mid-append is cut off so later appends start cleanly.
+        """
+        try:
+            with open(journal_path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return 0
+        
+        applied = 0
+        offset = 0
+        for raw in content.splitlines(keepends=True):
+            if not raw.endswith(b'\n'):
+                with open(journal_path, 'r+b') as f:
+                    f.truncate(offset)
+                break
+            offset += len(raw)
+            try:
+                op = json.loads(raw)
+            except ValueError:
+                continue
+            entry.apply(op)
+            applied += 1
+        return applied
+    
+    def compact(self, collection: str):
+        """Fold a collection's journal back into its data file.
+        
+        The live journal is renamed aside under the collection lock, so
+        new mutations keep appending to a fresh journal while the snapshot
+        is written. Replaying a journal over a base file that already
+        contains it is harmless, so a crash at any point loses nothing.
+        A separate <file>.compact.lock keeps two processes from compacting
+        the same collection at once.
+        """
+        filepath = self._get_filepath(collection)
+        journal_path, compacting_path = self._journal_paths(filepath)
+        
+        with FileLock(filepath + '.compact.lock').hold(blocking=False) as acquired:
+            if not acquired:
+                return
+            
+            with self._writing(collection):
+                entry = self._entry(collection, locked=True)
+                snapshot = list(entry.records.values())
+                if os.path.exists(compacting_path):
+                    # Left over from an interrupted compaction; finish it inline
+                    self._write_file(filepath, snapshot)
+                    for path in (compacting_path, journal_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    entry.journal_length = 0
+                    entry.signature = self._signature(filepath)
+                    return
+                if not os.path.exists(journal_path):
+                    return
+                os.replace(journal_path, compacting_path)
+                entry.journal_length = 0
+                entry.signature = self._signature(filepath)
+            
+            temp_path = filepath + '.compact.tmp'
+            storage_formats.dump(temp_path, snapshot, self._format_for(filepath))
+            
+            with self._writing(collection):
+                fresh = self._cache.get(filepath) is entry and entry.signature == self._signature(filepath)
+                os.replace(temp_path, filepath)
+                os.remove(compacting_path)
+                if fresh:
+                    entry.signature = self._signature(filepath)
+    
+    def _compact_in_background(self, collection: str):
+        with self._state_lock:
+            if collection in self._compacting:
+                return
+            self._compacting.add(collection)
+        
+        def run():
+            try:
+                self.compact(collection)
+            finally:
+                with self._state_lock:
+                    self._compacting.discard(collection)
+        
+        threading.Thread(target=run, name=f'compact-{collection}', daemon=True).start()
+    
+    # Read cache
+    
+    @staticmethod
+    def _file_signature(filepath: str) -> Optional[Tuple[int, int]]:
+        """Return (mtime_ns, size) of a file, or None if it is missing."""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
+    def _signature(self, filepath: str) -> tuple:
+        """Return the signatures of a collection file and its journals."""
+        return (self._file_signature(filepath),) + tuple(
+            self._file_signature(path) for path in self._journal_paths(filepath)
+        )
+    
+    def _entry(self, collection: str, locked: bool = False) -> '_CachedCollection':
+        """Return the cache entry of a collection, re-reading on change.
+        
+        Pass locked=True when the caller already holds the collection's
+        file lock; otherwise a shared one is taken while reloading.
+        """
+        filepath = self._get_filepath(collection)
+        entry = self._cache.get(filepath)
+        if entry is not None and entry.signature == self._signature(filepath):
+            self._cache_hits += 1
+            return entry
+        
+        self._cache_misses += 1
+        if locked:
+            return self._load(filepath)
+        with FileLock(filepath + '.lock').hold(exclusive=False):
+            return self._load(filepath)
+    
+    def _load(self, filepath: str) -> '_CachedCollection':
+        """Read a collection file and replay its journals into a new cache entry."""
+        signature = self._signature(filepath)
+        data = self._read_file(filepath) if signature[0] is not None else []
+        entry = _CachedCollection(signature, data, self.columnar.get(self._collection_of(filepath)))
+        journal_path, compacting_path = self._journal_paths(filepath)
+        if signature[2] is not None:
+            self._replay_journal(compacting_path, entry)
+        if signature[1] is not None:
+            entry.journal_length = self._replay_journal(journal_path, entry)
+            entry.signature = self._signature(filepath)
+        self._cache[filepath] = entry
+        return entry
+    
+    def _persist(self, collection: str, entry: '_CachedCollection', lines: List[str]):
+        """Make mutations already applied to a cache entry durable.
+        
+        lines are the journal lines of the mutations. If the write fails
+        the entry is dropped so the next read reloads the collection from
+        disk.
+        """
+        filepath = self._get_filepath(collection)
+        try:
+            if self.engine == 'journal':
+                self._append_journal(filepath, lines)
+                entry.journal_length += len(lines)
+            else:
+                self._write_file(filepath, list(entry.records.values()))
+                # Anything journaled earlier is now part of the file
+                for path in self._journal_paths(filepath):
+                    if os.path.exists(path):
+                        os.remove(path)
+        except Exception:
+            self._cache.pop(filepath, None)
+            raise
+        entry.signature = self._signature(filepath)
+        
+        if entry.journal_length >= self.JOURNAL_COMPACT_THRESHOLD:
+            self._compact_in_background(collection)
+    
+    # Group commit
+    
+    def _commit(self, collection: str, entry: '_CachedCollection', ops: List[dict],
+                immediate: bool = False) -> Optional[Tuple['_CommitGroup', int]]:
+        """Persist mutations in one write, or queue them for the next group commit.
+        
+        Called with the collection held for writing. Returns the (group, ticket) to
+        wait on in group commit mode, None if the write already happened.
+        immediate writes now even in group commit mode, for mutations that
+        were checked against the data on disk and must not be replayed later.
+        """
+        if not ops:
+            return None
+        lines = [self._journal_line(op) for op in ops]
+        if not self.group_commit or immediate:
+            self._persist(collection, entry, lines)
+            with self._state_lock:
+                self._commit_batches += 1
+                self._committed_writes += len(lines)
+            return None
+        
+        filepath = self._get_filepath(collection)
+        group = self._commit_groups.get(filepath)
+        if group is None:
+            group = self._commit_groups[filepath] = _CommitGroup()
+        if not group.lines:
+            group.entry = entry
+        elif group.entry is not entry:
+            # The cache was reloaded mid-batch
+            group.entry = None
+        group.applied += len(lines)
+        group.lines.extend(lines)
+        return group, group.applied
+    
+    def _await_commit(self, collection: str, pending: Optional[Tuple['_CommitGroup', int]]):
+        """Block until a queued mutation is durable, flushing if no one else is."""
+        if pending is None:
+            return
+        group, ticket = pending
+        with group.cond:
+            group.cond.notify_all()
+            while group.durable < ticket:
+                if group.flushing:
+                    group.cond.wait()
+                    continue
+                
+                # Lead this batch: let more writers join, then flush them all
+                group.flushing = True
+                deadline = time.monotonic() + self.commit_window
+                while group.applied - group.durable < self.commit_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    group.cond.wait(remaining)
+                
+                group.cond.release()
+                try:
+                    target, error = self._flush_group(collection, group)
+                finally:
+                    group.cond.acquire()
+                if error is not None:
+                    group.failures.append((group.durable, target, error))
+                    del group.failures[:-16]
+                group.durable = target
+                group.flushing = False
+                group.cond.notify_all()
+            
+            for low, high, error in group.failures:
+                if low < ticket <= high:
+                    raise error
+    
+    def _flush_group(self, collection: str, group: '_CommitGroup') -> Tuple[int, Optional[Exception]]:
+        """Write every mutation queued so far; return (last ticket, error)."""
+        filepath = self._get_filepath(collection)
+        with self._writing(collection):
+            target = group.applied
+            lines, group.lines = group.lines, []
+            if not lines:
+                return target, None
+            try:
+                entry = self._cache.get(filepath)
+                if entry is None or entry is not group.entry or entry.signature != self._signature(filepath):
+                    # Reloaded, or changed by another process, since these
+                    # mutations were applied: re-apply them to what is on disk
+                    self._cache.pop(filepath, None)
+                    entry = self._entry(collection, locked=True)
+                    for line in lines:
+                        entry.apply(json.loads(line))
+                self._persist(collection, entry, lines)
+            except Exception as exc:
+                return target, exc
+            finally:
+                group.entry = None
+        with self._state_lock:
+            self._commit_batches += 1
+            self._committed_writes += len(lines)
+        return target, None
+    
+    def commit_stats(self) -> dict:
+        """Return how many writes were made durable and in how many batches."""
+        batches = self._commit_batches
+        return {
+            'group_commit': self.group_commit,
+            'batches': batches,
+            'writes': self._committed_writes,
+            'writes_per_batch': round(self._committed_writes / batches, 2) if batches else 0.0
+        }
+    
+    def invalidate(self, collection: str = None):
+        """Drop cached data for one collection, or for all of them."""
+        if collection is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(self._get_filepath(collection), None)
+    
+    def cache_stats(self) -> dict:
+        """Return read-cache hit/miss counters."""
+        total = self._cache_hits + self._cache_misses
+        return {
+            'hits': self._cache_hits,
+            'misses': self._cache_misses,
+            'hit_rate': round(self._cache_hits / total, 4) if total else 0.0,
+            'cached_collections': len(self._cache),
+            'index_lookups': self._index_lookups
+        }
+    
+    # Secondary indexes
+    
+    def create_index(self, collection: str, *fields: str):
+        """Declare a secondary index on one field or a composite of fields."""
+        if not fields:
+            raise ValueError("create_index() needs at least one field")
+        specs = self._index_specs.setdefault(collection, [])
+        if tuple(fields) not in specs:
+            specs.append(tuple(fields))
+            entry = self._cache.get(self._get_filepath(collection))
+            if entry is not None:
+                entry.indexes = None
+    
+    def _indexes(self, collection: str, entry: '_CachedCollection') -> Dict[tuple, Dict[tuple, Dict[Any, None]]]:
+        """Return the indexes of a cache entry, building them on first use."""
+        if entry.indexes is None:
+            entry.indexes = {
+                fields: _build_index(entry.records, fields)
+                for fields in self._index_specs.get(collection, [])
+            }
+        return entry.indexes
+    
+    def _plan(self, collection: str, filters: dict, entry: '_CachedCollection') -> Tuple[Optional[Iterable[Any]], dict]:
+        """Return (candidate record keys, filters left to check) for a query.
+        
+        The keys come from the primary key or from the index covering the
+        most filter fields; None means every record has to be checked.
+        """
+        if 'id' in filters:
+            # Primary key lookup
+            key = filters['id']
+            keys = (key,) if _hashable(key) and key in entry.records else ()
+            return keys, {f: v for f, v in filters.items() if f != 'id'}
+        
+        best = None
+        for fields in self._index_specs.get(collection, []):
+            if all(f in filters for f in fields) and (best is None or len(fields) > len(best)):
+                best = fields
+        if best is not None:
+            key = tuple(filters[f] for f in best)
+            if _hashable(key):
+                self._index_lookups += 1
+                keys = self._indexes(collection, entry)[best].get(key, ())
+                return keys, {f: v for f, v in filters.items() if f not in best}
+        return None, filters
+    
+    def _scan(self, collection: str, filters: dict, entry: '_CachedCollection' = None) -> Iterator[dict]:
+        """Lazily yield cached records (not copies) whose fields equal all filter values.
+        
+        Uses the index covering the most filter fields when one exists
+        and falls back to a linear scan otherwise. Must be consumed while
+        the collection is held for reading.
+        """
+        entry = entry or self._entry(collection)
+        records = entry.records
+        keys, remaining = self._plan(collection, filters, entry)
+        candidates = records.values() if keys is None else (records[k] for k in keys)
+        
+        live = self._live(collection)
+        if live is not None:
+            candidates = filter(live, candidates)
+        if not remaining:
+            return iter(candidates)
+        conditions = list(remaining.items())
+        return (item for item in candidates if all(item.get(f) == v for f, v in conditions))
+    
+    # Expiry
+    
+    def enable_ttl(self, collection: str):
+        """Let the records of a collection expire at their TTL_FIELD timestamp."""
+        self._ttl.add(collection)
+    
+    def _live(self, collection: str) -> Optional[Callable[[dict], bool]]:
+        """Return a predicate for unexpired records, or None if nothing expires."""
+        if collection not in self._ttl:
+            return None
+        now = datetime.now().isoformat()
+        return lambda item: not _expired(item, self.TTL_FIELD, now)
+    
+    def purge_expired(self, collection: str = None) -> int:
+        """Delete expired records from one TTL collection, or from all; return how many."""
+        purged = 0
+        for name in [collection] if collection else sorted(self._ttl):
+            live = self._live(name)
+            if live is None:
+                continue
+            with self._reading(name):
+                expired = [
+                    key for key, item in self._entry(name).records.items()
+                    if not live(item) and item.get('id') == key
+                ]
+            if expired:
+                purged += self.delete_many(name, expired)
+        return purged
+    
+    # Streaming queries
+    
+    def find(self, collection: str, filters: dict = None, fields: List[str] = None,
+             limit: int = None, offset: int = 0) -> Iterator[dict]:
+        """Yield records matching filters, optionally projected to fields.
+        
+        Only the requested page is selected under the read lock; projected
+        records are built one at a time as the caller iterates. Cached
+        records are replaced rather than changed in place, so the page
+        stays a consistent snapshot after the lock is released.
+        """
+        stop = offset + limit if limit is not None else None
+        with self._reading(collection):
+            entry = self._entry(collection)
+            if isinstance(entry.records, ColumnarRecords) and collection not in self._ttl:
+                # Match on the columns; only the page, with only its fields, is built
+                keys, remaining = self._plan(collection, filters or {}, entry)
+                page = entry.records.select(keys, list(remaining.items()), fields, offset, stop)
+                fields = None  # already projected
+            else:
+                page = list(islice(self._scan(collection, filters or {}, entry), offset, stop))
+        if fields is None:
+            yield from page
+        else:
+            for item in page:
+                yield {f: item[f] for f in fields if f in item}
+    
+    def first(self, collection: str, filters: dict = None, fields: List[str] = None) -> Optional[dict]:
+        """Return the first record matching filters, or None."""
+        return next(self.find(collection, filters, fields, limit=1), None)
+    
+    # Sorted pagination
+    
+    def _order(self, entry: '_CachedCollection', sort: tuple) -> Tuple[List[tuple], List[Any]]:
+        """Return (sort keys, record keys) of a collection in sort order.
+        
+        Built on first use per sort and kept up to date by later writes.
+        """
+        order = entry.orders.get(sort)
+        if order is None:
+            pairs = sorted(
+                ((record_sort_key(record, sort), key) for key, record in entry.records.items()),
+                key=lambda pair: pair[0]
+            )
+            order = entry.orders[sort] = ([k for k, _ in pairs], [key for _, key in pairs])
+        return order
+    
+    def paginate(self, collection: str, filters: dict = None, sort: List[str] = None,
+                 limit: int = 50, cursor: str = None, offset: int = 0,
+                 fields: List[str] = None, where: Callable[[dict], bool] = None) -> Tuple[List[dict], Optional[str]]:
+        """Return one page of records in sort order and the cursor of the next page.
+        
+        sort lists fields, '-field' for descending; ties are broken by id.
+        cursor is the opaque next_cursor of the previous page (None for the
+        first page and after the last one). where is an extra predicate
+        for conditions filters cannot express. Raises ValueError for a
+        cursor issued for a different sort.
+        """
+        sort = tuple(sort or ('id',))
+        after = decode_cursor(cursor, sort) if cursor else None
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        live = self._live(collection)
+        
+        with self._reading(collection):
+            if filters:
+                # Sort just the matches, usually one index bucket
+                pairs = sorted(
+                    ((record_sort_key(item, sort), item) for item in self._scan(collection, filters)),
+                    key=lambda pair: pair[0]
+                )
+                keys = [k for k, _ in pairs]
+                items = [item for _, item in pairs]
+                resolve = items.__getitem__
+            else:
+                entry = self._entry(collection)
+                keys, refs = self._order(entry, sort)
+                resolve = lambda i: entry.records[refs[i]]
+            
+            page = []
+            skip = offset
+            i = bisect.bisect_right(keys, after) if after is not None else 0
+            while i < len(keys) and len(page) <= limit:
+                item = resolve(i)
+                i += 1
+                if (where is not None and not where(item)) or (live is not None and not live(item)):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                page.append(item)
+        
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1], sort)
+        if fields is not None:
+            return [{f: item[f] for f in fields if f in item} for item in page], next_cursor
+        return page, next_cursor
+    
     # CRUD Operations
     
     def get_all(self, collection: str) -> List[dict]:
         """Get all records from a collection."""
-        filepath = self._get_filepath(collection)
-        return self._read_file(filepath)
+        live = self._live(collection)
+        with self._reading(collection):
+            records = self._entry(collection).records.values()
+            return list(records if live is None else filter(live, records))
     
     def get_by_id(self, collection: str, id: str) -> Optional[dict]:
         """Get a single record by ID."""
-        data = self.get_all(collection)
-        for item in data:
-            if item.get('id') == id:
-                return item
-        return None
+        with self._reading(collection):
+            item = self._entry(collection).records.get(id) if _hashable(id) else None
+        live = self._live(collection)
+        if item is not None and live is not None and not live(item):
+            return None
+        return item
     
     def get_by_field(self, collection: str, field: str, value: Any) -> List[dict]:
         """Get records matching a field value."""
-        data = self.get_all(collection)
-        return [item for item in data if item.get(field) == value]
+        return list(self.find(collection, {field: value}))
     
     def create(self, collection: str, record: dict) -> dict:
         """Create a new record."""
-        data = self.get_all(collection)
-        data.append(record)
-        filepath = self._get_filepath(collection)
-        self._write_file(filepath, data)
+        with self._writing(collection):
+            entry = self._entry(collection, locked=True)
+            entry.insert(record)
+            pending = self._commit(collection, entry, [{'op': 'create', 'record': record}])
+        self._await_commit(collection, pending)
         return record
     
     def update(self, collection: str, id: str, updates: dict) -> Optional[dict]:
         """Update an existing record."""
-        data = self.get_all(collection)
-        for i, item in enumerate(data):
-            if item.get('id') == id:
-                data[i].update(updates)
-                filepath = self._get_filepath(collection)
-                self._write_file(filepath, data)
-                return data[i]
-        return None
+        with self._writing(collection):
+            entry = self._entry(collection, locked=True)
+            updated = entry.replace(id, updates)
+            if updated is None:
+                return None
+            pending = self._commit(collection, entry, [{'op': 'update', 'id': id, 'changes': updates}])
+        self._await_commit(collection, pending)
+        return updated
     
     def delete(self, collection: str, id: str) -> bool:
         """Delete a record by ID."""
-        data = self.get_all(collection)
-        original_length = len(data)
-        data = [item for item in data if item.get('id') != id]
+        with self._writing(collection):
+            entry = self._entry(collection, locked=True)
+            if entry.remove(id) is None:
+                return False
+            pending = self._commit(collection, entry, [{'op': 'delete', 'id': id}])
+        self._await_commit(collection, pending)
+        return True
+    
+    # Batch operations: one load and one write for any number of records
+    
+    def create_many(self, collection: str, records: List[dict], unique: Sequence[str] = None) -> List[dict]:
+        """Create several records at once and return the ones created.
         
-        if len(data) < original_length:
-            filepath = self._get_filepath(collection)
-            self._write_file(filepath, data)
-            return True
-        return False
+        With unique, a record whose unique fields equal those of a stored
+        record, or of an earlier record of the batch, is skipped. The check
+        runs under the collection's write lock against the latest data on
+        disk, so writers in other processes cannot slip a duplicate in,
+        and the batch is written at once instead of group committed.
+        """
+        with self._writing(collection):
+            entry = self._entry(collection, locked=True)
+            if unique:
+                created = []
+                for record in records:
+                    if next(self._scan(collection, {f: record.get(f) for f in unique}, entry), None) is None:
+                        entry.insert(record)
+                        created.append(record)
+                records = created
+            else:
+                for record in records:
+                    entry.insert(record)
+            pending = self._commit(collection, entry, [{'op': 'create', 'record': r} for r in records],
+                                   immediate=bool(unique))
+        self._await_commit(collection, pending)
+        return records
+    
+    def update_many(self, collection: str, updates: Dict[str, dict]) -> List[dict]:
+        """Apply {id: changes} to several records; missing ids are skipped."""
+        updated = []
+        ops = []
+        with self._writing(collection):
+            entry = self._entry(collection, locked=True)
+            for id, changes in updates.items():
+                item = entry.replace(id, changes)
+                if item is not None:
+                    updated.append(item)
+                    ops.append({'op': 'update', 'id': id, 'changes': changes})
+            pending = self._commit(collection, entry, ops)
+        self._await_commit(collection, pending)
+        return updated
+    
+    def upsert_many(self, collection: str, records: List[dict],
+                    key_fields: Sequence[str]) -> Tuple[List[dict], List[dict]]:
+        """Create records, or update the record that has the same key_fields values.
+        
+        Stored records keep their id. Returns (created, updated); all of
+        it is applied under the write lock and written at once, as one
+        batch, so no other writer can create a duplicate key meanwhile.
+        """
+        created, updated = [], []
+        ops = []
+        with self._writing(collection):
+            entry = self._entry(collection, locked=True)
+            for record in records:
+                match = next(self._scan(collection, {f: record.get(f) for f in key_fields}, entry), None)
+                if match is None:
+                    entry.insert(record)
+                    created.append(record)
+                    ops.append({'op': 'create', 'record': record})
+                else:
+                    changes = {f: v for f, v in record.items() if f != 'id'}
+                    updated.append(entry.replace(match['id'], changes))
+                    ops.append({'op': 'update', 'id': match['id'], 'changes': changes})
+            pending = self._commit(collection, entry, ops, immediate=True)
+        self._await_commit(collection, pending)
+        return created, updated
+    
+    def delete_many(self, collection: str, ids: List[str]) -> int:
+        """Delete several records by ID and return how many existed."""
+        ops = []
+        with self._writing(collection):
+            entry = self._entry(collection, locked=True)
+            for id in ids:
+                if entry.remove(id) is not None:
+                    ops.append({'op': 'delete', 'id': id})
+            pending = self._commit(collection, entry, ops)
+        self._await_commit(collection, pending)
+        return len(ops)
     
-    def query(self, collection: str, filters: dict) -> List[dict]:
+    def query(self, collection: str, filters: dict, fields: List[str] = None,
+              limit: int = None, offset: int = 0) -> List[dict]:
         """Query records with multiple filters."""
-        data = self.get_all(collection)
-        results = data
+        filters = {field: value for field, value in filters.items() if value is not None}
+        return list(self.find(collection, filters, fields, limit, offset))
+    
+    def count(self, collection: str, filters: dict = None, where: Callable[[dict], bool] = None) -> int:
+        """Count records, optionally with filters and an extra predicate."""
+        with self._reading(collection):
+            if filters or where or collection in self._ttl:
+                filters = {field: value for field, value in (filters or {}).items() if value is not None}
+                matches = self._scan(collection, filters)
+                if where is not None:
+                    matches = filter(where, matches)
+                return sum(1 for _ in matches)
+            return len(self._entry(collection).records)
+
+
+class _CommitGroup:
+    """Mutations of one collection waiting for a group commit."""
+    
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.applied = 0  # tickets handed out (mutations applied in memory)
+        self.durable = 0  # highest ticket covered by a finished flush
+        self.flushing = False
+        self.lines: List[str] = []  # journal lines not yet written
+        self.entry = None  # cache entry the pending lines were applied to
+        self.failures: List[Tuple[int, int, Exception]] = []  # (after, upto, error)
+
+
+class _CachedCollection:
+    """Parsed records of one collection, keyed by id, plus their indexes."""
+    
+    __slots__ = ('signature', 'records', 'indexes', 'orders', 'journal_length')
+    
+    def __init__(self, signature: tuple, records: List[dict], columns: Sequence[Tuple[str, str]] = None):
+        self.signature = signature
+        # id -> record, in file order; a ColumnarRecords if columns are given
+        self.records: Dict[Any, dict] = ColumnarRecords(columns, FrozenRecord) if columns else {}
+        # fields -> {key tuple -> {record key: None}}; built lazily
+        self.indexes: Optional[Dict[tuple, Dict[tuple, Dict[Any, None]]]] = None
+        # sort fields -> (sort keys, record keys) in order; built lazily
+        self.orders: Dict[tuple, Tuple[List[tuple], List[Any]]] = {}
+        # Mutations appended to the live journal since the last compaction
+        self.journal_length = 0
+        for record in records:
+            self.add(record)
+    
+    def add(self, record: dict) -> Any:
+        """Append a frozen copy of a record and return the key it is stored under.
+        
+        Records without a usable id, or repeating an id already present,
+        get a private key so that nothing on disk is dropped.
+        """
+        key = record.get('id')
+        if key is None or not _hashable(key) or key in self.records:
+            key = object()
+        if type(record) is not FrozenRecord and type(self.records) is dict:
+            record = FrozenRecord(record)
+        self.records[key] = record
+        return key
+    
+    def insert(self, record: dict) -> Any:
+        """Add a record and index it."""
+        key = self.add(record)
+        record = self.records[key]
+        if self.indexes is not None:
+            for fields, index in self.indexes.items():
+                _index_add(index, fields, record, key)
+        for sort, order in self.orders.items():
+            _order_add(order, sort, record, key)
+        return key
+    
+    def replace(self, key: Any, updates: dict) -> Optional[dict]:
+        """Merge updates into the record stored under key."""
+        item = self.records.get(key) if _hashable(key) else None
+        if item is None:
+            return None
         
-        for field, value in filters.items():
-            if value is not None:
-                results = [item for item in results if item.get(field) == value]
+        updated = FrozenRecord({**item, **updates})
+        new_key = key
+        if updated.get('id') == key:
+            self.records[key] = updated
+        else:
+            # The id itself changed, so the record moves to its new key
+            del self.records[key]
+            new_key = self.add(updated)
+        if self.indexes is not None:
+            for fields, index in self.indexes.items():
+                if new_key != key or any(item.get(f) != updated.get(f) for f in fields):
+                    _index_remove(index, fields, item, key)
+                    _index_add(index, fields, updated, new_key)
+        for sort, order in self.orders.items():
+            if new_key != key or any(item.get(f.lstrip('-')) != updated.get(f.lstrip('-')) for f in sort + ('id',)):
+                _order_remove(order, sort, item, key)
+                _order_add(order, sort, updated, new_key)
+        return updated
+    
+    def remove(self, key: Any) -> Optional[dict]:
+        """Remove and return the record stored under key."""
+        item = self.records.pop(key, None) if _hashable(key) else None
+        if item is not None and self.indexes is not None:
+            for fields, index in self.indexes.items():
+                _index_remove(index, fields, item, key)
+        if item is not None:
+            for sort, order in self.orders.items():
+                _order_remove(order, sort, item, key)
+        return item
+    
+    def apply(self, op: dict):
+        """Apply one journal entry.
         
-        return results
+        Replays are idempotent: a create for an id that already exists
+        overwrites it, and updates or deletes of missing ids are ignored.
+        """
+        kind = op.get('op')
+        if kind == 'create':
+            record = op['record']
+            key = record.get('id')
+            if key is not None and _hashable(key) and key in self.records:
+                self.replace(key, record)
+            else:
+                self.insert(record)
+        elif kind == 'update':
+            self.replace(op['id'], op['changes'])
+        elif kind == 'delete':
+            self.remove(op['id'])
+
+
+def _expired(record: dict, field: str, now: str) -> bool:
+    # ISO timestamps of one format compare correctly as strings
+    value = record.get(field)
+    return isinstance(value, str) and value <= now
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _build_index(records: Dict[Any, dict], fields: tuple) -> Dict[tuple, Dict[Any, None]]:
+    index: Dict[tuple, Dict[Any, None]] = {}
+    for key, record in records.items():
+        _index_add(index, fields, record, key)
+    return index
+
+
+def _index_add(index: Dict[tuple, Dict[Any, None]], fields: tuple, record: dict, key: Any):
+    value = tuple(record.get(f) for f in fields)
+    # Unhashable values (lists, dicts) are only reachable by scanning
+    if _hashable(value):
+        index.setdefault(value, {})[key] = None
+
+
+def _index_remove(index: Dict[tuple, Dict[Any, None]], fields: tuple, record: dict, key: Any):
+    value = tuple(record.get(f) for f in fields)
+    if not _hashable(value):
+        return
+    bucket = index.get(value)
+    if bucket is not None:
+        bucket.pop(key, None)
+        if not bucket:
+            del index[value]
+
+
+class _Descending:
+    """Wraps a sort value so that it orders in reverse."""
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __eq__(self, other):
+        return self.value == other.value
+    
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def sort_value(value: Any) -> tuple:
+    # Rank by type first so that mixed-type fields still compare
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, json.dumps(value, sort_keys=True, default=str))
+
+
+def record_sort_key(record: dict, sort: tuple) -> tuple:
+    """Key of a record under sort, with its id as the final tie-breaker."""
+    key = []
+    for field in sort:
+        if field.startswith('-'):
+            key.append(_Descending(sort_value(record.get(field[1:]))))
+        else:
+            key.append(sort_value(record.get(field)))
+    key.append(sort_value(record.get('id')))
+    return tuple(key)
+
+
+def encode_cursor(record: dict, sort: tuple) -> str:
+    """Return an opaque cursor pointing just after record."""
+    values = [record.get(field.lstrip('-')) for field in sort] + [record.get('id')]
+    raw = json.dumps({'s': list(sort), 'k': values}, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: tuple) -> tuple:
+    """Turn a cursor back into the sort key it points after."""
+    fields = [field.lstrip('-') for field in sort] + ['id']
+    return record_sort_key(dict(zip(fields, cursor_values(cursor, sort))), sort)
+
+
+def cursor_values(cursor: str, sort: tuple) -> list:
+    """Return the values of the sort fields, then the id, that a cursor points after."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+        values = data['k']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if data.get('s') != list(sort) or len(values) != len(sort) + 1:
+        raise ValueError("Cursor does not match this sort order")
+    return values
+
+
+def _order_add(order: Tuple[List[tuple], List[Any]], sort: tuple, record: dict, key: Any):
+    keys, refs = order
+    sort_key = record_sort_key(record, sort)
+    i = bisect.bisect_right(keys, sort_key)
+    keys.insert(i, sort_key)
+    refs.insert(i, key)
+
+
+def _order_remove(order: Tuple[List[tuple], List[Any]], sort: tuple, record: dict, key: Any):
+    keys, refs = order
+    sort_key = record_sort_key(record, sort)
+    i = bisect.bisect_left(keys, sort_key)
+    while i < len(keys) and keys[i] == sort_key:
+        if refs[i] is key or refs[i] == key:
+            del keys[i]
+            del refs[i]
+            return
+        i += 1
+
+
+class ExpirySweeper:
+    """Purge expired records from a storage backend at a fixed interval."""
+    
+    def __init__(self, store, interval_seconds: float = None):
+        from database.config import DatabaseConfig
+        
+        self.store = store
+        self.interval = (interval_seconds if interval_seconds is not None
+                         else DatabaseConfig.TTL_SWEEP_INTERVAL_SECONDS)
+        self._timer: Optional[threading.Timer] = None
+    
+    def start(self):
+        """Sweep every interval seconds in a background thread."""
+        if self._timer is not None or self.interval <= 0:
+            return
+        
+        def run():
+            try:
+                purged = self.store.purge_expired()
+                if purged:
+                    print(f"[STORAGE] Purged {purged} expired records")
+            except Exception as e:
+                print(f"[STORAGE] Expiry sweep failed: {e}")
+            self._schedule(run)
+        
+        self._schedule(run)
+    
+    def _schedule(self, run):
+        self._timer = threading.Timer(self.interval, run)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+def create_storage():
+    """Build the storage backend selected by DatabaseConfig.STORAGE_BACKEND."""
+    from database.config import DatabaseConfig
+    from models.assignment import Submission
+    from models.attendance import Attendance
+    
+    if DatabaseConfig.STORAGE_BACKEND == 'sqlite':
+        from services.sqlite_storage import SQLiteStorageService
+        return SQLiteStorageService()
+    if DatabaseConfig.STORAGE_BACKEND != 'json':
+        raise ValueError(f"Unknown storage backend '{DatabaseConfig.STORAGE_BACKEND}'. Must be 'json' or 'sqlite'")
     
-    def count(self, collection: str, filters: dict = None) -> int:
-        """Count records, optionally with filters."""
-        if filters:
-            return len(self.query(collection, filters))
-        return len(self.get_all(collection))
+    # Collections that may be cached column by column
+    schemas = {'attendance': Attendance.COLUMNS, 'submissions': Submission.COLUMNS}
+    unknown = [name for name in DatabaseConfig.COLUMNAR_COLLECTIONS if name not in schemas]
+    if unknown:
+        raise ValueError(f"No columnar schema for: {', '.join(unknown)}. Available: {', '.join(schemas)}")
+    return StorageService(
+        engine=DatabaseConfig.JSON_ENGINE,
+        default_format=DatabaseConfig.STORAGE_FORMAT,
+        formats=DatabaseConfig.STORAGE_FORMATS,
+        columnar={name: schemas[name] for name in DatabaseConfig.COLUMNAR_COLLECTIONS},
+        group_commit=DatabaseConfig.GROUP_COMMIT,
+        commit_window=DatabaseConfig.GROUP_COMMIT_WINDOW_MS / 1000,
+        commit_batch_size=DatabaseConfig.GROUP_COMMIT_MAX_BATCH
+    )
 
 
 # Global storage instance
-storage = StorageService()
+storage = create_storage()
 
 
 # Helper functions for easy access
@@ -2,7 +2,7 @@
 # SQLAlchemy database setup with connection (COMMENTED OUT for now)
 # Currently using local JSON storage - uncomment when ready to use database
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, scoped_session
 from .config import DatabaseConfig
 from .models import Base
@@ -49,6 +49,23 @@ def close_session(session):
     """Placeholder - database not connected"""
     pass
 
+def create_db_engine(url: str = None):
+    """Create an engine for the given URL (defaults to the active database).
+    
+    SQLite connections get DatabaseConfig.SQLITE_PRAGMAS (WAL mode etc.).
+    """
+    url = url or DatabaseConfig.get_connection_string()
+    db_engine = create_engine(url, **DatabaseConfig.ENGINE_OPTIONS)
+    if url.startswith('sqlite'):
+        event.listen(db_engine, 'connect', _apply_sqlite_pragmas)
+    return db_engine
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in DatabaseConfig.SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 # Export models for easy access
 from .models import (
     # Core
@@ -81,10 +98,12 @@ from .models import (
     Certificate,
     # Timetable
     Timetable,
+    # Document store
+    StoredRecord,
 )
 
 __all__ = [
-    'init_db', 'get_session', 'close_session', 'engine', 'Session', 'Base',
+    'init_db', 'get_session', 'close_session', 'create_db_engine', 'engine', 'Session', 'Base',
     'User', 'UserRole', 'Course', 'Assignment', 'Submission',
     'AttendanceSession', 'AttendanceRecord', 'AttendanceStatus',
     'Examination', 'ExamResult', 'ExamType', 'Event',
@@ -94,5 +113,5 @@ __all__ = [
     'Feedback', 'Grievance', 'GrievanceStatus',
     'Hostel', 'HostelRoom', 'HostelAllotment',
     'Company', 'PlacementDrive', 'PlacementApplication',
-    'Certificate', 'Timetable'
+    'Certificate', 'Timetable', 'StoredRecord'
 ]
@@ -23,6 +23,57 @@ class DatabaseConfig:
     # Change this to switch between databases
     ACTIVE_DB = SQLITE_URL
     
+    # Storage backend behind services.storage_service.storage
+    # 'json' keeps collections in data/*.json, 'sqlite' stores them in SQLITE_PATH
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+    
+    # Write engine for the json backend: 'file' (rewrite) or 'journal' (append)
+    JSON_ENGINE = os.getenv('STORAGE_ENGINE', 'file')
+    
+    # Group commit for the json backend: batch writes arriving within the
+    # window (or up to the batch size) into a single file write
+    GROUP_COMMIT = os.getenv('STORAGE_GROUP_COMMIT', 'false').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_WINDOW_MS = float(os.getenv('STORAGE_GROUP_COMMIT_WINDOW_MS', '5'))
+    GROUP_COMMIT_MAX_BATCH = int(os.getenv('STORAGE_GROUP_COMMIT_MAX_BATCH', '256'))
+    
+    # On-disk format of json backend collection files: 'pretty', 'json'
+    # (compact), 'jsonl' or 'msgpack'. STORAGE_FORMATS overrides it per
+    # collection, e.g. "attendance=jsonl,submissions=msgpack"
+    STORAGE_FORMAT = os.getenv('STORAGE_FORMAT', 'json')
+    STORAGE_FORMATS = {
+        'rooms': 'pretty',
+        **dict(
+            map(str.strip, item.split('=', 1)) for item in os.getenv('STORAGE_FORMATS', '').split(',') if '=' in item
+        )
+    }
+    
+    # json backend collections cached column by column in memory
+    # (backend/services/columnar.py); comma-separated, empty to disable
+    COLUMNAR_COLLECTIONS = [
+        name.strip() for name in os.getenv('STORAGE_COLUMNAR', 'attendance,submissions').split(',') if name.strip()
+    ]
+    
+    # Most attendance marks written together by the ingestion queue
+    # (backend/services/attendance_ingest.py)
+    ATTENDANCE_BATCH_SIZE = int(os.getenv('ATTENDANCE_BATCH_SIZE', '500'))
+    
+    # Seconds between purges of expired records (e.g. QR codes); 0 disables
+    TTL_SWEEP_INTERVAL_SECONDS = float(os.getenv('TTL_SWEEP_INTERVAL_SECONDS', '60'))
+    
+    # Periodic snapshots of the json data directory (backend/services/backup_service.py)
+    # BACKUP_MODE is 'link' (hard links, incremental) or 'gzip'
+    BACKUP_DIR = os.getenv('BACKUP_DIR', os.path.join(os.path.dirname(__file__), '..', 'backups'))
+    BACKUP_INTERVAL_MINUTES = float(os.getenv('BACKUP_INTERVAL_MINUTES', '60'))
+    BACKUP_RETENTION = int(os.getenv('BACKUP_RETENTION', '24'))
+    BACKUP_MODE = os.getenv('BACKUP_MODE', 'link')
+    
+    # PRAGMAs applied to every SQLite connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000
+    }
+    
     # SQLAlchemy engine options
     ENGINE_OPTIONS = {
         'pool_pre_ping': True,
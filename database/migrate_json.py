@@ -0,0 +1,193 @@
+# CampusIntelli JSON -> SQLite migration
+# Streams data/*.json collections (in any storage format) into the
+# stored_records table used by the sqlite storage backend, in large batched
+# transactions.
+#
+# Usage (from the project root):
+#   python -m database.migrate_json [--data-dir DIR] [--database-url URL]
+#                                   [--batch-size N] [collection ...]
+#
+# The run is resumable: records are inserted with their string UUID "id" as
+# record_id, and a new run streams the whole file again but skips the ids
+# already in stored_records. Nothing depends on where records sit in the
+# file, so records added to or removed from it between runs are handled.
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Iterator, List
+
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from . import create_db_engine
+from .config import DatabaseConfig
+from .models import StoredRecord
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+DEFAULT_BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 1 << 20
+
+
+def iter_json_array(filepath: str) -> Iterator[dict]:
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buffer = f.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer:
+            return
+        if buffer[0] != '[':
+            raise ValueError(f"{filepath} does not contain a JSON array")
+        pos = 1
+        eof = False
+        while True:
+            # Skip separators between elements
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                buffer, pos = f.read(READ_CHUNK_SIZE), 0
+                eof = not buffer
+            if pos >= len(buffer) or buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield item
+            pos = end
+
+
+def iter_records(filepath: str) -> Iterator[dict]:
+    """Yield the records of a collection file in any storage format."""
+    from services import storage_formats
+    
+    with open(filepath, 'rb') as f:
+        fmt = storage_formats.detect(f.read(64))
+    if fmt == 'msgpack':
+        yield from storage_formats.iter_msgpack(filepath)
+    elif fmt == 'jsonl':
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(filepath)
+
+
+def _prepare(conn):
+    StoredRecord.__table__.create(conn, checkfirst=True)
+
+
+def _compact_journal(data_dir: str, collection: str):
+    """Fold a pending journal into the collection file before streaming it."""
+    filepath = os.path.join(data_dir, f"{collection}.json")
+    if os.path.exists(filepath + '.journal') or os.path.exists(filepath + '.journal.compacting'):
+        from services.storage_service import StorageService
+        StorageService(data_dir, collections=[collection]).compact(collection)
+
+
+def migrate_collection(engine, data_dir: str, collection: str, batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """Copy one collection into stored_records, skipping the ids already migrated."""
+    _compact_journal(data_dir, collection)
+    filepath = os.path.join(data_dir, f"{collection}.json")
+    
+    with engine.begin() as conn:
+        _prepare(conn)
+        done = {
+            row[0] for row in conn.execute(
+                text("SELECT record_id FROM stored_records WHERE collection = :c AND record_id IS NOT NULL"),
+                {'c': collection}
+            )
+        }
+    
+    insert = text(
+        "INSERT OR IGNORE INTO stored_records (collection, record_id, data) "
+        "VALUES (:collection, :record_id, :data)"
+    )
+    
+    started = time.perf_counter()
+    position = 0
+    skipped = 0
+    inserted = 0
+    batch: List[dict] = []
+    
+    def flush():
+        nonlocal inserted
+        with engine.begin() as conn:
+            # INSERT OR IGNORE skips ids already migrated; count real inserts
+            before = conn.execute(text("SELECT total_changes()")).scalar()
+            conn.execute(insert, batch)
+            inserted += conn.execute(text("SELECT total_changes()")).scalar() - before
+        batch.clear()
+    
+    for record in iter_records(filepath):
+        position += 1
+        record_id = record.get('id')
+        record_id = str(record_id) if record_id is not None else None
+        if record_id in done:
+            skipped += 1
+            continue
+        batch.append({
+            'collection': collection,
+            'record_id': record_id,
+            'data': json.dumps(record, ensure_ascii=False)
+        })
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    
+    elapsed = time.perf_counter() - started
+    return {
+        'collection': collection,
+        'records': position,
+        'inserted': inserted,
+        'skipped': skipped,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': int(inserted / elapsed) if elapsed > 0 else inserted
+    }
+
+
+def list_collections(data_dir: str) -> List[str]:
+    """Return the collections stored as <name>.json in data_dir."""
+    return sorted(
+        name[:-len('.json')] for name in os.listdir(data_dir)
+        if name.endswith('.json') and not name.startswith('.')
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migrate JSON collections into the SQLite storage backend.')
+    parser.add_argument('collections', nargs='*', help='Collections to migrate (default: all)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--database-url', default=DatabaseConfig.SQLITE_URL)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    
+    engine = create_db_engine(args.database_url)
+    collections = args.collections or list_collections(args.data_dir)
+    
+    total_rows = 0
+    started = time.perf_counter()
+    for collection in collections:
+        result = migrate_collection(engine, args.data_dir, collection, args.batch_size)
+        total_rows += result['inserted']
+        print(f"[DB] {collection}: {result['inserted']} inserted, {result['skipped']} already migrated "
+              f"({result['seconds']}s, {result['rows_per_second']} rows/s)")
+    
+    elapsed = time.perf_counter() - started
+    rate = int(total_rows / elapsed) if elapsed > 0 else total_rows
+    print(f"[DB] Migrated {total_rows} records from {len(collections)} collections in {elapsed:.2f}s ({rate} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,7 @@ from datetime import datetime, date
 from typing import Optional, List
 from sqlalchemy import (
     Column, Integer, String, Text, Float, Boolean, DateTime, Date, Time,
-    ForeignKey, Enum, Table, JSON
+    ForeignKey, Enum, Table, JSON, Index
 )
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
@@ -600,3 +600,20 @@ class Timetable(Base):
     room_id = Column(Integer, ForeignKey('rooms.id'))
     faculty_id = Column(Integer, ForeignKey('users.id'))
     is_active = Column(Boolean, default=True)
+
+
+# ============================================
+# DOCUMENT STORE (StorageService sqlite backend)
+# ============================================
+
+class StoredRecord(Base):
+    __tablename__ = 'stored_records'
+    
+    seq = Column(Integer, primary_key=True)  # insertion order within the table
+    collection = Column(String(64), nullable=False)
+    record_id = Column(String(64))  # the JSON record's "id"
+    data = Column(Text, nullable=False)  # the full record as JSON
+    
+    __table_args__ = (
+        Index('ix_stored_records_collection_record_id', 'collection', 'record_id', unique=True),
+    )
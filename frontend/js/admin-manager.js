@@ -223,56 +223,68 @@ const AdminManager = {
     // ANNOUNCEMENTS MANAGEMENT
     // ==========================================
 
-    async loadAnnouncements(container) {
+    // The list is paged; "Load more" appends the next page
+    async loadAnnouncements(container, cursor = null) {
         if (!container) return;
+        container.querySelector('.load-more')?.remove();
 
         try {
-            const { announcements } = await API.announcements.getAll();
+            const data = await API.announcements.getAll(cursor ? { cursor } : {});
+            const announcements = data.announcements || [];
+            const cards = announcements.map(ann => this.announcementCard(ann)).join('');
 
-            let html = `
-                <div class="management-header">
-                    <h2>Announcements Management</h2>
-                    ${this.canManage() ? '<button class="btn btn-primary" onclick="AdminManager.showAnnouncementForm()">+ Add Announcement</button>' : ''}
-                </div>
-                <div class="items-list">
-            `;
-
-            if (announcements.length === 0) {
-                html += '<p class="empty-state">No announcements found</p>';
+            if (cursor) {
+                container.querySelector('.items-list').insertAdjacentHTML('beforeend', cards);
             } else {
-                announcements.forEach(ann => {
-                    html += `
-                        <div class="item-card announcement-card" data-id="${ann.id}">
-                            <div class="item-header">
-                                <span class="item-priority badge badge-${ann.priority || 'normal'}">${ann.priority || 'Normal'}</span>
-                                ${ann.is_pinned ? '<span class="badge badge-pinned">📌 Pinned</span>' : ''}
-                                <span class="item-date">${new Date(ann.created_at || ann.published_at).toLocaleDateString()}</span>
-                            </div>
-                            <h3>${ann.title}</h3>
-                            <p class="item-desc">${ann.content}</p>
-                            <div class="item-meta">
-                                <span>By: ${ann.created_by_name || 'Admin'}</span>
-                                ${ann.target_audience ? '<span>For: ' + ann.target_audience + '</span>' : ''}
-                            </div>
-                            ${this.canManage() ? `
-                                <div class="item-actions">
-                                    <button class="btn btn-sm btn-ghost" onclick="AdminManager.editAnnouncement('${ann.id}')">Edit</button>
-                                    <button class="btn btn-sm btn-danger" onclick="AdminManager.deleteAnnouncement('${ann.id}')">Delete</button>
-                                </div>
-                            ` : ''}
-                        </div>
-                    `;
-                });
+                container.innerHTML = `
+                    <div class="management-header">
+                        <h2>Announcements Management</h2>
+                        ${this.canManage() ? '<button class="btn btn-primary" onclick="AdminManager.showAnnouncementForm()">+ Add Announcement</button>' : ''}
+                    </div>
+                    <div class="items-list">
+                        ${cards || '<p class="empty-state">No announcements found</p>'}
+                    </div>
+                `;
+            }
+            if (data.next_cursor) {
+                container.insertAdjacentHTML('beforeend', `
+                    <button class="btn btn-secondary load-more" onclick="AdminManager.loadAnnouncements(document.querySelector('#announcements-container'), '${data.next_cursor}')">Load more</button>
+                `);
             }
-
-            html += '</div>';
-            container.innerHTML = html;
 
         } catch (error) {
-            container.innerHTML = `<p class="error">Failed to load announcements: ${error.message}</p>`;
+            if (cursor) {
+                this.showToast('Failed to load more announcements', 'error');
+            } else {
+                container.innerHTML = `<p class="error">Failed to load announcements: ${error.message}</p>`;
+            }
         }
     },
 
+    announcementCard(ann) {
+        return `
+            <div class="item-card announcement-card" data-id="${ann.id}">
+                <div class="item-header">
+                    <span class="item-priority badge badge-${ann.priority || 'normal'}">${ann.priority || 'Normal'}</span>
+                    ${ann.is_pinned ? '<span class="badge badge-pinned">📌 Pinned</span>' : ''}
+                    <span class="item-date">${new Date(ann.created_at || ann.published_at).toLocaleDateString()}</span>
+                </div>
+                <h3>${ann.title}</h3>
+                <p class="item-desc">${ann.content}</p>
+                <div class="item-meta">
+                    <span>By: ${ann.created_by_name || 'Admin'}</span>
+                    ${ann.target_audience ? '<span>For: ' + ann.target_audience + '</span>' : ''}
+                </div>
+                ${this.canManage() ? `
+                    <div class="item-actions">
+                        <button class="btn btn-sm btn-ghost" onclick="AdminManager.editAnnouncement('${ann.id}')">Edit</button>
+                        <button class="btn btn-sm btn-danger" onclick="AdminManager.deleteAnnouncement('${ann.id}')">Delete</button>
+                    </div>
+                ` : ''}
+            </div>
+        `;
+    },
+
     showAnnouncementForm(announcement = null) {
         const isEdit = !!announcement;
         const modal = document.createElement('div');
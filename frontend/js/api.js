@@ -210,10 +210,10 @@ const API = {
 
     // Attendance endpoints
     attendance: {
-        async generateQR(courseId) {
+        async generateQR(courseId, lectureId = null) {
             return API.request('/attendance/generate-qr', {
                 method: 'POST',
-                body: JSON.stringify({ course_id: courseId })
+                body: JSON.stringify({ course_id: courseId, lecture_id: lectureId })
             });
         },
 
@@ -224,9 +224,10 @@ const API = {
             });
         },
 
-        async getRecords(courseId = null) {
-            const url = courseId ? `/attendance/?course_id=${courseId}` : '/attendance/';
-            return API.request(url);
+        // One page, newest first; pass the previous page's next_cursor as params.cursor
+        async getRecords(courseId = null, params = {}) {
+            const query = new URLSearchParams(courseId ? { course_id: courseId, ...params } : params).toString();
+            return API.request(query ? `/attendance/?${query}` : '/attendance/');
         },
 
         async getSummary() {
@@ -236,8 +237,10 @@ const API = {
 
     // Announcements endpoints
     announcements: {
-        async getAll() {
-            return API.request('/announcements/');
+        // One page, pinned first; pass the previous page's next_cursor as params.cursor
+        async getAll(params = {}) {
+            const query = new URLSearchParams(params).toString();
+            return API.request(query ? `/announcements/?${query}` : '/announcements/');
         },
 
         async getById(id) {
@@ -385,6 +388,21 @@ const API = {
                 method: 'POST',
                 body: JSON.stringify({ users })
             });
+        },
+
+        // CSV with an email,name,password[,role,department] header row
+        async importUsersCSV(file) {
+            const token = API.getToken();
+            const formData = new FormData();
+            formData.append('file', file);
+            const response = await fetch(`${API.BASE_URL}/admin/users/bulk-create`, {
+                method: 'POST',
+                headers: { 'Authorization': `Bearer ${token}` },
+                body: formData
+            });
+            const data = await response.json();
+            if (!response.ok) throw new Error(data.error || 'Import failed');
+            return data;
         }
     },
 
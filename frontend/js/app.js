@@ -355,9 +355,9 @@ const App = {
             `;
 
             // Announcements
-            const annData = await API.announcements.getAll();
+            const annData = await API.announcements.getAll({ limit: 3 });
             const recent = document.getElementById('recent-announcements');
-            const recentList = (annData.announcements || []).slice(0, 3);
+            const recentList = annData.announcements || [];
             if (recentList.length > 0) {
                 recent.innerHTML = recentList.map(a => `
                     <div class="list-item">
@@ -730,12 +730,13 @@ const App = {
     // ===================
     // ANNOUNCEMENTS
     // ===================
-    async loadAnnouncements() {
+    // The list is paged; "Load more" appends the next page
+    async loadAnnouncements(cursor = null) {
         const container = document.getElementById('announcements-list');
+        container.querySelector('.load-more')?.remove();
         try {
-            const data = await API.announcements.getAll();
-            if (data.announcements?.length > 0) {
-                container.innerHTML = data.announcements.map(a => `
+            const data = await API.announcements.getAll(cursor ? { cursor } : {});
+            const cards = (data.announcements || []).map(a => `
                     <div class="announcement-card ${a.is_pinned ? 'pinned' : ''}">
                         <h3>
                             ${a.is_pinned ? '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" width="18" height="18"><path d="M12 17v5"/><path d="M9 10.76a2 2 0 0 1-1.11 1.79l-1.78.9A2 2 0 0 0 5 15.24V16a1 1 0 0 0 1 1h12a1 1 0 0 0 1-1v-.76a2 2 0 0 0-1.11-1.79l-1.78-.9A2 2 0 0 1 15 10.76V7a1 1 0 0 1 1-1 2 2 0 0 0 0-4H8a2 2 0 0 0 0 4 1 1 0 0 1 1 1z"/></svg> ' : ''}
@@ -748,11 +749,22 @@ const App = {
                         </div>
                     </div>
                 `).join('');
+            if (cursor) {
+                container.insertAdjacentHTML('beforeend', cards);
             } else {
-                container.innerHTML = '<p class="empty-state">No announcements</p>';
+                container.innerHTML = cards || '<p class="empty-state">No announcements</p>';
+            }
+            if (data.next_cursor) {
+                container.insertAdjacentHTML('beforeend', `
+                    <button class="btn btn-secondary load-more" onclick="App.loadAnnouncements('${data.next_cursor}')">Load more</button>
+                `);
             }
         } catch (error) {
-            container.innerHTML = '<p class="empty-state">Failed to load announcements</p>';
+            if (cursor) {
+                this.showToast('Failed to load more announcements', 'error');
+            } else {
+                container.innerHTML = '<p class="empty-state">Failed to load announcements</p>';
+            }
         }
     },
 
@@ -960,15 +972,28 @@ const App = {
         }
     },
 
-    // Generate QR
-    async generateQR() {
-        const courseId = document.getElementById('qr-course').value;
+    // Generate QR; signed codes are refreshed for the same lecture until the modal closes
+    async generateQR(lectureId = null) {
+        clearTimeout(this.qrRotationTimer);
+        const courseId = document.getElementById('qr-course')?.value;
+        if (!courseId) return;
         try {
-            const data = await API.attendance.generateQR(courseId);
-            document.getElementById('qr-result').innerHTML = `
+            const data = await API.attendance.generateQR(courseId, lectureId);
+            const result = document.getElementById('qr-result');
+            if (!result) return;
+            const note = data.rotate_after_seconds
+                ? `Refreshes every ${data.rotate_after_seconds} seconds`
+                : `Expires in ${Math.floor(data.expires_in_seconds / 60)} minutes`;
+            result.innerHTML = `
                 <img src="${data.qr_image}" alt="QR Code" style="max-width: 250px; border-radius: 8px;">
-                <p style="margin-top: 12px; color: var(--text-muted);">Expires in ${Math.floor(data.expires_in_seconds / 60)} minutes</p>
+                <p style="margin-top: 12px; color: var(--text-muted);">${note}</p>
             `;
+            if (data.rotate_after_seconds) {
+                this.qrRotationTimer = setTimeout(
+                    () => this.generateQR(data.qr_code.lecture_id),
+                    data.rotate_after_seconds * 1000
+                );
+            }
         } catch (error) {
             this.showToast(error.message, 'error');
         }
@@ -1121,6 +1146,7 @@ const App = {
     },
 
     closeModal() {
+        clearTimeout(this.qrRotationTimer);
         document.getElementById('modal').classList.add('hidden');
         document.body.style.overflow = '';
     },
@@ -12,6 +12,11 @@ import shutil
 # Add backend to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
+# Cheapest bcrypt work factor, to keep the suite fast
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+# No snapshots or sweeps of the real data directory while testing
+os.environ.setdefault('BACKGROUND_SERVICES', 'false')
+
 from app import app as flask_app
 from services.storage_service import storage
 
@@ -35,11 +40,19 @@ def client(app):
 @pytest.fixture
 def temp_data_dir():
     """Create temporary data directory for tests."""
+    from services.attendance_ingest import attendance_ingestor
+    from services.auth_service import AuthService
+    
     temp_dir = tempfile.mkdtemp()
     old_data_dir = storage.data_dir
     storage.data_dir = temp_dir
+    # Principals and attendance keys cached for another data directory
+    AuthService.invalidate_principal()
+    attendance_ingestor.reset()
     yield temp_dir
     storage.data_dir = old_data_dir
+    AuthService.invalidate_principal()
+    attendance_ingestor.reset()
     shutil.rmtree(temp_dir, ignore_errors=True)
 
 
@@ -112,11 +125,11 @@ def sample_assignment():
 @pytest.fixture
 def auth_headers_student(client, sample_user, temp_data_dir):
     """Get authentication headers for student."""
-    from services.auth_service import bcrypt
+    from services.auth_service import AuthService
     
     # Create user in storage
     user = sample_user.copy()
-    user['password'] = bcrypt.generate_password_hash('password123').decode('utf-8')
+    user['password_hash'] = AuthService.hash_password('password123')
     storage.create('users', user)
     
     # Login
@@ -126,16 +139,16 @@ def auth_headers_student(client, sample_user, temp_data_dir):
     })
     
     data = response.get_json()
-    return {'Authorization': f'Bearer {data.get("token", "")}'}
+    return {'Authorization': f'Bearer {data.get("user", {}).get("token", "")}'}
 
 
 @pytest.fixture
 def auth_headers_faculty(client, sample_faculty, temp_data_dir):
     """Get authentication headers for faculty."""
-    from services.auth_service import bcrypt
+    from services.auth_service import AuthService
     
     user = sample_faculty.copy()
-    user['password'] = bcrypt.generate_password_hash('password123').decode('utf-8')
+    user['password_hash'] = AuthService.hash_password('password123')
     storage.create('users', user)
     
     response = client.post('/api/auth/login', json={
@@ -144,16 +157,16 @@ def auth_headers_faculty(client, sample_faculty, temp_data_dir):
     })
     
     data = response.get_json()
-    return {'Authorization': f'Bearer {data.get("token", "")}'}
+    return {'Authorization': f'Bearer {data.get("user", {}).get("token", "")}'}
 
 
 @pytest.fixture
 def auth_headers_admin(client, sample_admin, temp_data_dir):
     """Get authentication headers for admin."""
-    from services.auth_service import bcrypt
+    from services.auth_service import AuthService
     
     user = sample_admin.copy()
-    user['password'] = bcrypt.generate_password_hash('password123').decode('utf-8')
+    user['password_hash'] = AuthService.hash_password('password123')
     storage.create('users', user)
     
     response = client.post('/api/auth/login', json={
@@ -162,4 +175,4 @@ def auth_headers_admin(client, sample_admin, temp_data_dir):
     })
     
     data = response.get_json()
-    return {'Authorization': f'Bearer {data.get("token", "")}'}
+    return {'Authorization': f'Bearer {data.get("user", {}).get("token", "")}'}
@@ -16,6 +16,20 @@ class TestAdminUserManagement:
         assert 'users' in data
         assert 'total' in data
     
+    def test_get_users_cursor_pagination(self, client, auth_headers_admin, temp_data_dir):
+        """Test walking the user list with cursors."""
+        first = client.get('/api/admin/users?per_page=1', headers=auth_headers_admin).get_json()
+        assert len(first['users']) == 1
+        assert 'password_hash' not in first['users'][0]
+        
+        if first['total'] > 1:
+            second = client.get(f"/api/admin/users?per_page=1&cursor={first['next_cursor']}",
+                                headers=auth_headers_admin).get_json()
+            assert second['users'][0]['id'] != first['users'][0]['id']
+        
+        response = client.get('/api/admin/users?cursor=bogus', headers=auth_headers_admin)
+        assert response.status_code == 400
+    
     def test_get_users_without_admin_fails(self, client, auth_headers_student):
         """Test that non-admins cannot access user list."""
         response = client.get('/api/admin/users', headers=auth_headers_student)
@@ -41,10 +55,10 @@ class TestAdminUserManagement:
     def test_update_user_role(self, client, auth_headers_admin, sample_user, temp_data_dir):
         """Test updating a user's role."""
         from services.storage_service import storage
-        from services.auth_service import bcrypt
+        from services.auth_service import AuthService
         
         user = sample_user.copy()
-        user['password'] = bcrypt.generate_password_hash('pass').decode('utf-8')
+        user['password_hash'] = AuthService.hash_password('pass')
         storage.create('users', user)
         
         response = client.put(f'/api/admin/users/{user["id"]}/role',
@@ -56,10 +70,10 @@ class TestAdminUserManagement:
     def test_delete_user(self, client, auth_headers_admin, sample_user, temp_data_dir):
         """Test deactivating a user."""
         from services.storage_service import storage
-        from services.auth_service import bcrypt
+        from services.auth_service import AuthService
         
         user = sample_user.copy()
-        user['password'] = bcrypt.generate_password_hash('pass').decode('utf-8')
+        user['password_hash'] = AuthService.hash_password('pass')
         storage.create('users', user)
         
         response = client.delete(f'/api/admin/users/{user["id"]}',
@@ -67,6 +81,43 @@ class TestAdminUserManagement:
         
         assert response.status_code == 200
 
+    
+    def test_bulk_create_from_csv(self, client, auth_headers_admin, sample_admin, temp_data_dir):
+        """Test a CSV import that creates valid rows and reports the rest by line."""
+        import io
+        from services.auth_service import AuthService
+        
+        csv_data = (
+            "email,name,password,role,department\n"
+            "one@campus.edu,One,password1,student,Physics\n"
+            f"{sample_admin['email']},Taken,password2,student,\n"
+            "two@campus.edu,Two,short,student,\n"
+            "three@campus.edu,Three,password3,dean,\n"
+            "one@campus.edu,Again,password4,faculty,\n"
+            "four@campus.edu,Four,password5,faculty,Maths\n"
+        )
+        response = client.post('/api/admin/users/bulk-create', headers=auth_headers_admin,
+            data={'file': (io.BytesIO(csv_data.encode('utf-8')), 'users.csv')},
+            content_type='multipart/form-data')
+        
+        assert response.status_code == 201
+        data = response.get_json()
+        assert [u['email'] for u in data['users']] == ['one@campus.edu', 'four@campus.edu']
+        assert all('password_hash' not in u for u in data['users'])
+        assert [(e['index'], e['line']) for e in data['errors']] == [(1, 3), (2, 4), (3, 5), (4, 6)]
+        
+        success, user_data, _ = AuthService.authenticate('four@campus.edu', 'password5')
+        assert success and user_data['role'] == 'faculty'
+    
+    def test_bulk_create_rejects_bad_csv_header(self, client, auth_headers_admin, temp_data_dir):
+        """Test that a CSV without the required columns is rejected."""
+        response = client.post('/api/admin/users/bulk-create',
+            headers={'Content-Type': 'text/csv', **auth_headers_admin},
+            data='email,name\nx@campus.edu,X\n')
+        
+        assert response.status_code == 400
+        assert 'password' in response.get_json()['error']
+
 
 class TestAdminStats:
     """Test admin stats endpoints."""
@@ -0,0 +1,129 @@
+"""
+Tests for the Attendance Ingestion queue
+"""
+
+import threading
+
+import pytest
+
+from models.attendance import Attendance
+from services.attendance_ingest import AttendanceIngestor
+from services.storage_service import StorageService
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Storage service backed by a temporary data directory."""
+    return StorageService(str(tmp_path), columnar={'attendance': Attendance.COLUMNS})
+
+
+def _mark(student_id, lecture_id='lecture-1', **fields):
+    return Attendance(course_id='course-001', student_id=student_id, lecture_id=lecture_id, **fields).to_dict()
+
+
+class TestAttendanceIngestor:
+    """Test in-memory deduplication and batched attendance writes."""
+    
+    def test_duplicates_rejected(self, store):
+        """Test that repeats of stored or queued marks are rejected."""
+        store.create('attendance', _mark('student-1'))
+        ingestor = AttendanceIngestor(store)
+        
+        assert ingestor.submit(_mark('student-1')) is None
+        assert ingestor.submit(_mark('student-2')) is not None
+        assert ingestor.submit(_mark('student-2')) is None
+        assert ingestor.submit(_mark('student-2', 'lecture-2')) is not None
+        
+        store.invalidate()
+        assert store.count('attendance') == 3
+        assert ingestor.stats()['rejected_duplicates'] == 2
+    
+    def test_burst_is_written_in_batches(self, store):
+        """Test that concurrent scans share writes and all get stored once."""
+        ingestor = AttendanceIngestor(store)
+        results = []
+        
+        def scan(i):
+            results.append(ingestor.submit(_mark(f"student-{i % 100}")))
+        
+        threads = [threading.Thread(target=scan, args=(i,)) for i in range(150)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert sum(r is not None for r in results) == 100
+        store.invalidate()
+        assert store.count('attendance') == 100
+        assert ingestor.stats()['batches'] < 100
+    
+    def test_failed_write_can_be_retried(self, store, monkeypatch):
+        """Test that a failed batch raises and does not block a rescan."""
+        ingestor = AttendanceIngestor(store)
+        
+        def fail(collection, records, **kwargs):
+            raise OSError('disk full')
+        
+        monkeypatch.setattr(store, 'create_many', fail)
+        with pytest.raises(OSError):
+            ingestor.submit(_mark('student-1'))
+        
+        monkeypatch.undo()
+        assert ingestor.submit(_mark('student-1')) is not None
+        store.invalidate()
+        assert store.count('attendance') == 1
+    
+    def test_upsert_corrects_and_blocks_scans(self, store):
+        """Test that a roster updates scanned marks and stops later scans."""
+        ingestor = AttendanceIngestor(store)
+        scanned = ingestor.submit(_mark('student-1'))
+        
+        roster = [
+            {**_mark(f"student-{i}"), 'is_present': i % 2 == 0, 'marked_via': 'manual'}
+            for i in range(1, 301)
+        ]
+        created, updated = ingestor.upsert(roster)
+        
+        assert len(created) == 299
+        assert [r['id'] for r in updated] == [scanned['id']]
+        assert updated[0]['is_present'] is False and updated[0]['marked_via'] == 'manual'
+        assert ingestor.submit(_mark('student-2')) is None
+        store.invalidate()
+        assert store.count('attendance') == 300
+    
+    def test_other_writer_duplicate_rejected(self, tmp_path):
+        """Test that a mark written by another ingestor on the same data is rejected at write time."""
+        stores = [StorageService(str(tmp_path), columnar={'attendance': Attendance.COLUMNS}) for _ in range(2)]
+        ingestors = [AttendanceIngestor(s) for s in stores]
+        # Both load the (empty) keys of the day before either writes
+        assert not any(i.is_marked(_mark('student-1')) for i in ingestors)
+        
+        results = [i.submit(_mark('student-1')) for i in ingestors]
+        
+        assert results[0] is not None and results[1] is None
+        assert ingestors[1].stats()['rejected_duplicates'] == 1
+        stores[1].invalidate()
+        assert stores[1].count('attendance') == 1
+    
+    def test_loading_a_date_does_not_block_others(self, store, monkeypatch):
+        """Test that scans for a loaded date go through while another date loads."""
+        ingestor = AttendanceIngestor(store)
+        ingestor.is_marked(_mark('student-1', date='2024-03-01'))
+        loading, release = threading.Event(), threading.Event()
+        find = store.find
+        
+        def slow_find(collection, filters=None, **kwargs):
+            loading.set()
+            release.wait(5)
+            return find(collection, filters, **kwargs)
+        
+        monkeypatch.setattr(store, 'find', slow_find)
+        slow = threading.Thread(target=ingestor.submit, args=(_mark('student-1', date='2024-03-02'),))
+        slow.start()
+        assert loading.wait(5)
+        
+        assert ingestor.submit(_mark('student-1', date='2024-03-01')) is not None
+        release.set()
+        slow.join(5)
+        store.invalidate()
+        assert store.count('attendance') == 2
@@ -0,0 +1,176 @@
+"""
+Tests for Attendance Routes
+"""
+
+import time
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def faculty_json(auth_headers_faculty):
+    return {'Content-Type': 'application/json', **auth_headers_faculty}
+
+
+class TestSignedQRRoutes:
+    """Test the signed generate -> mark flow."""
+    
+    def test_generate_then_mark_once(self, client, faculty_json, auth_headers_student):
+        """Test that a fresh code marks attendance and a replay is rejected."""
+        response = client.post('/api/attendance/generate-qr', headers=faculty_json,
+                               json={'course_id': 'course-test-001', 'format': 'svg'})
+        assert response.status_code == 201
+        issued = response.get_json()
+        assert issued['qr_image'].startswith('data:image/svg+xml;base64,')
+        
+        response = client.post('/api/attendance/mark', headers=auth_headers_student,
+                               json={'qr_data': issued['qr_data']})
+        assert response.status_code == 201
+        marked = response.get_json()['attendance']
+        assert marked['course_id'] == 'course-test-001'
+        assert marked['lecture_id'] == issued['qr_code']['lecture_id']
+        
+        replay = client.post('/api/attendance/mark', headers=auth_headers_student,
+                             json={'qr_data': issued['qr_data']})
+        assert replay.status_code == 409
+    
+    def test_expired_and_tampered_codes_rejected(self, client, auth_headers_student):
+        """Test that stale or altered payloads do not mark attendance."""
+        from routes.attendance_routes import qr_signer
+        
+        expired = qr_signer.issue('course-test-001', 'lecture-1', now=time.time() - 3600)['payload']
+        response = client.post('/api/attendance/mark', headers=auth_headers_student, json={'qr_data': expired})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'QR code has expired'
+        
+        payload = qr_signer.issue('course-test-001', 'lecture-1')['payload']
+        for forged in (payload.replace('course-test-001', 'course-test-002'), payload[:-2] + 'xx'):
+            response = client.post('/api/attendance/mark', headers=auth_headers_student, json={'qr_data': forged})
+            assert response.status_code == 400
+            assert response.get_json()['error'] == 'Invalid QR code'
+    
+    def test_wrong_types_are_bad_requests(self, client, faculty_json, auth_headers_student):
+        """Test that malformed bodies get 400 instead of a server error."""
+        for body in ({'course_id': 'course-test-001', 'lecture_id': 5}, {'course_id': 5}, {}, [1]):
+            response = client.post('/api/attendance/generate-qr', headers=faculty_json, json=body)
+            assert response.status_code == 400, body
+        response = client.post('/api/attendance/generate-qr', headers=faculty_json, data='not json')
+        assert response.status_code == 400
+        
+        for body in ({'qr_data': 5}, {'qr_data': '  '}, {}):
+            response = client.post('/api/attendance/mark', headers=auth_headers_student, json=body)
+            assert response.status_code == 400, body
+        response = client.post('/api/attendance/mark', headers=auth_headers_student)
+        assert response.status_code == 400
+    
+    def test_students_cannot_generate(self, client, auth_headers_student):
+        """Test that only faculty issue codes."""
+        response = client.post('/api/attendance/generate-qr', headers=auth_headers_student,
+                               json={'course_id': 'course-test-001'})
+        assert response.status_code == 403
+
+
+@pytest.fixture
+def enrolled_course(sample_course, sample_user, temp_data_dir):
+    """The sample course with three enrolled students."""
+    from services.storage_service import storage
+    
+    for student_id in ('student-2', 'student-3'):
+        storage.create('users', {'id': student_id, 'email': f'{student_id}@campus.edu', 'role': 'student'})
+    storage.create('users', {'id': 'student-4', 'email': 'student-4@campus.edu', 'role': 'student'})
+    course = {**sample_course, 'students': [sample_user['id'], 'student-2', 'student-3']}
+    return storage.create('courses', course)
+
+
+class TestBulkAttendance:
+    """Test marking a whole roster at once."""
+    
+    def test_roster_corrects_scanned_mark(self, client, faculty_json, auth_headers_student, sample_user,
+                                          enrolled_course):
+        """Test that a roster updates the scanned mark and creates the rest."""
+        issued = client.post('/api/attendance/generate-qr', headers=faculty_json,
+                             json={'course_id': 'course-test-001'}).get_json()
+        response = client.post('/api/attendance/mark', headers=auth_headers_student,
+                               json={'qr_data': issued['qr_data']})
+        assert response.status_code == 201
+        scanned = response.get_json()['attendance']
+        
+        response = client.post('/api/attendance/bulk', headers=faculty_json, json={
+            'course_id': 'course-test-001',
+            'lecture_id': scanned['lecture_id'],
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'records': [
+                {'student_id': sample_user['id'], 'is_present': False},
+                {'student_id': 'student-2', 'is_present': True},
+                {'student_id': 'student-3', 'is_present': False},
+            ]
+        })
+        assert response.status_code == 200
+        body = response.get_json()
+        assert (body['created'], body['updated']) == (2, 1)
+        corrected = next(r for r in body['attendance'] if r['student_id'] == sample_user['id'])
+        assert corrected['id'] == scanned['id']
+        assert corrected['is_present'] is False and corrected['marked_via'] == 'manual'
+        
+        replay = client.post('/api/attendance/mark', headers=auth_headers_student,
+                             json={'qr_data': issued['qr_data']})
+        assert replay.status_code == 409
+    
+    def test_duplicate_students_rejected(self, client, faculty_json):
+        """Test that a roster naming a student twice is a bad request."""
+        response = client.post('/api/attendance/bulk', headers=faculty_json, json={
+            'course_id': 'course-test-001',
+            'records': [
+                {'student_id': 'student-2', 'is_present': True},
+                {'student_id': 'student-2', 'is_present': False},
+            ]
+        })
+        assert response.status_code == 400
+        assert response.get_json()['student_ids'] == ['student-2']
+    
+    def test_bad_date_rejected(self, client, faculty_json):
+        """Test that dates other than YYYY-MM-DD are bad requests."""
+        for date in ('18/10/2026', '2026-13-01', 20261018):
+            response = client.post('/api/attendance/bulk', headers=faculty_json, json={
+                'course_id': 'course-test-001', 'date': date,
+                'records': [{'student_id': 'student-2', 'is_present': True}]
+            })
+            assert response.status_code == 400, date
+        response = client.post('/api/attendance/bulk', headers=faculty_json, data='not json')
+        assert response.status_code == 400
+    
+    def test_students_cannot_mark_rosters(self, client, auth_headers_student):
+        """Test that only faculty and admins submit rosters."""
+        response = client.post('/api/attendance/bulk', headers=auth_headers_student, json={
+            'course_id': 'course-test-001',
+            'records': [{'student_id': 'test-student-001', 'is_present': True}]
+        })
+        assert response.status_code == 403
+    
+    def test_unknown_and_unenrolled_students_rejected(self, client, faculty_json, enrolled_course):
+        """Test that ids outside the users collection or the course roster are listed in a 400."""
+        response = client.post('/api/attendance/bulk', headers=faculty_json, json={
+            'course_id': 'course-test-001',
+            'records': [
+                {'student_id': 'student-2', 'is_present': True},
+                {'student_id': 'student-4', 'is_present': True},
+                {'student_id': 'nobody', 'is_present': False},
+                {'student_id': 'test-faculty-001', 'is_present': True},
+            ]
+        })
+        assert response.status_code == 400
+        assert response.get_json()['student_ids'] == ['nobody', 'student-4', 'test-faculty-001']
+    
+    def test_only_the_instructor_marks_a_course(self, client, faculty_json, enrolled_course):
+        """Test that faculty cannot mark rosters of courses they do not teach."""
+        from services.storage_service import storage
+        
+        storage.create('courses', {'id': 'course-other', 'instructor_id': 'someone-else', 'students': ['student-2']})
+        roster = [{'student_id': 'student-2', 'is_present': True}]
+        response = client.post('/api/attendance/bulk', headers=faculty_json,
+                               json={'course_id': 'course-other', 'records': roster})
+        assert response.status_code == 403
+        response = client.post('/api/attendance/bulk', headers=faculty_json,
+                               json={'course_id': 'missing', 'records': roster})
+        assert response.status_code == 404
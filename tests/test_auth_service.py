@@ -0,0 +1,250 @@
+"""
+Tests for the Auth Service
+"""
+
+import pytest
+
+from services.auth_service import AuthService
+from services.storage_service import storage
+
+
+@pytest.fixture
+def principal_user(temp_data_dir, sample_user):
+    """A stored user and a token for it."""
+    storage.create('users', {**sample_user, 'password_hash': 'x'})
+    return sample_user, AuthService.generate_token(sample_user)
+
+
+class TestPrincipalCache:
+    """Test caching of authenticated principals."""
+    
+    def test_repeat_requests_skip_lookup(self, principal_user, monkeypatch):
+        """Test that a cached token needs no decode or user lookup."""
+        user, token = principal_user
+        first = AuthService.get_current_user(token)
+        assert first['id'] == user['id'] and 'password_hash' not in first
+        
+        monkeypatch.setattr(storage, 'get_by_id', lambda *args: pytest.fail('user was looked up'))
+        monkeypatch.setattr(AuthService, 'verify_token', lambda token: pytest.fail('token was decoded'))
+        assert AuthService.get_current_user(token) is first
+        with pytest.raises(TypeError):
+            first['role'] = 'admin'
+    
+    def test_invalidate_principal(self, principal_user):
+        """Test that invalidation makes the next request see user changes."""
+        user, token = principal_user
+        assert AuthService.get_current_user(token)['role'] == 'student'
+        
+        storage.update('users', user['id'], {'role': 'faculty'})
+        assert AuthService.get_current_user(token)['role'] == 'student'
+        AuthService.invalidate_principal(user['id'])
+        assert AuthService.get_current_user(token)['role'] == 'faculty'
+        
+        storage.delete('users', user['id'])
+        AuthService.invalidate_principal(user['id'])
+        assert AuthService.get_current_user(token) is None
+    
+    def test_invalidation_reaches_other_workers(self, principal_user, temp_data_dir):
+        """Test that a user changed and invalidated by another worker is reloaded after a sync."""
+        from services.storage_service import StorageService
+        
+        user, token = principal_user
+        assert AuthService.get_current_user(token)['is_active'] is not False
+        
+        # Another worker, with its own storage instance on the same data
+        other = StorageService(temp_data_dir)
+        other.update('users', user['id'], {'is_active': False})
+        other.create(AuthService.INVALIDATION_COLLECTION, {
+            'id': 'other-worker', 'user_id': user['id'], 'expires_at': '2999-01-01T00:00:00'
+        })
+        assert AuthService.get_current_user(token)['is_active'] is not False
+        
+        AuthService.sync_invalidations()
+        assert AuthService.get_current_user(token)['is_active'] is False
+        assert AuthService.get_current_user(token) is AuthService.get_current_user(token)
+    
+    def test_invalidation_is_stored_until_cached_principals_expire(self, principal_user):
+        """Test that invalidating a user leaves a record that expires after the cache TTL."""
+        from datetime import datetime
+        
+        user, _ = principal_user
+        AuthService.invalidate_principal(user['id'])
+        
+        [record] = storage.get_all(AuthService.INVALIDATION_COLLECTION)
+        assert record['user_id'] == user['id']
+        kept = datetime.fromisoformat(record['expires_at']) - datetime.now()
+        assert AuthService.PRINCIPAL_TTL_SECONDS < kept.total_seconds() <= (
+            AuthService.PRINCIPAL_TTL_SECONDS + AuthService.REVOCATION_SYNC_SECONDS)
+    
+    def test_entries_expire(self, principal_user, monkeypatch):
+        """Test that cached principals are dropped after the TTL."""
+        user, token = principal_user
+        clock = [1000.0]
+        monkeypatch.setattr('services.auth_service.time.time', lambda: clock[0])
+        AuthService.get_current_user(token)
+        storage.update('users', user['id'], {'name': 'Renamed'})
+        
+        clock[0] += AuthService.PRINCIPAL_TTL_SECONDS - 1
+        assert AuthService.get_current_user(token)['name'] == user['name']
+        clock[0] += 2
+        assert AuthService.get_current_user(token)['name'] == 'Renamed'
+
+
+
+class TestTokenRevocation:
+    """Test logout revoking tokens until they expire."""
+    
+    def test_logout_revokes_token(self, client, principal_user):
+        """Test that a logged out token is rejected, even when cached."""
+        user, token = principal_user
+        other = AuthService.generate_token(user)
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+        
+        assert client.post('/api/auth/logout', headers=headers).status_code == 200
+        assert client.get('/api/auth/me', headers=headers).status_code == 401
+        assert client.get('/api/auth/me', headers={'Authorization': f'Bearer {other}'}).status_code == 200
+    
+    def test_revoking_twice_is_idempotent(self, client, principal_user, tmp_path, monkeypatch):
+        """Test that repeated logouts with one token succeed and store one revocation, on both backends."""
+        from database import create_db_engine
+        from services import auth_service
+        from services.sqlite_storage import SQLiteStorageService
+        
+        user, token = principal_user
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.post('/api/auth/logout', headers=headers).status_code == 200
+        assert AuthService.revoke_token(token) is True
+        assert storage.count(AuthService.REVOKED_COLLECTION) == 1
+        
+        sqlite_store = SQLiteStorageService(create_db_engine(f"sqlite:///{tmp_path / 'test.db'}"))
+        monkeypatch.setattr(auth_service, 'storage', sqlite_store)
+        assert AuthService.revoke_token(token) is True
+        assert AuthService.revoke_token(token) is True
+        assert sqlite_store.count(AuthService.REVOKED_COLLECTION) == 1
+    
+    def test_sync_sees_other_workers_and_drops_expired(self, principal_user):
+        """Test that stored revocations are loaded and expired ones left out."""
+        user, token = principal_user
+        jti = AuthService.verify_token(token)['jti']
+        assert AuthService.get_current_user(token) is not None
+        
+        storage.create_many(AuthService.REVOKED_COLLECTION, [
+            {'id': jti, 'user_id': user['id'], 'expires_at': '2999-01-01T00:00:00'},
+            {'id': 'expired-jti', 'user_id': user['id'], 'expires_at': '2000-01-01T00:00:00'}
+        ])
+        AuthService.sync_revocations()
+        assert AuthService.get_current_user(token) is None
+        assert not AuthService.is_revoked('expired-jti')
+        assert storage.purge_expired(AuthService.REVOKED_COLLECTION) == 1
+    
+    def test_token_without_jti_not_revocable(self, principal_user):
+        """Test that tokens issued before jti claims still work."""
+        import jwt
+        
+        user, _ = principal_user
+        payload = AuthService.verify_token(AuthService.generate_token(user))
+        del payload['jti']
+        legacy = jwt.encode(payload, AuthService.SECRET_KEY, algorithm='HS256')
+        
+        assert AuthService.revoke_token(legacy) is False
+        assert AuthService.get_current_user(legacy)['id'] == user['id']
+
+class TestBcryptPool:
+    """Test the bounded bcrypt worker pool."""
+    
+    def test_passwords_round_trip(self):
+        """Test hashing and verification through the pool."""
+        hashed = AuthService.hash_passwords(['secret1', 'secret2'])
+        
+        assert AuthService.verify_password('secret1', hashed[0])
+        assert not AuthService.verify_password('secret1', hashed[1])
+        assert not AuthService.verify_password('secret1', 'not-a-hash')
+    
+    def test_saturated_pool_rejects(self):
+        """Test that jobs beyond workers + max_queue are rejected, not queued."""
+        import threading
+        from services.bcrypt_pool import BcryptPool, PoolSaturated
+        
+        pool = BcryptPool(workers=1, max_queue=1)
+        started, release = threading.Event(), threading.Event()
+        
+        def job():
+            started.set()
+            return release.wait()
+        
+        futures = [pool.submit(job), pool.submit(job)]
+        started.wait(5)
+        with pytest.raises(PoolSaturated):
+            pool.submit(job)
+        assert pool.stats()['queue_depth'] == 1
+        assert pool.stats()['rejected'] == 1
+        
+        release.set()
+        assert all(f.result(5) for f in futures)
+        assert pool.run(sum, (1, 2)) == 3
+    
+    def test_timeout_is_saturation(self, client, monkeypatch):
+        """Test that a login stuck behind a busy pool gets 503, not a wrong password."""
+        import threading
+        from services import auth_service
+        from services.bcrypt_pool import BcryptPool, PoolSaturated
+        
+        pool = BcryptPool(workers=1, max_queue=4, timeout=0.05)
+        release = threading.Event()
+        blocker = pool.submit(release.wait)
+        try:
+            with pytest.raises(PoolSaturated):
+                pool.run(sum, (1, 2))
+            assert pool.stats()['rejected'] == 1
+            
+            monkeypatch.setattr(auth_service, 'bcrypt_pool', pool)
+            monkeypatch.setattr('services.auth_service.storage.first',
+                                lambda *args, **kwargs: {'password_hash': '$2b$04$' + 'x' * 53})
+            response = client.post('/api/auth/login', json={'email': 'a@campus.edu', 'password': 'secret'})
+            assert response.status_code == 503
+        finally:
+            release.set()
+            blocker.result(5)
+        assert AuthService.verify_password('secret', 'not-a-hash') is False
+    
+    def test_saturation_returns_503(self, client, monkeypatch):
+        """Test that a full pool answers logins with 503."""
+        from services.bcrypt_pool import PoolSaturated
+        
+        def saturated(*args):
+            raise PoolSaturated("full")
+        
+        monkeypatch.setattr(AuthService, 'verify_password', saturated)
+        monkeypatch.setattr('services.auth_service.storage.first', lambda *args, **kwargs: {'password_hash': 'x'})
+        response = client.post('/api/auth/login', json={'email': 'a@campus.edu', 'password': 'secret'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+
+class TestPasswordRehash:
+    """Test the configurable work factor and rehash on login."""
+    
+    def test_hash_uses_configured_rounds(self, monkeypatch):
+        """Test that new hashes carry the configured cost."""
+        monkeypatch.setattr(AuthService, 'BCRYPT_ROUNDS', 5)
+        hashed = AuthService.hash_password('secret1')
+        
+        assert hashed.startswith('$2b$05$')
+        assert not AuthService.needs_rehash(hashed)
+        assert AuthService.needs_rehash('$2b$04$' + hashed[7:])
+        assert not AuthService.needs_rehash('not-a-hash')
+    
+    def test_login_rehashes_outdated_cost(self, temp_data_dir, sample_user, monkeypatch):
+        """Test that a login moves an old-cost hash to the configured cost."""
+        monkeypatch.setattr(AuthService, 'BCRYPT_ROUNDS', 4)
+        storage.create('users', {**sample_user, 'password_hash': AuthService.hash_password('secret1')})
+        
+        monkeypatch.setattr(AuthService, 'BCRYPT_ROUNDS', 5)
+        assert AuthService.authenticate(sample_user['email'], 'secret1')[0]
+        rehashed = storage.get_by_id('users', sample_user['id'])['password_hash']
+        assert rehashed.startswith('$2b$05$')
+        
+        assert AuthService.authenticate(sample_user['email'], 'secret1')[0]
+        assert storage.get_by_id('users', sample_user['id'])['password_hash'] == rehashed
+        assert not AuthService.authenticate(sample_user['email'], 'wrong')[0]
@@ -0,0 +1,112 @@
+"""
+Tests for Backup Service
+"""
+
+import os
+import pytest
+
+from services.backup_service import BackupService
+from services.storage_service import StorageService
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    path = tmp_path / 'data'
+    path.mkdir()
+    return str(path)
+
+
+class TestBackupService:
+    """Test snapshots, retention and restore."""
+    
+    def test_writes_no_longer_copy_backups(self, data_dir):
+        """Test that the write path leaves no .backup files behind."""
+        store = StorageService(data_dir)
+        store.create('rooms', {'id': 'r1'})
+        store.create('rooms', {'id': 'r2'})
+        assert not any(name.endswith('.backup') for name in os.listdir(data_dir))
+    
+    @pytest.mark.parametrize('mode', ['link', 'gzip'])
+    def test_snapshot_and_restore(self, data_dir, tmp_path, mode):
+        """Test that a restore brings back the snapshotted state."""
+        store = StorageService(data_dir, engine='journal')
+        store.create('rooms', {'id': 'r1'})
+        backups = BackupService(data_dir, str(tmp_path / 'backups'), retention=5, mode=mode)
+        name = backups.snapshot()
+        
+        store.create('rooms', {'id': 'r2'})
+        store.delete('rooms', 'r1')
+        assert backups.restore(name, ['rooms']) == ['rooms']
+        assert [r['id'] for r in store.get_all('rooms')] == ['r1']
+    
+    def test_hard_links_are_stable(self, data_dir, tmp_path):
+        """Test that a linked snapshot keeps its content after later writes."""
+        store = StorageService(data_dir)
+        store.create('rooms', {'id': 'r1'})
+        backups = BackupService(data_dir, str(tmp_path / 'backups'), mode='link')
+        name = backups.snapshot()
+        store.create('rooms', {'id': 'r2'})
+        
+        restored = StorageService(str(tmp_path / 'backups' / name))
+        assert [r['id'] for r in restored.get_all('rooms')] == ['r1']
+    
+    def test_retention_prunes_oldest(self, data_dir, tmp_path):
+        """Test that only the newest snapshots are kept."""
+        StorageService(data_dir)
+        backups = BackupService(data_dir, str(tmp_path / 'backups'), retention=2)
+        names = [backups.snapshot() for _ in range(4)]
+        assert backups.list_snapshots() == names[-2:]
+    
+    def test_restore_unknown_snapshot(self, data_dir, tmp_path):
+        """Test that restoring a missing snapshot is an error."""
+        with pytest.raises(ValueError):
+            BackupService(data_dir, str(tmp_path / 'backups')).restore('missing')
+    
+    def test_scheduled_run_skips_recent_snapshot(self, data_dir, tmp_path):
+        """Test that a worker sees a snapshot another one just took."""
+        backups = BackupService(data_dir, str(tmp_path / 'backups'))
+        assert backups.seconds_since_snapshot() == float('inf')
+        backups.snapshot()
+        assert backups.seconds_since_snapshot() < 60
+
+
+class TestBackgroundServices:
+    """Test that the app starts its background jobs."""
+    
+    def test_app_starts_backups_once(self, monkeypatch):
+        """Test that snapshots and expiry sweeps start with the app, once per process."""
+        import app as app_module
+        
+        started = []
+        
+        class FakeBackupService:
+            def __init__(self, data_dir):
+                self.data_dir = data_dir
+            
+            def start(self):
+                started.append(self.data_dir)
+        
+        class FakeSweeper:
+            def __init__(self, store):
+                self.store = store
+            
+            def start(self):
+                started.append(self.store)
+        
+        monkeypatch.setattr(app_module, 'BackupService', FakeBackupService)
+        monkeypatch.setattr(app_module, 'ExpirySweeper', FakeSweeper)
+        monkeypatch.setattr(app_module, '_background_started', False)
+        assert app_module.start_background_services() is True
+        assert app_module.start_background_services() is False
+        assert started == [app_module.app.config['DATA_DIR'], app_module.storage]
+    
+    def test_backup_schedule_starts_once(self, data_dir, tmp_path):
+        """Test that a second start() keeps the running schedule."""
+        backups = BackupService(data_dir, str(tmp_path / 'backups'))
+        backups.start(interval_minutes=60)
+        timer = backups._timer
+        try:
+            backups.start(interval_minutes=60)
+            assert backups._timer is timer
+        finally:
+            backups.stop()
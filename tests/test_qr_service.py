@@ -0,0 +1,115 @@
+"""
+Tests for the QR Service
+"""
+
+import pytest
+
+from services.qr_service import QRRenderer, QRSigner, render_qr
+
+
+@pytest.fixture
+def signer():
+    return QRSigner('test-key', rotate_seconds=15, grace_seconds=10)
+
+
+class TestQRSigner:
+    """Test signed, rotating attendance QR payloads."""
+    
+    def test_issue_and_verify(self, signer):
+        """Test that an issued payload verifies to its course and lecture."""
+        issued = signer.issue('course-001', 'lecture-1', now=1000)
+        
+        assert QRSigner.is_signed(issued['payload'])
+        assert issued['expires_in_seconds'] == 25
+        assert issued['rotate_after_seconds'] == 15
+        claims, error = signer.verify(issued['payload'], now=1020)
+        assert error is None
+        assert claims == {'course_id': 'course-001', 'lecture_id': 'lecture-1'}
+    
+    def test_expired_payload_rejected(self, signer):
+        """Test that a payload stops verifying after rotation plus grace."""
+        payload = signer.issue('course-001', 'lecture-1', now=1000)['payload']
+        
+        assert signer.verify(payload, now=1025)[1] is None
+        assert signer.verify(payload, now=1026) == (None, "QR code has expired")
+    
+    def test_tampered_payload_rejected(self, signer):
+        """Test that changing any field or using another key fails."""
+        payload = signer.issue('course-001', 'lecture-1', now=1000)['payload']
+        
+        for forged in (
+            payload.replace('course-001', 'course-002'),
+            payload.replace('|1025|', '|9999|'),
+            payload[:-2] + 'xx',
+            payload + 'é',
+            'A1|course-001|lecture-1|1025',
+        ):
+            assert signer.verify(forged, now=1000) == (None, "Invalid QR code")
+        assert QRSigner('other-key').verify(payload, now=1000) == (None, "Invalid QR code")
+    
+    def test_rotation_keeps_lecture(self, signer):
+        """Test that rotated codes differ but name the same lecture."""
+        first = signer.issue('course-001', 'lecture-1', now=1000)['payload']
+        second = signer.issue('course-001', 'lecture-1', now=1015)['payload']
+        
+        assert first != second
+        assert signer.verify(first, now=1016)[0] == signer.verify(second, now=1016)[0]
+    
+    def test_separator_in_ids_rejected(self, signer):
+        """Test that ids cannot smuggle extra fields into a payload."""
+        with pytest.raises(ValueError):
+            signer.issue('course|x', 'lecture-1')
+
+
+class TestQRRenderer:
+    """Test QR image rendering, caching and latency stats."""
+    
+    PAYLOAD = 'A1|course-001|lecture-1|1025|signature'
+    
+    def test_png_matches_qrcode_image(self):
+        """Test that the PNG has the same modules as the qrcode library draws."""
+        import base64
+        from io import BytesIO
+        import qrcode
+        from PIL import Image
+        
+        qr = qrcode.QRCode(version=1, box_size=10, border=5)
+        qr.add_data(self.PAYLOAD)
+        qr.make(fit=True)
+        expected = qr.make_image(fill_color="black", back_color="white").get_image().convert('1')
+        
+        uri = render_qr(self.PAYLOAD, 'png')
+        assert uri.startswith('data:image/png;base64,')
+        image = Image.open(BytesIO(base64.b64decode(uri.split(',', 1)[1]))).convert('1')
+        assert image.size == expected.size
+        assert image.tobytes() == expected.tobytes()
+    
+    def test_svg_output(self):
+        """Test that SVG output is a single path scaled by viewBox."""
+        import base64
+        
+        uri = render_qr(self.PAYLOAD, 'svg')
+        assert uri.startswith('data:image/svg+xml;base64,')
+        svg = base64.b64decode(uri.split(',', 1)[1]).decode('utf-8')
+        assert svg.startswith('<svg') and 'viewBox="0 0 ' in svg
+        assert svg.count('<path') == 1
+    
+    def test_cache_and_stats(self):
+        """Test that repeated payloads hit the LRU and the LRU is bounded."""
+        renderer = QRRenderer(workers=2, cache_size=2)
+        try:
+            first = renderer.render(self.PAYLOAD)
+            assert renderer.render(self.PAYLOAD) == first
+            renderer.render(self.PAYLOAD, 'svg')
+            renderer.render(self.PAYLOAD + 'x')
+            
+            stats = renderer.stats()
+            assert stats['renders'] == 3
+            assert stats['cache_hits'] == 1
+            assert stats['cached'] == 2
+            assert stats['latency_ms']['p50'] <= stats['latency_ms']['p99'] <= stats['latency_ms']['max']
+            
+            with pytest.raises(ValueError):
+                renderer.render(self.PAYLOAD, 'gif')
+        finally:
+            renderer.shutdown()
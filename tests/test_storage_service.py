@@ -0,0 +1,860 @@
+"""
+Tests for Storage Service
+"""
+
+import copy
+import json
+import multiprocessing
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+import pytest
+
+from models.attendance import Attendance
+from services import columnar
+from services.storage_service import StorageService, FrozenRecord, ExpirySweeper, _CachedCollection
+
+
+def _qrcodes():
+    """One expired and one live QR code record."""
+    now = datetime.now()
+    return [
+        {'id': 'old', 'code_data': 'aaa', 'expires_at': (now - timedelta(minutes=1)).isoformat()},
+        {'id': 'new', 'code_data': 'bbb', 'expires_at': (now + timedelta(minutes=5)).isoformat()},
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Storage service backed by a temporary data directory."""
+    return StorageService(str(tmp_path))
+
+
+class TestReadCache:
+    """Test the parsed-collection cache."""
+    
+    def test_repeated_reads_hit_cache(self, store):
+        """Test that reads after the first are served from memory."""
+        store.create('users', {'id': 'u1', 'email': 'a@campus.edu'})
+        before = store.cache_stats()
+        
+        store.get_all('users')
+        store.get_by_id('users', 'u1')
+        store.get_by_field('users', 'email', 'a@campus.edu')
+        
+        after = store.cache_stats()
+        assert after['hits'] == before['hits'] + 3
+        assert after['misses'] == before['misses']
+    
+    def test_external_write_invalidates_cache(self, store):
+        """Test that a change to the file on disk is picked up."""
+        store.create('users', {'id': 'u1', 'name': 'Old'})
+        store.get_all('users')
+        
+        filepath = os.path.join(store.data_dir, 'users.json')
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump([{'id': 'u1', 'name': 'New name'}], f)
+        
+        assert store.get_by_id('users', 'u1')['name'] == 'New name'
+    
+    def test_returned_records_do_not_alias_cache(self, store):
+        """Test that returned records cannot change the cache."""
+        saved = store.create('users', {'id': 'u1', 'name': 'Test', 'password_hash': 'x'})
+        saved.pop('password_hash')
+        
+        fetched = store.get_by_id('users', 'u1')
+        with pytest.raises(TypeError):
+            fetched['name'] = 'Changed'
+        with pytest.raises(TypeError):
+            fetched.pop('password_hash')
+        
+        editable = dict(fetched)
+        editable['name'] = 'Changed'
+        assert store.get_by_id('users', 'u1') == {'id': 'u1', 'name': 'Test', 'password_hash': 'x'}
+    
+    def test_reads_share_cached_records(self, store):
+        """Test that reads hand out the cached records without copying."""
+        store.create('users', {'id': 'u1', 'role': 'student'})
+        record = store.get_by_id('users', 'u1')
+        assert isinstance(record, FrozenRecord)
+        assert store.get_all('users')[0] is record
+        assert store.first('users', {'role': 'student'}) is record
+        
+        updated = store.update('users', 'u1', {'role': 'faculty'})
+        assert record['role'] == 'student'  # earlier views stay consistent
+        assert store.get_by_id('users', 'u1') is updated
+        assert copy.deepcopy(updated) == {'id': 'u1', 'role': 'faculty'}
+    
+    def test_writes_refresh_cache(self, store):
+        """Test that create, update and delete are visible without a re-read."""
+        store.create('bookings', {'id': 'b1', 'status': 'confirmed'})
+        store.update('bookings', 'b1', {'status': 'cancelled'})
+        store.create('bookings', {'id': 'b2', 'status': 'confirmed'})
+        store.delete('bookings', 'b2')
+        misses = store.cache_stats()['misses']
+        
+        assert store.get_all('bookings') == [{'id': 'b1', 'status': 'cancelled'}]
+        assert store.cache_stats()['misses'] == misses
+
+
+class TestSecondaryIndexes:
+    """Test index-backed lookups."""
+    
+    def test_query_uses_composite_index(self, store):
+        """Test that a four-field attendance query is answered from the index."""
+        for i in range(5):
+            store.create('attendance', {
+                'id': f'a{i}', 'course_id': 'c1', 'student_id': f's{i % 2}',
+                'date': '2026-02-01', 'lecture_id': 'l1', 'is_present': True
+            })
+        lookups = store.cache_stats()['index_lookups']
+        
+        results = store.query('attendance', {
+            'course_id': 'c1', 'student_id': 's1',
+            'date': '2026-02-01', 'lecture_id': 'l1'
+        })
+        
+        assert [r['id'] for r in results] == ['a1', 'a3']
+        assert store.cache_stats()['index_lookups'] == lookups + 1
+    
+    def test_index_follows_updates_and_deletes(self, store):
+        """Test that indexes stay correct across writes."""
+        store.create('users', {'id': 'u1', 'email': 'old@campus.edu'})
+        store.create('users', {'id': 'u2', 'email': 'other@campus.edu'})
+        assert store.get_by_field('users', 'email', 'old@campus.edu')
+        
+        store.update('users', 'u1', {'email': 'new@campus.edu'})
+        assert store.get_by_field('users', 'email', 'old@campus.edu') == []
+        assert store.get_by_field('users', 'email', 'new@campus.edu')[0]['id'] == 'u1'
+        
+        store.delete('users', 'u1')
+        assert store.get_by_field('users', 'email', 'new@campus.edu') == []
+        assert store.get_by_field('users', 'email', 'other@campus.edu')[0]['id'] == 'u2'
+    
+    def test_create_index_on_custom_collection(self, store):
+        """Test declaring an index at runtime."""
+        store.create('events', {'id': 'e1', 'event_type': 'seminar', 'tags': ['a']})
+        store.create('events', {'id': 'e2', 'event_type': 'workshop', 'tags': ['b']})
+        store.create_index('events', 'event_type')
+        store.create_index('events', 'tags')
+        
+        assert [e['id'] for e in store.get_by_field('events', 'event_type', 'workshop')] == ['e2']
+        # Unhashable values fall back to a scan
+        assert [e['id'] for e in store.get_by_field('events', 'tags', ['a'])] == ['e1']
+
+
+class TestPrimaryKeyMap:
+    """Test id-keyed record access."""
+    
+    def test_point_operations_preserve_order(self, store):
+        """Test that update and delete by id keep file order intact."""
+        for i in range(4):
+            store.create('submissions', {'id': f's{i}', 'marks': None})
+        
+        store.update('submissions', 's1', {'marks': 90})
+        store.delete('submissions', 's2')
+        
+        assert store.get_by_id('submissions', 's1')['marks'] == 90
+        assert store.get_by_id('submissions', 's2') is None
+        assert [s['id'] for s in store.get_all('submissions')] == ['s0', 's1', 's3']
+        
+        store.invalidate()
+        assert [s['id'] for s in store.get_all('submissions')] == ['s0', 's1', 's3']
+    
+    def test_records_without_unique_ids_are_kept(self, store):
+        """Test that duplicate or missing ids are not collapsed."""
+        filepath = os.path.join(store.data_dir, 'rooms.json')
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump([{'id': 'r1', 'n': 1}, {'id': 'r1', 'n': 2}, {'n': 3}], f)
+        
+        assert store.count('rooms') == 3
+        assert store.get_by_id('rooms', 'r1')['n'] == 1
+        
+        store.create('rooms', {'id': 'r2', 'n': 4})
+        store.invalidate()
+        assert [r['n'] for r in store.get_all('rooms')] == [1, 2, 3, 4]
+
+
+class TestJournalEngine:
+    """Test the append-only journal engine."""
+    
+    @pytest.fixture
+    def journal_store(self, tmp_path):
+        return StorageService(str(tmp_path), engine='journal')
+    
+    def test_mutations_append_and_replay(self, journal_store, tmp_path):
+        """Test that writes go to the journal and survive a restart."""
+        journal_store.create('attendance', {'id': 'a1', 'is_present': True})
+        journal_store.create('attendance', {'id': 'a2', 'is_present': True})
+        journal_store.update('attendance', 'a1', {'is_present': False})
+        journal_store.delete('attendance', 'a2')
+        
+        with open(tmp_path / 'attendance.json', encoding='utf-8') as f:
+            assert json.load(f) == []
+        with open(tmp_path / 'attendance.json.journal', encoding='utf-8') as f:
+            assert len(f.readlines()) == 4
+        
+        reopened = StorageService(str(tmp_path), engine='journal')
+        assert reopened.get_all('attendance') == [{'id': 'a1', 'is_present': False}]
+    
+    def test_compaction_folds_journal(self, journal_store, tmp_path):
+        """Test that compaction writes the data file and clears the journal."""
+        for i in range(3):
+            journal_store.create('attendance', {'id': f'a{i}'})
+        journal_store.compact('attendance')
+        
+        assert not os.path.exists(tmp_path / 'attendance.json.journal')
+        with open(tmp_path / 'attendance.json', encoding='utf-8') as f:
+            assert [r['id'] for r in json.load(f)] == ['a0', 'a1', 'a2']
+        assert StorageService(str(tmp_path)).count('attendance') == 3
+    
+    def test_replay_is_idempotent_after_interrupted_compaction(self, journal_store, tmp_path):
+        """Test that a journal already folded into the data file replays cleanly."""
+        journal_store.create('attendance', {'id': 'a1'})
+        journal_store.update('attendance', 'a1', {'is_present': True})
+        os.replace(tmp_path / 'attendance.json.journal', tmp_path / 'attendance.json.journal.compacting')
+        journal_store._write_file(str(tmp_path / 'attendance.json'), [{'id': 'a1', 'is_present': True}])
+        
+        reopened = StorageService(str(tmp_path), engine='journal')
+        assert reopened.get_all('attendance') == [{'id': 'a1', 'is_present': True}]
+    
+    def test_torn_last_line_is_discarded(self, journal_store, tmp_path):
+        """Test recovery from a crash in the middle of an append."""
+        journal_store.create('attendance', {'id': 'a1'})
+        with open(tmp_path / 'attendance.json.journal', 'a', encoding='utf-8') as f:
+            f.write('{"op": "create", "record": {"id": "a2"')
+        
+        reopened = StorageService(str(tmp_path), engine='journal')
+        assert [r['id'] for r in reopened.get_all('attendance')] == ['a1']
+        reopened.create('attendance', {'id': 'a3'})
+        assert [r['id'] for r in StorageService(str(tmp_path), engine='journal').get_all('attendance')] == ['a1', 'a3']
+
+
+class TestGroupCommit:
+    """Test batching concurrent writes into shared commits."""
+    
+    @pytest.mark.parametrize('engine', ['file', 'journal'])
+    def test_concurrent_writes_share_commits(self, tmp_path, engine):
+        """Test that concurrent creates are batched and all persisted."""
+        store = StorageService(str(tmp_path), engine=engine, group_commit=True, commit_window=0.05)
+        threads = [
+            threading.Thread(target=store.create, args=('attendance', {'id': f'a{i}'}))
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        stats = store.commit_stats()
+        assert stats['writes'] == 20
+        assert stats['batches'] < 20
+        reopened = StorageService(str(tmp_path), engine=engine)
+        assert sorted(r['id'] for r in reopened.get_all('attendance')) == sorted(f'a{i}' for i in range(20))
+    
+    def test_failed_commit_raises_in_writer(self, tmp_path, monkeypatch):
+        """Test that a failed batch write surfaces to the waiting caller."""
+        store = StorageService(str(tmp_path), group_commit=True, commit_window=0)
+        
+        def fail(*args):
+            raise OSError('disk full')
+        monkeypatch.setattr(store, '_write_file', fail)
+        
+        with pytest.raises(OSError):
+            store.create('attendance', {'id': 'a1'})
+        monkeypatch.undo()
+        assert store.get_all('attendance') == []
+
+
+class TestBatchOperations:
+    """Test create_many/update_many/delete_many."""
+    
+    def test_batch_mutations_write_once(self, store):
+        """Test that each batch call is a single write."""
+        store.create_many('submissions', [{'id': f's{i}', 'assignment_id': 'a1'} for i in range(5)])
+        assert store.commit_stats()['batches'] == 1
+        
+        updated = store.update_many('submissions', {'s0': {'score': 9}, 's1': {'score': 7}, 'missing': {'score': 1}})
+        assert [r['id'] for r in updated] == ['s0', 's1']
+        assert store.delete_many('submissions', ['s2', 's3', 'missing']) == 2
+        assert store.commit_stats()['batches'] == 3
+        
+        reopened = StorageService(store.data_dir)
+        assert [r['id'] for r in reopened.get_all('submissions')] == ['s0', 's1', 's4']
+        assert reopened.get_by_id('submissions', 's0')['score'] == 9
+        assert len(reopened.get_by_field('submissions', 'assignment_id', 'a1')) == 3
+    
+    def test_upsert_many(self, store):
+        """Test that upserts match on key fields, keep ids and write once."""
+        store.create('attendance', {'id': 'a0', 'student_id': 's0', 'lecture_id': 'l1', 'is_present': True})
+        created, updated = store.upsert_many('attendance', [
+            {'id': 'new0', 'student_id': 's0', 'lecture_id': 'l1', 'is_present': False},
+            {'id': 'new1', 'student_id': 's1', 'lecture_id': 'l1', 'is_present': True},
+        ], key_fields=('student_id', 'lecture_id'))
+        
+        assert [r['id'] for r in created] == ['new1']
+        assert updated == [{'id': 'a0', 'student_id': 's0', 'lecture_id': 'l1', 'is_present': False}]
+        assert store.commit_stats()['batches'] == 2
+        reopened = StorageService(store.data_dir)
+        assert [(r['id'], r['is_present']) for r in reopened.get_all('attendance')] == [('a0', False), ('new1', True)]
+    
+    def test_create_many_unique_skips_existing_keys(self, store):
+        """Test that unique creates skip keys stored by another instance or earlier in the batch."""
+        other = StorageService(store.data_dir)
+        store.get_all('attendance')
+        other.create('attendance', {'id': 'a0', 'student_id': 's0', 'lecture_id': 'l1'})
+        
+        created = store.create_many('attendance', [
+            {'id': 'new0', 'student_id': 's0', 'lecture_id': 'l1'},
+            {'id': 'new1', 'student_id': 's1', 'lecture_id': 'l1'},
+            {'id': 'new2', 'student_id': 's1', 'lecture_id': 'l1'},
+        ], unique=('student_id', 'lecture_id'))
+        
+        assert [r['id'] for r in created] == ['new1']
+        reopened = StorageService(store.data_dir)
+        assert [r['id'] for r in reopened.get_all('attendance')] == ['a0', 'new1']
+    
+    def test_empty_batch_does_not_write(self, store):
+        """Test that a batch with nothing to change skips the write."""
+        assert store.delete_many('submissions', ['missing']) == 0
+        assert store.update_many('submissions', {}) == []
+        assert store.commit_stats()['batches'] == 0
+
+
+class TestStorageFormats:
+    """Test per-collection on-disk formats."""
+    
+    @pytest.mark.parametrize('fmt', ['pretty', 'json', 'jsonl', 'msgpack'])
+    def test_round_trip_and_detection(self, tmp_path, fmt):
+        """Test that each format is written and read back by any service."""
+        if fmt == 'msgpack':
+            pytest.importorskip('msgpack')
+        records = [{'id': f'a{i}', 'student_id': 's1', 'note': 'é'} for i in range(3)]
+        writer = StorageService(str(tmp_path), formats={'attendance': fmt})
+        writer.create_many('attendance', records)
+        
+        # A service configured for another format still detects it
+        reader = StorageService(str(tmp_path), default_format='pretty')
+        assert reader.get_all('attendance') == records
+    
+    def test_compact_formats_are_smaller(self, tmp_path):
+        """Test that compact JSON and JSON Lines beat the indented form."""
+        records = [{'id': f'a{i}', 'student_id': 's1', 'is_present': True} for i in range(50)]
+        sizes = {}
+        for fmt in ('pretty', 'json', 'jsonl'):
+            store = StorageService(str(tmp_path / fmt), default_format=fmt)
+            store.create_many('attendance', records)
+            sizes[fmt] = os.path.getsize(tmp_path / fmt / 'attendance.json')
+        assert sizes['json'] < sizes['pretty']
+        assert sizes['jsonl'] < sizes['pretty']
+    
+    def test_format_change_rewrites_on_next_write(self, tmp_path):
+        """Test that switching a collection's format needs no migration."""
+        StorageService(str(tmp_path), default_format='pretty').create('rooms', {'id': 'r1'})
+        store = StorageService(str(tmp_path), formats={'rooms': 'jsonl'})
+        store.create('rooms', {'id': 'r2'})
+        with open(tmp_path / 'rooms.json', encoding='utf-8') as f:
+            assert f.read() == '{"id": "r1"}\n{"id": "r2"}\n'
+    
+    def test_unreadable_format_is_not_overwritten(self, tmp_path, monkeypatch):
+        """Test that a msgpack file read without msgpack fails instead of being emptied."""
+        from services import storage_formats
+        
+        monkeypatch.setattr(storage_formats, 'msgpack', None)
+        # MessagePack for [{"id": "a"}]
+        content = b'\x91\x81\xa2id\xa1a'
+        (tmp_path / 'rooms.json').write_bytes(content)
+        store = StorageService(str(tmp_path))
+        
+        with pytest.raises(storage_formats.FormatUnavailable):
+            store.get_all('rooms')
+        with pytest.raises(storage_formats.FormatUnavailable):
+            store.create('rooms', {'id': 'b'})
+        assert (tmp_path / 'rooms.json').read_bytes() == content
+    
+    def test_unknown_format_rejected(self, tmp_path):
+        """Test that an unknown format name is an error."""
+        with pytest.raises(ValueError):
+            StorageService(str(tmp_path), default_format='yaml')
+
+
+class TestStreamingQueries:
+    """Test find/first with limits, offsets and projections."""
+    
+    def test_limit_offset_and_fields(self, store):
+        """Test paging and projecting a filtered query."""
+        store.create_many('attendance', [
+            {'id': f'a{i}', 'student_id': 's1' if i % 2 else 's2', 'is_present': True}
+            for i in range(10)
+        ])
+        
+        page = list(store.find('attendance', {'student_id': 's1'}, fields=['id'], limit=2, offset=1))
+        assert page == [{'id': 'a3'}, {'id': 'a5'}]
+        assert store.query('attendance', {'is_present': True}, limit=3)[-1]['id'] == 'a2'
+        assert store.first('attendance', {'student_id': 's2'}) == {'id': 'a0', 'student_id': 's2', 'is_present': True}
+        assert store.first('attendance', {'student_id': 'nobody'}) is None
+        assert store.count('attendance', {'student_id': 's1', 'is_present': True}) == 5
+    
+    def test_find_is_lazy(self, store):
+        """Test that the page is selected when iteration starts."""
+        store.create('rooms', {'id': 'r1', 'name': 'Lab'})
+        results = store.find('rooms')
+        store.create('rooms', {'id': 'r2'})  # the page was not selected yet
+        
+        assert next(results)['name'] == 'Lab'
+        assert [r['id'] for r in results] == ['r2']
+
+
+class TestPagination:
+    """Test sorted keyset pagination."""
+    
+    def test_cursor_walks_all_pages(self, store):
+        """Test that following cursors visits every record once, in order."""
+        store.create_many('announcements', [
+            {'id': f'n{i}', 'is_pinned': i == 3, 'published_at': f'2026-01-{i + 1:02d}'}
+            for i in range(7)
+        ])
+        
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = store.paginate('announcements', sort=['-is_pinned', '-published_at'],
+                                          limit=3, cursor=cursor, fields=['id'])
+            seen.extend(r['id'] for r in page)
+            if cursor is None:
+                break
+        assert seen == ['n3', 'n6', 'n5', 'n4', 'n2', 'n1', 'n0']
+    
+    def test_order_follows_writes(self, store):
+        """Test that the maintained sort order reflects later mutations."""
+        store.create_many('users', [{'id': f'u{i}', 'created_at': str(i)} for i in range(5)])
+        page, cursor = store.paginate('users', sort=['created_at'], limit=2)
+        assert [u['id'] for u in page] == ['u0', 'u1']
+        
+        store.update('users', 'u4', {'created_at': '0.5'})
+        store.delete('users', 'u2')
+        store.create('users', {'id': 'u9', 'created_at': '9'})
+        rest, end = store.paginate('users', sort=['created_at'], limit=10, cursor=cursor)
+        assert [u['id'] for u in rest] == ['u3', 'u9']
+        assert end is None
+        assert [u['id'] for u in store.paginate('users', sort=['created_at'], limit=10)[0]] == [
+            'u0', 'u4', 'u1', 'u3', 'u9'
+        ]
+    
+    def test_filters_offset_and_where(self, store):
+        """Test filtered pages, offsets and extra predicates."""
+        store.create_many('attendance', [
+            {'id': f'a{i}', 'student_id': 's1', 'marked_at': str(i), 'is_present': i % 2 == 0}
+            for i in range(6)
+        ])
+        page, cursor = store.paginate('attendance', {'student_id': 's1'}, sort=['-marked_at'],
+                                      limit=2, offset=1, where=lambda r: r['is_present'])
+        assert [r['id'] for r in page] == ['a2', 'a0']
+        assert cursor is None
+        assert store.count('attendance', {'student_id': 's1'}, where=lambda r: r['is_present']) == 3
+    
+    def test_cursor_for_other_sort_rejected(self, store):
+        """Test that a cursor only works with the sort it came from."""
+        store.create_many('users', [{'id': f'u{i}'} for i in range(3)])
+        _, cursor = store.paginate('users', limit=1)
+        with pytest.raises(ValueError):
+            store.paginate('users', sort=['-id'], cursor=cursor)
+        with pytest.raises(ValueError):
+            store.paginate('users', cursor='not-a-cursor')
+
+
+class TestColumnarCache:
+    """Test collections cached column by column."""
+    
+    @pytest.fixture
+    def columnar_store(self, tmp_path):
+        return StorageService(str(tmp_path), columnar={'attendance': Attendance.COLUMNS})
+    
+    @staticmethod
+    def _attendance(n):
+        return [
+            Attendance(course_id=f'course-{i % 3}', student_id=f'student-{i % 7}',
+                       lecture_id=f'lecture-{i % 5}', marked_via='qr' if i % 2 else 'manual').to_dict()
+            for i in range(n)
+        ]
+    
+    def test_reads_match_plain_cache(self, columnar_store):
+        """Test that records read back exactly, including ones off the schema."""
+        records = self._attendance(20) + [
+            {**self._attendance(1)[0], 'note': 'extra field'},
+            {**self._attendance(1)[0], 'id': 'not-a-uuid'},
+            {**self._attendance(1)[0], 'id': str(uuid.uuid4()).upper()},
+            {**self._attendance(1)[0], 'marked_at': '2026-01-31T11:53:55+05:30'},
+            {**self._attendance(1)[0], 'is_present': None},
+        ]
+        columnar_store.create_many('attendance', records)
+        
+        plain = StorageService(columnar_store.data_dir).get_all('attendance')
+        fetched = columnar_store.get_all('attendance')
+        assert [list(r.items()) for r in fetched] == [list(r.items()) for r in plain]
+        assert [list(r.items()) for r in fetched] == [list(r.items()) for r in records]
+        assert all(type(r) is FrozenRecord for r in fetched)
+        with pytest.raises(TypeError):
+            fetched[0]['is_present'] = False
+    
+    def test_writes_indexes_and_repacking(self, columnar_store, monkeypatch):
+        """Test updates, id changes and deletes past the repack threshold."""
+        monkeypatch.setattr(columnar, 'REPACK_THRESHOLD', 4)
+        records = columnar_store.create_many('attendance', self._attendance(30))
+        ids = [r['id'] for r in records]
+        
+        columnar_store.update('attendance', ids[0], {'is_present': False, 'marked_via': 'manual'})
+        columnar_store.update('attendance', ids[1], {'id': 'renamed'})
+        assert columnar_store.delete_many('attendance', ids[2:20]) == 18
+        columnar_store.create('attendance', {**records[2], 'marked_at': None})
+        
+        plain = StorageService(columnar_store.data_dir)
+        assert columnar_store.get_all('attendance') == plain.get_all('attendance')
+        assert columnar_store.get_by_id('attendance', ids[0])['is_present'] is False
+        assert columnar_store.get_by_id('attendance', ids[1]) is None
+        assert columnar_store.get_by_id('attendance', 'renamed')['id'] == 'renamed'
+        assert columnar_store.get_by_id('attendance', ids[2])['marked_at'] is None
+        assert columnar_store.get_by_id('attendance', ids[5]) is None
+        assert columnar_store.count('attendance') == 13
+        filters = {'student_id': 'student-3'}
+        assert columnar_store.query('attendance', filters) == plain.query('attendance', filters)
+        assert columnar_store.paginate('attendance', sort=['marked_at'], limit=5) == \
+            plain.paginate('attendance', sort=['marked_at'], limit=5)
+    
+    def test_find_matches_and_projects_on_columns(self, columnar_store, monkeypatch):
+        """Test that find builds only the returned records, only their fields."""
+        records = self._attendance(40) + [{**self._attendance(1)[0], 'note': 'extra field'}]
+        columnar_store.create_many('attendance', records)
+        plain = StorageService(columnar_store.data_dir)
+        # Indexes are built once, from whole records
+        columnar_store.first('attendance', {'student_id': 'student-0'})
+        
+        built = []
+        original = columnar.ColumnarRecords._record
+        monkeypatch.setattr(columnar.ColumnarRecords, '_record',
+                            lambda self, row, key: built.append(row) or original(self, row, key))
+        for filters, fields, offset, limit in (
+            ({'course_id': 'course-1'}, ['id', 'student_id'], 2, 4),
+            ({'marked_via': 'qr', 'is_present': True}, ['lecture_id', 'note'], 0, None),
+            ({'note': 'extra field'}, ['id', 'note'], 0, None),
+            ({'student_id': 'student-3', 'course_id': 'course-0'}, None, 0, 1),
+            ({'id': records[5]['id'], 'course_id': 'course-2'}, ['course_id'], 0, None),
+            ({'marked_via': 'qr'}, None, 5, 3),
+        ):
+            expected = list(plain.find('attendance', filters, fields, limit, offset))
+            assert list(columnar_store.find('attendance', filters, fields, limit, offset)) == expected
+        assert len(built) == 4
+    
+    def test_memory_drops_by_an_order_of_magnitude(self):
+        """Test the resident size of cached attendance records."""
+        raw = json.dumps([
+            Attendance(course_id=f'course-{i % 40}', student_id=str(uuid.UUID(int=i % 250)),
+                       lecture_id=str(uuid.UUID(int=10 ** 6 + i % 200))).to_dict()
+            for i in range(10000)
+        ])
+        
+        def resident(columns):
+            tracemalloc.start()
+            try:
+                entry = _CachedCollection(None, json.loads(raw), columns)
+                return tracemalloc.get_traced_memory()[0], entry
+            finally:
+                tracemalloc.stop()
+        
+        plain, _ = resident(None)
+        compact, entry = resident(Attendance.COLUMNS)
+        assert len(entry.records) == 10000
+        assert plain / compact >= 8
+
+
+class TestExpiry:
+    """Test TTL collections and the expiry sweeper."""
+    
+    def test_expired_records_are_invisible(self, store):
+        """Test that every read skips records past their expires_at."""
+        store.create_many('qrcodes', _qrcodes())
+        
+        assert [r['id'] for r in store.get_all('qrcodes')] == ['new']
+        assert store.get_by_id('qrcodes', 'old') is None
+        assert store.first('qrcodes', {'code_data': 'aaa'}) is None
+        assert store.first('qrcodes', {'code_data': 'bbb'})['id'] == 'new'
+        assert store.count('qrcodes') == 1
+        assert [r['id'] for r in store.paginate('qrcodes', sort=['expires_at'])[0]] == ['new']
+    
+    def test_only_ttl_collections_expire(self, store):
+        """Test that expires_at means nothing outside TTL collections."""
+        store.create_many('announcements', _qrcodes())
+        assert store.count('announcements') == 2
+        
+        store.enable_ttl('announcements')
+        assert store.count('announcements') == 1
+    
+    def test_purge_deletes_expired_records(self, store):
+        """Test that purge_expired removes expired records in one write."""
+        store.create_many('qrcodes', _qrcodes() + [{'id': 'forever', 'code_data': 'ccc'}])
+        before = store.commit_stats()['batches']
+        
+        assert store.purge_expired() == 1
+        assert store.purge_expired() == 0
+        assert store.commit_stats()['batches'] == before + 1
+        store.invalidate()
+        assert len(store.get_all('qrcodes')) == 2
+        assert _ids_on_disk(store, 'qrcodes') == ['new', 'forever']
+    
+    def test_sweeper_purges_in_background(self, store):
+        """Test that a running sweeper purges without being asked."""
+        store.create_many('qrcodes', _qrcodes())
+        sweeper = ExpirySweeper(store, interval_seconds=0.05)
+        sweeper.start()
+        try:
+            deadline = time.monotonic() + 5
+            while _ids_on_disk(store, 'qrcodes') != ['new'] and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            sweeper.stop()
+        assert _ids_on_disk(store, 'qrcodes') == ['new']
+
+
+def _ids_on_disk(store, collection):
+    with open(os.path.join(store.data_dir, f'{collection}.json'), encoding='utf-8') as f:
+        return [r['id'] for r in json.load(f)]
+
+
+class TestConcurrency:
+    """Test per-collection and cross-process locking."""
+    
+    def test_concurrent_threads_lose_no_records(self, store):
+        """Test that parallel creates from many threads all persist."""
+        def worker(n):
+            for i in range(10):
+                store.create('bookings', {'id': f'b{n}-{i}'})
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert StorageService(store.data_dir).count('bookings') == 80
+    
+    @pytest.mark.parametrize('engine', ['file', 'journal'])
+    def test_concurrent_processes_lose_no_records(self, tmp_path, engine):
+        """Test that two processes writing the same collection both persist."""
+        ctx = multiprocessing.get_context('fork')
+        processes = [
+            ctx.Process(target=_create_records, args=(str(tmp_path), engine, f'p{n}', 25))
+            for n in range(2)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        
+        ids = {r['id'] for r in StorageService(str(tmp_path), engine=engine).get_all('bookings')}
+        assert ids == {f'p{n}-{i}' for n in range(2) for i in range(25)}
+    
+    def test_writer_sees_other_process_changes(self, tmp_path):
+        """Test that a cached writer reloads a file changed by another process."""
+        first = StorageService(str(tmp_path))
+        second = StorageService(str(tmp_path))
+        first.create('rooms', {'id': 'r1'})
+        assert second.count('rooms') == 1
+        first.create('rooms', {'id': 'r2'})
+        second.create('rooms', {'id': 'r3'})
+        assert [r['id'] for r in first.get_all('rooms')] == ['r1', 'r2', 'r3']
+
+
+def _create_records(data_dir, engine, prefix, n):
+    store = StorageService(data_dir, engine=engine)
+    for i in range(n):
+        store.create('bookings', {'id': f'{prefix}-{i}'})
+
+
+class TestSQLiteBackend:
+    """Test the SQLite storage backend."""
+    
+    @pytest.fixture
+    def sqlite_store(self, tmp_path):
+        from database import create_db_engine
+        from services.sqlite_storage import SQLiteStorageService
+        return SQLiteStorageService(create_db_engine(f"sqlite:///{tmp_path / 'test.db'}"))
+    
+    def test_crud_round_trip(self, sqlite_store):
+        """Test the StorageService CRUD interface on SQLite."""
+        sqlite_store.create('users', {'id': 'u1', 'email': 'a@campus.edu', 'is_active': True})
+        sqlite_store.create('users', {'id': 'u2', 'email': 'b@campus.edu', 'is_active': False})
+        
+        assert sqlite_store.get_by_id('users', 'u1')['email'] == 'a@campus.edu'
+        assert [u['id'] for u in sqlite_store.get_by_field('users', 'email', 'b@campus.edu')] == ['u2']
+        assert [u['id'] for u in sqlite_store.query('users', {'is_active': True, 'role': None})] == ['u1']
+        
+        assert sqlite_store.update('users', 'u1', {'name': 'Updated'})['name'] == 'Updated'
+        assert sqlite_store.update('users', 'missing', {'name': 'x'}) is None
+        assert sqlite_store.delete('users', 'u2') is True
+        assert sqlite_store.delete('users', 'u2') is False
+        assert sqlite_store.count('users') == 1
+        assert sqlite_store.get_all('users') == [
+            {'id': 'u1', 'email': 'a@campus.edu', 'is_active': True, 'name': 'Updated'}
+        ]
+    
+    def test_batch_operations(self, sqlite_store):
+        """Test the batch mutation methods on SQLite."""
+        sqlite_store.create_many('submissions', [{'id': f's{i}'} for i in range(3)])
+        assert [r['id'] for r in sqlite_store.update_many('submissions', {'s0': {'score': 5}, 'x': {}})] == ['s0']
+        assert sqlite_store.delete_many('submissions', ['s1', 'x']) == 1
+        assert sqlite_store.get_all('submissions') == [{'id': 's0', 'score': 5}, {'id': 's2'}]
+    
+    def test_upsert_many(self, sqlite_store):
+        """Test that SQLite upserts match on key fields and keep ids."""
+        sqlite_store.create('attendance', {'id': 'a0', 'student_id': 's0', 'date': None, 'is_present': True})
+        created, updated = sqlite_store.upsert_many('attendance', [
+            {'id': 'new0', 'student_id': 's0', 'date': None, 'is_present': False},
+            {'id': 'new1', 'student_id': 's1', 'date': None, 'is_present': True},
+        ], key_fields=('student_id', 'date'))
+        
+        assert [r['id'] for r in created] == ['new1']
+        assert [r['id'] for r in updated] == ['a0']
+        assert [(r['id'], r['is_present']) for r in sqlite_store.get_all('attendance')] == [('a0', False), ('new1', True)]
+    
+    def test_create_many_unique(self, sqlite_store):
+        """Test that SQLite unique creates skip stored and repeated keys."""
+        sqlite_store.create('attendance', {'id': 'a0', 'student_id': 's0', 'date': None})
+        created = sqlite_store.create_many('attendance', [
+            {'id': 'new0', 'student_id': 's0', 'date': None},
+            {'id': 'new1', 'student_id': 's1', 'date': None},
+            {'id': 'new2', 'student_id': 's1', 'date': None},
+        ], unique=('student_id', 'date'))
+        
+        assert [r['id'] for r in created] == ['new1']
+        assert [r['id'] for r in sqlite_store.get_all('attendance')] == ['a0', 'new1']
+    
+    def test_find_and_first(self, sqlite_store):
+        """Test limits, offsets and projections on SQLite."""
+        sqlite_store.create_many('attendance', [{'id': f'a{i}', 'student_id': 's1'} for i in range(5)])
+        assert list(sqlite_store.find('attendance', {'student_id': 's1'}, fields=['id'], limit=2, offset=2)) == [
+            {'id': 'a2'}, {'id': 'a3'}
+        ]
+        assert [r['id'] for r in sqlite_store.query('attendance', {}, offset=3)] == ['a3', 'a4']
+        assert sqlite_store.first('attendance', {'student_id': 's1'})['id'] == 'a0'
+        assert sqlite_store.first('attendance', {'student_id': 'x'}) is None
+    
+    def test_paginate(self, sqlite_store):
+        """Test that SQLite pages match the JSON backend contract."""
+        sqlite_store.create_many('users', [{'id': f'u{i}', 'role': 'student'} for i in range(5)])
+        page, cursor = sqlite_store.paginate('users', {'role': 'student'}, sort=['-id'], limit=2)
+        assert [u['id'] for u in page] == ['u4', 'u3']
+        page, cursor = sqlite_store.paginate('users', {'role': 'student'}, sort=['-id'], limit=5, cursor=cursor)
+        assert [u['id'] for u in page] == ['u2', 'u1', 'u0']
+        assert cursor is None
+    
+    def test_paginate_matches_json_order(self, sqlite_store, store, monkeypatch):
+        """Test that SQL keyset pages follow the JSON backend order, cursors included."""
+        from services import sqlite_storage
+        
+        scores = [None, True, False, 3, 2.5, -1, 'b', 'a', 'B', 0, 7, 'é']
+        records = [{'id': f'r{i:02d}', 'score': scores[i % len(scores)], 'group': i % 3} for i in range(30)]
+        records.append({'id': 'r99', 'group': 1})
+        sqlite_store.create_many('announcements', records)
+        store.create_many('announcements', records)
+        
+        decoded = []
+        loads = json.loads
+        monkeypatch.setattr(sqlite_storage, 'json', type('json', (), {
+            'loads': staticmethod(lambda raw: decoded.append(raw) or loads(raw)), 'dumps': json.dumps
+        }))
+        for sort, filters, where in (
+            (['score'], None, None),
+            (['-score', 'group'], None, None),
+            (['group', '-id'], {'group': 1}, None),
+            (['-group', 'score'], None, lambda r: r['id'] != 'r05'),
+        ):
+            walked, cursor = [], None
+            while True:
+                decoded.clear()
+                page, next_cursor = sqlite_store.paginate('announcements', filters, sort, limit=4,
+                                                          cursor=cursor, where=where)
+                expected, _ = store.paginate('announcements', filters, sort, limit=4, cursor=cursor, where=where)
+                assert page == expected
+                if where is None:
+                    assert len(decoded) <= 5
+                walked += [r['id'] for r in page]
+                cursor = next_cursor
+                if cursor is None:
+                    break
+            matches = [r for r in records if all(r.get(f) == v for f, v in (filters or {}).items())]
+            assert len(walked) == len(set(walked)) == len([r for r in matches if where is None or where(r)])
+    
+    def test_expiry(self, sqlite_store):
+        """Test that expired records are hidden and purged."""
+        sqlite_store.create_many('qrcodes', _qrcodes())
+        sqlite_store.create('announcements', _qrcodes()[0])
+        
+        assert [r['id'] for r in sqlite_store.get_all('qrcodes')] == ['new']
+        assert sqlite_store.get_by_id('qrcodes', 'old') is None
+        assert sqlite_store.count('qrcodes') == 1
+        assert sqlite_store.count('announcements') == 1
+        assert sqlite_store.purge_expired() == 1
+        assert sqlite_store.count('qrcodes') == 1
+    
+    def test_lookups_use_expression_indexes(self, sqlite_store):
+        """Test that declared indexes back field lookups."""
+        from sqlalchemy import text
+        sqlite_store.create('attendance', {'id': 'a1', 'student_id': 's1'})
+        
+        with sqlite_store.engine.connect() as conn:
+            mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+            plan = conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT data FROM stored_records "
+                "WHERE collection = 'attendance' AND json_extract(data, '$.\"student_id\"') = 's1'"
+            )).fetchall()
+        
+        assert mode == 'wal'
+        assert 'ix_stored_records_attendance_student_id' in ' '.join(str(row) for row in plan)
+    
+    def test_json_migration_is_batched_and_resumable(self, tmp_path):
+        """Test migrating a JSON collection and resuming after a partial run."""
+        from database import create_db_engine
+        from database.migrate_json import migrate_collection
+        from services.sqlite_storage import SQLiteStorageService
+        
+        data_dir = tmp_path / 'data'
+        data_dir.mkdir()
+        records = [{'id': f'a{i}', 'student_id': f's{i % 3}', 'is_present': i % 2 == 0} for i in range(25)]
+        with open(data_dir / 'attendance.json', 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2)
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+        
+        first = migrate_collection(engine, str(data_dir), 'attendance', batch_size=10)
+        assert first['inserted'] == 25
+        
+        again = migrate_collection(engine, str(data_dir), 'attendance', batch_size=10)
+        assert again['inserted'] == 0 and again['skipped'] == 25
+        
+        migrated = SQLiteStorageService(engine)
+        assert migrated.get_all('attendance') == records
+        assert migrated.count('attendance', {'student_id': 's1'}) == 8
+    
+    def test_json_migration_counts_only_new_rows(self, tmp_path):
+        """Test that a resume skips migrated ids wherever they sit in a changed file."""
+        from database import create_db_engine
+        from database.migrate_json import migrate_collection
+        from sqlalchemy import text
+        
+        data_dir = tmp_path / 'data'
+        store = StorageService(str(data_dir), engine='journal', collections=[])
+        store.create_many('attendance', [{'id': f'a{i}'} for i in range(20)])
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+        migrate_collection(engine, str(data_dir), 'attendance', batch_size=8)
+        assert [name for name in os.listdir(data_dir) if name.endswith('.json')] == ['attendance.json']
+        
+        # The file changed between runs: a record removed ahead of the
+        # migrated ones and new records added before and after them
+        changed = [{'id': 'c0'}] + [{'id': f'a{i}'} for i in range(1, 20)] + [{'id': f'b{i}'} for i in range(5)]
+        with open(data_dir / 'attendance.json', 'w', encoding='utf-8') as f:
+            json.dump(changed, f)
+        again = migrate_collection(engine, str(data_dir), 'attendance', batch_size=8)
+        assert again['records'] == 25 and again['inserted'] == 6 and again['skipped'] == 19
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT count(*) FROM stored_records")).scalar() == 26